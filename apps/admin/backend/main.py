@@ -1,21 +1,26 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import asyncio
+import json
+import logging
 import sys
 import os
 
 # Add shared modules to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../../'))
 
-from shared.config.database import get_db
+from shared.config.database import get_db, pool_metrics
+from shared.config.db_pool import process_key
 from shared.config.settings import settings
+from shared.config.redis import init_redis, get_redis
 
 # Import routers with absolute path to work in both dev and Docker
 try:
-    from .routers import settings_router, users_router, analytics_router, system_router, prompt_router, payments_router
+    from .routers import settings_router, users_router, analytics_router, system_router, prompt_router, payments_router, export_router
 except ImportError:
     # Fallback for Docker environment
-    from apps.admin.backend.routers import settings_router, users_router, analytics_router, system_router, prompt_router, payments_router
+    from apps.admin.backend.routers import settings_router, users_router, analytics_router, system_router, prompt_router, payments_router, export_router
 
 app = FastAPI(
     title="Veloxe Admin Panel API",
@@ -39,6 +44,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+logger = logging.getLogger(__name__)
+
+
+async def pool_metrics_publisher():
+    """Publish this worker's pool usage so /api/system/db-pool can sum all workers"""
+    while True:
+        try:
+            redis_client = await get_redis()
+            if redis_client:
+                await redis_client.setex(f"db_pool_metrics:{process_key()}", 180, json.dumps(pool_metrics()))
+        except Exception as e:
+            logger.error(f"Error publishing DB pool metrics: {e}")
+        
+        await asyncio.sleep(60)
+
+
+@app.on_event("startup")
+async def startup():
+    # Shared Redis client for cache invalidation events
+    await init_redis()
+    app.state.pool_metrics_task = asyncio.create_task(pool_metrics_publisher())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.pool_metrics_task.cancel()
+
+
 security = HTTPBearer()
 
 def verify_admin_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -72,12 +106,26 @@ app.include_router(
     dependencies=[Depends(verify_admin_token)]
 )
 
+app.include_router(
+    export_router.router,
+    prefix="/api/export",
+    tags=["Export"],
+    dependencies=[Depends(verify_admin_token)]
+)
+
 app.include_router(
     system_router.router,
     prefix="/api/system",
     tags=["System"]
 )
 
+app.include_router(
+    system_router.admin_router,
+    prefix="/api/system",
+    tags=["System"],
+    dependencies=[Depends(verify_admin_token)]
+)
+
 app.include_router(
     prompt_router.router,
     prefix="/api/prompt",
@@ -0,0 +1,156 @@
+"""
+Response cache for heavy admin GET endpoints.
+
+Rendered JSON is shared between admin workers through Redis, keyed on the
+path and query string. Responses carry an ETag and answer If-None-Match
+with 304. Past its TTL an entry is still served for `stale` seconds while
+one background task recomputes it, so dashboards never wait on the
+analytics queries and concurrent admins trigger a single recomputation.
+"""
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import time
+import sys
+import os
+from typing import Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../'))
+
+from shared.config.database import read_sessionmaker
+from shared.config.redis import get_redis
+from shared.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "admin_cache"
+REFRESH_LOCK_SECONDS = 60
+
+# Keep references so background refreshes are not garbage-collected mid-flight
+_refresh_tasks = set()
+
+
+def _cache_key(request: Request) -> str:
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    return f"{KEY_PREFIX}:{request.url.path}?{query}"
+
+
+def _render(result) -> str:
+    return json.dumps(jsonable_encoder(result), ensure_ascii=False, separators=(",", ":"))
+
+
+def _etag(body: str) -> str:
+    return '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+
+def _respond(request: Request, body: str, etag: str, max_age: int, state: str) -> Response:
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={max_age}",
+        "X-Cache": state
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cached_response(ttl: Optional[int] = None, stale: Optional[int] = None):
+    """
+    Cache a GET endpoint's JSON response.
+
+    Args:
+        ttl: Seconds an entry is fresh (default: settings.admin_cache_ttl)
+        stale: Extra seconds it may be served while being refreshed
+            (default: settings.admin_cache_stale_seconds)
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        # FastAPI fills this in; the endpoint itself never sees it
+        request_parameter = inspect.Parameter("_cache_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+
+        @functools.wraps(func)
+        async def wrapper(*args, _cache_request: Request, **kwargs):
+            fresh_for = ttl if ttl is not None else settings.admin_cache_ttl
+            stale_for = stale if stale is not None else settings.admin_cache_stale_seconds
+            redis_client = await get_redis()
+
+            if not redis_client:
+                body = _render(await func(*args, **kwargs))
+                return _respond(_cache_request, body, _etag(body), 0, "BYPASS")
+
+            key = _cache_key(_cache_request)
+            try:
+                cached = await redis_client.get(key)
+            except Exception as e:
+                logger.warning(f"Admin cache read failed for {key}: {e}")
+                cached = None
+
+            now = time.time()
+            if cached:
+                entry = json.loads(cached)
+                age = now - entry["created_at"]
+                if age < fresh_for:
+                    return _respond(_cache_request, entry["body"], entry["etag"], int(fresh_for - age), "HIT")
+
+                # Stale: answer right away, recompute in the background
+                await _schedule_refresh(redis_client, key, func, args, kwargs, fresh_for + stale_for)
+                return _respond(_cache_request, entry["body"], entry["etag"], 0, "STALE")
+
+            body = await _store(redis_client, key, await func(*args, **kwargs), fresh_for + stale_for)
+            return _respond(_cache_request, body, _etag(body), fresh_for, "MISS")
+
+        wrapper.__signature__ = signature.replace(
+            parameters=[*signature.parameters.values(), request_parameter]
+        )
+        return wrapper
+
+    return decorator
+
+
+async def _store(redis_client, key: str, result, lifetime: int) -> str:
+    body = _render(result)
+    entry = {"body": body, "etag": _etag(body), "created_at": time.time()}
+    try:
+        await redis_client.setex(key, lifetime, json.dumps(entry, ensure_ascii=False))
+    except Exception as e:
+        logger.warning(f"Admin cache write failed for {key}: {e}")
+    return body
+
+
+async def _schedule_refresh(redis_client, key: str, func, args, kwargs, lifetime: int):
+    """Start one refresh per key across all workers"""
+    try:
+        acquired = await redis_client.set(f"{key}:refresh", "1", nx=True, ex=REFRESH_LOCK_SECONDS)
+    except Exception:
+        return
+    if not acquired:
+        return
+
+    task = asyncio.create_task(_refresh(redis_client, key, func, args, kwargs, lifetime))
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+async def _refresh(redis_client, key: str, func, args, kwargs, lifetime: int):
+    """Recompute with a session of our own: the request's one is closed by now"""
+    try:
+        session_factory = await read_sessionmaker()
+        async with session_factory() as session:
+            fresh_kwargs = {
+                name: session if isinstance(value, AsyncSession) else value
+                for name, value in kwargs.items()
+            }
+            await _store(redis_client, key, await func(*args, **fresh_kwargs), lifetime)
+    except Exception as e:
+        logger.error(f"Admin cache refresh failed for {key}: {e}")
+    finally:
+        try:
+            await redis_client.delete(f"{key}:refresh")
+        except Exception:
+            pass
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, and_
+from sqlalchemy import select, func, and_
 from pydantic import BaseModel
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
@@ -9,16 +9,21 @@ import os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../'))
 
-from shared.config.database import get_db
+from shared.config.database import get_read_db
 from shared.models.analytics import Event
 from shared.models.user import User
 from shared.models.subscription import Subscription
+from shared.analytics.rollups import (
+    count_events, count_new_users, daily_counts, rolled_up_until, top_tags
+)
+from ..response_cache import cached_response
 
 router = APIRouter()
 
 
 @router.get("/")
-async def get_analytics_overview(db: AsyncSession = Depends(get_db)):
+@cached_response()
+async def get_analytics_overview(db: AsyncSession = Depends(get_read_db)):
     """Get overview analytics for the dashboard"""
     
     # Total users
@@ -31,67 +36,26 @@ async def get_analytics_overview(db: AsyncSession = Depends(get_db)):
     )
     active_subscriptions = active_subs_result.scalar()
     
-    # Messages today
+    # Messages today / week / month (from rollups)
     today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    messages_today_result = await db.execute(
-        select(func.count(Event.id))
-        .where(and_(
-            Event.created_at >= today_start,
-            Event.event_type == 'message_sent'
-        ))
-    )
-    messages_today = messages_today_result.scalar()
-    
-    # Messages this week
     week_start = today_start - timedelta(days=7)
-    messages_week_result = await db.execute(
-        select(func.count(Event.id))
-        .where(and_(
-            Event.created_at >= week_start,
-            Event.event_type == 'message_sent'
-        ))
-    )
-    messages_this_week = messages_week_result.scalar()
-    
-    # Messages this month
     month_start = today_start - timedelta(days=30)
-    messages_month_result = await db.execute(
-        select(func.count(Event.id))
-        .where(and_(
-            Event.created_at >= month_start,
-            Event.event_type == 'message_sent'
-        ))
-    )
-    messages_this_month = messages_month_result.scalar()
+    
+    messages_today = (await count_events(db, today_start, ['message_sent'])).get('message_sent', 0)
+    messages_this_week = (await count_events(db, week_start, ['message_sent'])).get('message_sent', 0)
+    messages_this_month = (await count_events(db, month_start, ['message_sent'])).get('message_sent', 0)
     
     # Revenue this month (placeholder)
     revenue_this_month = active_subscriptions * 99  # Assuming 99 rubles per subscription
     
-    # New users today
-    new_users_today_result = await db.execute(
-        select(func.count(User.id)).where(User.created_at >= today_start)
-    )
-    new_users_today = new_users_today_result.scalar()
-    
-    # New users this week
-    new_users_week_result = await db.execute(
-        select(func.count(User.id)).where(User.created_at >= week_start)
-    )
-    new_users_this_week = new_users_week_result.scalar()
+    # New users today / this week
+    new_users_today = await count_new_users(db, today_start)
+    new_users_this_week = await count_new_users(db, week_start)
     
-    # Crisis interventions
-    crisis_result = await db.execute(
-        select(func.count(Event.id))
-        .where(Event.event_type == 'crisis_triggered')
-    )
-    crisis_interventions = crisis_result.scalar()
-    
-    # Memory anchors created
-    memory_result = await db.execute(
-        select(func.count(Event.id))
-        .where(Event.event_type == 'memory_anchor_created')
-    )
-    memory_anchors_created = memory_result.scalar()
+    # Crisis interventions and memory anchors (all time)
+    totals = await count_events(db, None, ['crisis_triggered', 'memory_anchor_created'])
+    crisis_interventions = totals.get('crisis_triggered', 0)
+    memory_anchors_created = totals.get('memory_anchor_created', 0)
     
     return {
         "total_users": total_users,
@@ -129,22 +93,17 @@ class ConversionStatsResponse(BaseModel):
 
 
 @router.get("/events", response_model=List[EventStatsResponse])
+@cached_response()
 async def get_event_stats(
     days: int = Query(7, ge=1, le=90),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get event statistics for the last N days"""
     
     since = datetime.utcnow() - timedelta(days=days)
     
-    result = await db.execute(
-        select(Event.event_type, func.count(Event.id).label('count'))
-        .where(Event.created_at >= since)
-        .group_by(Event.event_type)
-        .order_by(desc('count'))
-    )
-    
-    events_data = result.all()
+    counts = await count_events(db, since)
+    events_data = sorted(counts.items(), key=lambda item: item[1], reverse=True)
     total_events = sum(count for _, count in events_data)
     
     stats = []
@@ -160,97 +119,95 @@ async def get_event_stats(
 
 
 @router.get("/daily", response_model=List[DailyStatsResponse])
+@cached_response()
 async def get_daily_stats(
     days: int = Query(30, ge=1, le=90),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get daily statistics"""
     
-    stats = []
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    since = today_start - timedelta(days=days - 1)
+    until = today_start + timedelta(days=1)
     
-    for i in range(days):
-        date = datetime.utcnow() - timedelta(days=i)
-        day_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        # New users
-        new_users_result = await db.execute(
-            select(func.count(User.id))
-            .where(and_(User.created_at >= day_start, User.created_at < day_end))
-        )
-        new_users = new_users_result.scalar()
-        
-        # Active users
-        active_users_result = await db.execute(
-            select(func.count(func.distinct(Event.user_id)))
-            .where(and_(Event.created_at >= day_start, Event.created_at < day_end))
-        )
-        active_users = active_users_result.scalar()
-        
-        # Messages sent
-        messages_result = await db.execute(
-            select(func.count(Event.id))
-            .where(and_(
-                Event.created_at >= day_start,
-                Event.created_at < day_end,
-                Event.event_type == 'message_out'
-            ))
-        )
-        messages_sent = messages_result.scalar()
-        
-        # New subscriptions
-        subscriptions_result = await db.execute(
-            select(func.count(Subscription.id))
-            .where(and_(
-                Subscription.created_at >= day_start,
-                Subscription.created_at < day_end,
-                Subscription.is_active == True
-            ))
-        )
-        subscriptions = subscriptions_result.scalar()
-        
-        stats.append(DailyStatsResponse(
-            date=day_start.strftime('%Y-%m-%d'),
-            new_users=new_users,
-            active_users=active_users,
-            messages_sent=messages_sent,
-            subscriptions=subscriptions
+    # Whole days already folded come from the daily rollups, so the raw scan
+    # is at most the last day or two however many days are asked for
+    split = await rolled_up_until(db, since, until)
+    
+    new_users = daily_counts('new_users', '', User.created_at, func.count(User.id), since, until, split)
+    active_users = daily_counts(
+        'active_users', '', Event.created_at, func.count(func.distinct(Event.user_id)), since, until, split
+    )
+    messages_sent = daily_counts(
+        'events', 'message_out', Event.created_at, func.count(Event.id), since, until, split,
+        Event.event_type == 'message_out'
+    )
+    
+    # Subscriptions are not rolled up; the table is small
+    subscription_day = func.date_trunc('day', Subscription.created_at).label('day')
+    subscriptions = (
+        select(subscription_day, func.count(Subscription.id).label('value'))
+        .where(and_(
+            Subscription.created_at >= since,
+            Subscription.created_at < until,
+            Subscription.is_active == True
         ))
+        .group_by(subscription_day)
+        .subquery()
+    )
+    
+    day_series = (
+        func.generate_series(since, today_start, timedelta(days=1))
+        .table_valued('day')
+        .render_derived()
+    )
+    
+    result = await db.execute(
+        select(
+            day_series.c.day,
+            func.coalesce(new_users.c.value, 0),
+            func.coalesce(active_users.c.value, 0),
+            func.coalesce(messages_sent.c.value, 0),
+            func.coalesce(subscriptions.c.value, 0)
+        )
+        .select_from(day_series)
+        .outerjoin(new_users, new_users.c.day == day_series.c.day)
+        .outerjoin(active_users, active_users.c.day == day_series.c.day)
+        .outerjoin(messages_sent, messages_sent.c.day == day_series.c.day)
+        .outerjoin(subscriptions, subscriptions.c.day == day_series.c.day)
+        .order_by(day_series.c.day)
+    )
     
-    return list(reversed(stats))  # Most recent first
+    return [
+        DailyStatsResponse(
+            date=day.strftime('%Y-%m-%d'),
+            new_users=new_users_count,
+            active_users=active_users_count,
+            messages_sent=messages_count,
+            subscriptions=subscriptions_count
+        )
+        for day, new_users_count, active_users_count, messages_count, subscriptions_count in result
+    ]
 
 
 @router.get("/conversion", response_model=ConversionStatsResponse)
+@cached_response()
 async def get_conversion_stats(
     days: int = Query(30, ge=1, le=90),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get conversion funnel statistics"""
     
     since = datetime.utcnow() - timedelta(days=days)
     
-    # Paywall shown events
-    paywall_result = await db.execute(
-        select(func.count(Event.id))
-        .where(and_(
-            Event.created_at >= since,
-            Event.event_type == 'paywall_shown'
-        ))
-    )
-    paywall_shown = paywall_result.scalar()
+    counts = await count_events(db, since, ['paywall_shown', 'payment_ok'])
+    paywall_shown = counts.get('paywall_shown', 0)
     
     # Payment attempts (not implemented yet, using placeholder)
     payment_attempts = 0
     
     # Successful payments
-    payment_success_result = await db.execute(
-        select(func.count(Event.id))
-        .where(and_(
-            Event.created_at >= since,
-            Event.event_type == 'payment_ok'
-        ))
-    )
-    payment_success = payment_success_result.scalar()
+    payment_success = counts.get('payment_ok', 0)
     
     # Calculate conversion rate
     conversion_rate = (payment_success / paywall_shown * 100) if paywall_shown > 0 else 0
@@ -264,33 +221,19 @@ async def get_conversion_stats(
 
 
 @router.get("/crisis")
+@cached_response()
 async def get_crisis_stats(
     days: int = Query(30, ge=1, le=90),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get crisis intervention statistics"""
     
     since = datetime.utcnow() - timedelta(days=days)
     
-    # Crisis triggered events
-    crisis_triggered_result = await db.execute(
-        select(func.count(Event.id))
-        .where(and_(
-            Event.created_at >= since,
-            Event.event_type == 'crisis_triggered'
-        ))
-    )
-    crisis_triggered = crisis_triggered_result.scalar()
-    
-    # Crisis resolved events
-    crisis_resolved_result = await db.execute(
-        select(func.count(Event.id))
-        .where(and_(
-            Event.created_at >= since,
-            Event.event_type == 'crisis_resolved'
-        ))
-    )
-    crisis_resolved = crisis_resolved_result.scalar()
+    # Crisis triggered / resolved events
+    counts = await count_events(db, since, ['crisis_triggered', 'crisis_resolved'])
+    crisis_triggered = counts.get('crisis_triggered', 0)
+    crisis_resolved = counts.get('crisis_resolved', 0)
     
     # Currently in crisis
     current_crisis_result = await db.execute(
@@ -307,23 +250,11 @@ async def get_crisis_stats(
 
 
 @router.get("/top-emotions")
-async def get_top_emotions(db: AsyncSession = Depends(get_db)):
+@cached_response()
+async def get_top_emotions(db: AsyncSession = Depends(get_read_db)):
     """Get most common user emotions"""
     
-    result = await db.execute(
-        select(User.emotion_tags).where(User.emotion_tags.isnot(None))
-    )
-    
-    emotion_counts = {}
-    for (emotion_tags,) in result:
-        if emotion_tags:
-            for emotion in emotion_tags:
-                # Extract emotion name (remove emoji)
-                emotion_name = emotion.split(' ', 1)[1] if ' ' in emotion else emotion
-                emotion_counts[emotion_name] = emotion_counts.get(emotion_name, 0) + 1
-    
-    # Sort by frequency and take top 10
-    top_emotions = sorted(emotion_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    top_emotions = await top_tags(db, 'emotion_tags')
     
     return {
         "emotions": [{"name": name, "count": count} for name, count in top_emotions]
@@ -331,24 +262,12 @@ async def get_top_emotions(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/top-topics")
-async def get_top_topics(db: AsyncSession = Depends(get_db)):
+@cached_response()
+async def get_top_topics(db: AsyncSession = Depends(get_read_db)):
     """Get most common user topics"""
     
-    result = await db.execute(
-        select(User.topic_tags).where(User.topic_tags.isnot(None))
-    )
-    
-    topic_counts = {}
-    for (topic_tags,) in result:
-        if topic_tags:
-            for topic in topic_tags:
-                # Extract topic name (remove emoji)
-                topic_name = topic.split(' ', 1)[1] if ' ' in topic else topic
-                topic_counts[topic_name] = topic_counts.get(topic_name, 0) + 1
-    
-    # Sort by frequency and take top 10
-    top_topics = sorted(topic_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    top_topics = await top_tags(db, 'topic_tags')
     
     return {
         "topics": [{"name": name, "count": count} for name, count in top_topics]
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,189 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, and_, Integer, BigInteger, String, Text, DateTime, Boolean, Numeric
+from typing import Optional
+from datetime import datetime
+import json
+import sys
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../'))
+
+from shared.config.database import read_sessionmaker
+from shared.models.analytics import Event
+from shared.models.conversation import Conversation, Message
+from shared.models.memory import ConversationSummary
+from shared.models.subscription import Subscription
+
+router = APIRouter()
+
+# Rows per keyset page; every page is its own short read transaction
+PAGE_SIZE = 10000
+# Rows fetched from the server-side cursor at a time
+FETCH_SIZE = 1000
+
+DATASETS = {
+    "messages": Message,
+    "events": Event,
+    "summaries": ConversationSummary,
+    "subscriptions": Subscription,
+}
+
+
+def _user_filter(model, user_id: int):
+    if model is Message:
+        # Messages only know their conversation
+        return Message.conversation_id.in_(
+            select(Conversation.id).where(Conversation.user_id == user_id)
+        )
+    return model.user_id == user_id
+
+
+async def _pages(model, since: Optional[datetime], until: Optional[datetime], user_id: Optional[int]):
+    """Yield lists of row dicts, paging by id so no transaction outlives a page"""
+    columns = list(model.__table__.columns)
+    conditions = []
+    if since:
+        conditions.append(model.created_at >= since)
+    if until:
+        conditions.append(model.created_at < until)
+    if user_id is not None:
+        conditions.append(_user_filter(model, user_id))
+
+    last_id = None
+    while True:
+        page_conditions = list(conditions)
+        if last_id is not None:
+            page_conditions.append(model.id > last_id)
+
+        query = (
+            select(*columns)
+            .where(and_(*page_conditions))
+            .order_by(model.id)
+            .limit(PAGE_SIZE)
+        )
+
+        rows_in_page = 0
+        session_factory = await read_sessionmaker()
+        async with session_factory() as session:
+            result = await session.stream(query.execution_options(yield_per=FETCH_SIZE))
+            async for partition in result.mappings().partitions(FETCH_SIZE):
+                rows = [dict(row) for row in partition]
+                rows_in_page += len(rows)
+                last_id = rows[-1]["id"]
+                yield rows
+
+        if rows_in_page < PAGE_SIZE:
+            return
+
+
+async def _ndjson(pages):
+    async for rows in pages:
+        yield "".join(
+            json.dumps(jsonable_encoder(row), ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode()
+
+
+def _arrow_type(column):
+    """Parquet type for a model column; JSON and anything unknown go out as text"""
+    if isinstance(column.type, (Integer, BigInteger)):
+        return pa.int64()
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, Numeric):
+        return pa.float64()
+    return pa.string()
+
+
+class _ChunkSink:
+    """Write-only file object that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+async def _parquet(pages, model):
+    """One row group per fetched chunk, streamed out as soon as it is written"""
+    schema = pa.schema([(column.name, _arrow_type(column)) for column in model.__table__.columns])
+    json_columns = [
+        field.name for field in schema
+        if field.type == pa.string() and not isinstance(model.__table__.columns[field.name].type, (String, Text))
+    ]
+    numeric_columns = [field.name for field in schema if field.type == pa.float64()]
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for rows in pages:
+            for row in rows:
+                for name in json_columns:
+                    if row[name] is not None:
+                        row[name] = json.dumps(jsonable_encoder(row[name]), ensure_ascii=False)
+                for name in numeric_columns:
+                    if row[name] is not None:
+                        row[name] = float(row[name])
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|parquet)$")
+):
+    """Stream a table filtered by created_at range and user as NDJSON or Parquet"""
+
+    model = DATASETS.get(dataset)
+    if model is None:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset, expected one of: {', '.join(DATASETS)}")
+
+    pages = _pages(model, since, until, user_id)
+    filename = f"{dataset}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+
+    if format == "parquet":
+        return StreamingResponse(
+            _parquet(pages, model),
+            media_type="application/vnd.apache.parquet",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.parquet"'}
+        )
+
+    return StreamingResponse(
+        _ndjson(pages),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.ndjson"'}
+    )
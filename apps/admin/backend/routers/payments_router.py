@@ -14,6 +14,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../'))
 
 from shared.config.database import get_db, async_session
 from shared.config.settings import settings
+from shared.config.redis import RedisCache
 
 # Simplified payment processing for webhooks
 from shared.models.user import User
@@ -105,10 +106,11 @@ async def process_cryptocloud_payment(db: AsyncSession, webhook_data: dict) -> b
         subscription = result.scalar_one_or_none()
         
         if subscription:
-            # Activate subscription using update statement
-            await db.execute(
+            # Activate subscription using update statement (no-op if the poller got there first)
+            result = await db.execute(
                 update(Subscription)
                 .where(Subscription.id == subscription.id)
+                .where(Subscription.is_active == False)
                 .values(
                     is_active=True,
                     starts_at=datetime.utcnow()
@@ -116,6 +118,15 @@ async def process_cryptocloud_payment(db: AsyncSession, webhook_data: dict) -> b
             )
             await db.commit()
             
+            if result.rowcount == 0:
+                return True
+            
+            # Bot processes drop their cached entitlement for this user
+            try:
+                await RedisCache().invalidate_entitlement(subscription.user_id)
+            except Exception as e:
+                print(f"Error invalidating entitlement cache: {e}")
+            
             # Send notification to user via bot
             await send_payment_success_notification(db, subscription.user_id, subscription.plan_name)
             
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List, Dict, Optional
@@ -12,6 +12,7 @@ from shared.config.database import get_db
 from apps.bot.services.greeting_service import GreetingService
 # Import shared models directly
 from shared.models.settings import Settings
+from shared.config.settings_registry import decode_value
 from shared.models.prompt_history import PromptHistory
 from sqlalchemy import select, desc
 
@@ -36,17 +37,14 @@ async def get_setting(db: AsyncSession, key: str, default_value=None):
     if not setting:
         return default_value
     
-    # Return the appropriate value based on type
-    if setting.string_value is not None:
-        return setting.string_value
-    elif setting.integer_value is not None:
-        return setting.integer_value
-    elif setting.boolean_value is not None:
-        return setting.boolean_value
-    elif setting.json_value is not None:
-        return setting.json_value
+    try:
+        value = decode_value(
+            key, setting.string_value, setting.integer_value, setting.boolean_value, setting.json_value
+        )
+    except ValueError:
+        return default_value
     
-    return default_value
+    return default_value if value is None else value
 
 
 async def save_prompt_to_history(db: AsyncSession, prompt_text: str, changed_by: str = "admin", description: str = None):
@@ -91,6 +89,7 @@ class PromptTestRequest(BaseModel):
     model: str = "gpt-4"
     temperature: float = 0.8
     max_tokens: int = 800
+    use_cache: bool = True  # False forces a fresh OpenAI call
 
 
 class PromptTestResponse(BaseModel):
@@ -99,6 +98,7 @@ class PromptTestResponse(BaseModel):
     blocks: List[str]
     is_crisis: bool
     processing_time: float
+    cached: bool = False
     error: Optional[str] = None
 
 
@@ -113,14 +113,17 @@ async def test_prompt(
     start_time = time.time()
     
     try:
-        # Direct OpenAI call for prompt testing
+        # OpenAI call for prompt testing, replayed from the LLM cache for repeated runs
         from openai import AsyncOpenAI
         from shared.config.settings import settings as app_settings
+        from shared.services.llm_cache import llm_cache
         
         client = AsyncOpenAI(api_key=app_settings.openai_api_key)
         
         # Test the prompt directly
-        response = await client.chat.completions.create(
+        completion = await llm_cache.complete(
+            client,
+            use_cache=request.use_cache,
             model=request.model,
             messages=[
                 {"role": "system", "content": request.prompt},
@@ -130,8 +133,8 @@ async def test_prompt(
             temperature=request.temperature
         )
         
-        result_text = response.choices[0].message.content.strip()
-        token_count = response.usage.total_tokens if response.usage else 0
+        result_text = completion["content"].strip()
+        token_count = completion["total_tokens"]
         
         # Simple crisis detection
         crisis_keywords = ["не хочу жить", "покончить", "суицид", "убить себя", "бессмысленно"]
@@ -144,7 +147,8 @@ async def test_prompt(
             'response': result_text,
             'token_count': token_count,
             'blocks': blocks,
-            'is_crisis': is_crisis
+            'is_crisis': is_crisis,
+            'cached': completion["cached"]
         }
         
         processing_time = time.time() - start_time
@@ -155,6 +159,7 @@ async def test_prompt(
             blocks=result.get('blocks', []),
             is_crisis=result.get('is_crisis', False),
             processing_time=round(processing_time, 2),
+            cached=result.get('cached', False),
             error=result.get('error')
         )
         
@@ -253,6 +258,7 @@ class GreetingTestRequest(BaseModel):
     user_profile: Dict
     scenario: str = "first_time"
     time_of_day: Optional[str] = None
+    use_cache: bool = True  # False forces fresh OpenAI calls
 
 
 class GreetingTestResponse(BaseModel):
@@ -279,7 +285,8 @@ async def test_greeting(
         greeting = await greeting_service.generate_greeting(
             request.user_profile,
             request.scenario,
-            request.time_of_day
+            request.time_of_day,
+            use_cache=request.use_cache
         )
         
         processing_time = time.time() - start_time
@@ -345,7 +352,7 @@ async def get_greeting_scenarios():
 @router.post("/generate-multiple-greetings")
 async def generate_multiple_greetings(
     request: GreetingTestRequest,
-    count: int = 3,
+    count: int = Query(3, ge=1, le=10),
     db: AsyncSession = Depends(get_db)
 ):
     """Generate multiple greeting variations"""
@@ -355,7 +362,8 @@ async def generate_multiple_greetings(
         
         greetings = await greeting_service.generate_multiple_greetings(
             request.user_profile,
-            count
+            count,
+            use_cache=request.use_cache
         )
         
         return {
@@ -7,12 +7,14 @@ from datetime import datetime
 import sys
 import os
 import json
-import redis.asyncio as redis
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../'))
 
 from shared.config.database import get_db
+from shared.config.redis import get_redis
 from shared.models.settings import Settings
+from shared.config.settings_registry import encode_value
+from shared.services.message_templates import render
 from shared.models.prompt_history import PromptHistory
 from sqlalchemy import desc
 
@@ -59,12 +61,14 @@ async def save_prompt_to_history(db: AsyncSession, prompt_text: str, changed_by:
 
 async def invalidate_settings_cache(key: str, value: Any):
     try:
-        redis_client = redis.from_url("redis://localhost:6379", decode_responses=True)
+        # The shared client follows settings.redis_url, so the bots see the broadcast
+        redis_client = await get_redis()
+        if not redis_client:
+            return
         # Invalidate the bot settings cache
         await redis_client.delete("bot_settings_cache")
         # Also publish to pubsub for any other listeners
         await redis_client.publish("settings_update", json.dumps({"key": key, "value": value}))
-        await redis_client.close()
     except:
         pass
 
@@ -171,27 +175,15 @@ async def update_setting(
     # Debug: log received value
     print(f"DEBUG: Updating {key} with value: {setting_update.value} (type: {type(setting_update.value)})")
     
-    # Clear all value fields first
-    setting.string_value = None
-    setting.integer_value = None
-    setting.boolean_value = None
-    setting.json_value = None
-    
-    # Set appropriate value field based on type
-    # IMPORTANT: Check bool BEFORE int because bool is subclass of int in Python
+    # Typed and validated against the settings registry
     value = setting_update.value
-    if isinstance(value, bool):  # Must check bool first!
-        setting.boolean_value = value
-        print(f"DEBUG: Set boolean_value = {value}")
-    elif isinstance(value, str):
-        setting.string_value = value
-        print(f"DEBUG: Set string_value = {value}")
-    elif isinstance(value, int):
-        setting.integer_value = value
-        print(f"DEBUG: Set integer_value = {value}")
-    else:
-        setting.json_value = value
-        print(f"DEBUG: Set json_value = {value}")
+    try:
+        columns = encode_value(key, value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    for column, column_value in columns.items():
+        setattr(setting, column, column_value)
     
     setting.changed_by = setting_update.changed_by
     setting.changed_at = datetime.utcnow()
@@ -243,17 +235,14 @@ async def create_setting(
         changed_at=datetime.utcnow()
     )
     
-    # Set appropriate value field
-    # IMPORTANT: Check bool BEFORE int because bool is subclass of int in Python
-    value = setting_create.value
-    if isinstance(value, bool):  # Must check bool first!
-        setting.boolean_value = value
-    elif isinstance(value, str):
-        setting.string_value = value
-    elif isinstance(value, int):
-        setting.integer_value = value
-    else:
-        setting.json_value = value
+    # Typed and validated against the settings registry
+    try:
+        columns = encode_value(setting_create.key, setting_create.value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    for column, column_value in columns.items():
+        setattr(setting, column, column_value)
     
     db.add(setting)
     await db.commit()
@@ -288,11 +277,8 @@ async def preview_setting_template(
     if not template:
         return {"preview": "No template content found"}
     
-    # Apply variable substitutions
-    preview_text = template
-    for var_name, var_value in preview_data.items():
-        placeholder = "{" + var_name + "}"
-        preview_text = preview_text.replace(placeholder, str(var_value))
+    # Same engine the bot renders with
+    preview_text = render(template, {var_name: str(var_value) for var_name, var_value in preview_data.items()})
     
     return {"preview": preview_text, "variables_used": list(preview_data.keys())}
 
@@ -1,15 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from datetime import datetime
+import json
 import psutil
 import sys
 import os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../'))
 
-from shared.config.settings import settings
+from shared.config.database import pool_metrics
+from shared.config.db_pool import aggregate_snapshots, process_key
+from shared.config.redis import get_redis
 
 router = APIRouter()
+# Process internals: mounted with admin auth in main.py
+admin_router = APIRouter()
 
 
 class SystemStatsResponse(BaseModel):
@@ -76,6 +81,63 @@ async def get_system_stats():
     )
 
 
+@admin_router.get("/db-pool")
+async def get_db_pool_metrics():
+    """
+    Connection pool usage summed per role, plus the snapshot of every process.
+    This worker reports live numbers, the others what they published last.
+    """
+    
+    processes = {process_key(): pool_metrics()}
+    
+    redis_client = await get_redis()
+    if redis_client:
+        # Every process publishes under db_pool_metrics:<role>:<host>:<pid> every minute
+        async for key in redis_client.scan_iter(match="db_pool_metrics:*"):
+            process = key.split(':', 1)[1]
+            if process not in processes:
+                data = await redis_client.get(key)
+                if data:
+                    processes[process] = json.loads(data)
+    
+    pools_by_role = {}
+    for process, metrics in processes.items():
+        role = process.split(':', 1)[0]
+        for pool, snapshot in metrics.items():
+            pools_by_role.setdefault(role, {}).setdefault(pool, []).append(snapshot)
+    
+    return {
+        "roles": {
+            role: {pool: aggregate_snapshots(snapshots) for pool, snapshots in pools.items()}
+            for role, pools in pools_by_role.items()
+        },
+        "processes": processes
+    }
+
+
+@admin_router.get("/typing")
+async def get_typing_metrics():
+    """
+    Chat-action calls requested by bot code vs. actually sent, per bot process
+    (keyed <role>:<host>:<pid>).
+    
+    `saved` is an estimate: `requested` counts pulse/acquire calls plus the
+    refreshes each lease holder's own loop would have sent, which is modelled
+    rather than observed. `sent` and `failed` are exact.
+    """
+    
+    metrics = {}
+    
+    redis_client = await get_redis()
+    if redis_client:
+        async for key in redis_client.scan_iter(match="typing_metrics:*"):
+            data = await redis_client.get(key)
+            if data:
+                metrics[key.split(':', 1)[1]] = json.loads(data)
+    
+    return metrics
+
+
 @router.get("/logs")
 async def get_recent_logs():
     """Get recent system logs (placeholder)"""
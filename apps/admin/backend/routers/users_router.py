@@ -1,18 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, and_, or_, delete, text
+from sqlalchemy import select, func, desc, and_, or_, tuple_, true
+from sqlalchemy.orm import aliased
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timedelta
+import base64
 import sys
 import os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../'))
 
-from shared.config.database import get_db
+from shared.config.database import get_db, get_read_db
+from shared.config.redis import RedisCache
 from shared.models.user import User
 from shared.models.subscription import Subscription
-from shared.models.analytics import Event
+from shared.analytics.rollups import count_active_users, count_new_users
+from shared.services.user_deletion_service import user_deletion_service
+from ..response_cache import cached_response
 
 router = APIRouter()
 
@@ -28,7 +33,7 @@ class UserResponse(BaseModel):
     terms_accepted: bool
     is_active: bool
     is_in_crisis: bool
-    created_at: datetime
+    created_at: Optional[datetime]
     
     # Subscription info
     subscription_active: bool = False
@@ -51,7 +56,8 @@ class UserStatsResponse(BaseModel):
 
 
 @router.get("/stats", response_model=UserStatsResponse)
-async def get_user_stats(db: AsyncSession = Depends(get_db)):
+@cached_response()
+async def get_user_stats(db: AsyncSession = Depends(get_read_db)):
     """Get user statistics"""
     
     now = datetime.utcnow()
@@ -63,24 +69,11 @@ async def get_user_stats(db: AsyncSession = Depends(get_db)):
     total_users = total_result.scalar()
     
     # New users today
-    new_today_result = await db.execute(
-        select(func.count(User.id)).where(User.created_at >= today)
-    )
-    new_users_today = new_today_result.scalar()
-    
-    # Active users (users with events today)
-    active_today_result = await db.execute(
-        select(func.count(func.distinct(Event.user_id)))
-        .where(Event.created_at >= today)
-    )
-    active_users_today = active_today_result.scalar()
+    new_users_today = await count_new_users(db, today)
     
-    # Active users this week
-    active_week_result = await db.execute(
-        select(func.count(func.distinct(Event.user_id)))
-        .where(Event.created_at >= week_ago)
-    )
-    active_users_week = active_week_result.scalar()
+    # Active users today / this week (daily active-user sets + raw tail)
+    active_users_today = await count_active_users(db, today)
+    active_users_week = await count_active_users(db, week_ago)
     
     # Subscribers (active subscriptions)
     subscribers_result = await db.execute(
@@ -110,41 +103,93 @@ async def get_user_stats(db: AsyncSession = Depends(get_db)):
     )
 
 
+def _encode_cursor(created_at: Optional[datetime], user_id: int) -> str:
+    raw = f"{created_at.isoformat() if created_at else ''}|{user_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, user_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return (datetime.fromisoformat(created_at) if created_at else None), int(user_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after_cursor(created_at: Optional[datetime], user_id: int):
+    """
+    Rows after the cursor in (created_at DESC NULLS FIRST, id DESC) order,
+    the order a backward scan of ix_users_created_at_id returns. Users
+    without created_at come first; a row comparison alone would never
+    reach them.
+    """
+    if created_at is None:
+        return or_(
+            and_(User.created_at.is_(None), User.id < user_id),
+            User.created_at.isnot(None)
+        )
+    return tuple_(User.created_at, User.id) < tuple_(created_at, user_id)
+
+
+def _escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
 @router.get("/", response_model=List[UserResponse])
 async def get_users(
-    page: int = Query(1, ge=1),
+    response: Response,
+    cursor: Optional[str] = None,
     size: int = Query(20, ge=1, le=100),
     search: Optional[str] = None,
     active_only: bool = True,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get paginated list of users"""
+    """
+    Get a page of users, newest first.
+    
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
+    """
     
     try:
-        # Build query with filters
-        query = select(User)
+        # Latest subscription of each user, fetched in the same query
+        latest_subscription = (
+            select(Subscription)
+            .where(Subscription.user_id == User.id)
+            .order_by(desc(Subscription.created_at))
+            .limit(1)
+            .lateral()
+        )
+        subscription_alias = aliased(Subscription, latest_subscription)
+        
+        query = (
+            select(User, subscription_alias)
+            .outerjoin(latest_subscription, true())
+        )
         
         if active_only:
             query = query.where(User.is_active == True)
         
         if search:
+            # Served by the pg_trgm GIN indexes
+            pattern = f"%{_escape_like(search)}%"
             query = query.where(
                 or_(
-                    User.name.ilike(f"%{search}%"),
-                    User.telegram_id.ilike(f"%{search}%"),
-                    User.city.ilike(f"%{search}%")
+                    User.name.ilike(pattern),
+                    User.telegram_id.ilike(pattern),
+                    User.city.ilike(pattern)
                 )
             )
         
-        query = query.order_by(desc(User.created_at))
-        query = query.offset((page - 1) * size).limit(size)
+        if cursor:
+            query = query.where(_after_cursor(*_decode_cursor(cursor)))
+        
+        query = query.order_by(desc(User.created_at).nulls_first(), desc(User.id)).limit(size)
         
         result = await db.execute(query)
-        user_list = result.scalars().all()
+        rows = result.all()
         
         users = []
-        for user in user_list:
-            # Create UserResponse manually 
+        for user, subscription in rows:
             user_response = UserResponse(
                 id=user.id,
                 telegram_id=user.telegram_id,
@@ -159,17 +204,8 @@ async def get_users(
                 created_at=user.created_at
             )
             
-            # Get latest subscription for this user
-            subscription_result = await db.execute(
-                select(Subscription)
-                .where(Subscription.user_id == user.id)
-                .order_by(desc(Subscription.created_at))
-                .limit(1)
-            )
-            subscription = subscription_result.scalars().first()
-            
             if subscription:
-                user_response.subscription_active = subscription.is_active and subscription.ends_at > datetime.utcnow()
+                user_response.subscription_active = subscription.is_paid_active()
                 user_response.subscription_plan = subscription.plan_name
                 user_response.subscription_ends_at = subscription.ends_at
                 user_response.daily_messages_used = subscription.daily_messages_used
@@ -177,14 +213,20 @@ async def get_users(
             
             users.append(user_response)
         
+        if len(rows) == size:
+            last_user = rows[-1][0]
+            response.headers["X-Next-Cursor"] = _encode_cursor(last_user.created_at, last_user.id)
+        
         return users
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in get_users: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get specific user details"""
     
     # Get latest subscription (active or inactive) to match bot logic
@@ -205,7 +247,7 @@ async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
     user_response = UserResponse.model_validate(user)
     
     if subscription:
-        user_response.subscription_active = subscription.is_active and subscription.ends_at > datetime.utcnow()
+        user_response.subscription_active = subscription.is_paid_active()
         user_response.subscription_plan = subscription.plan_name
         user_response.subscription_ends_at = subscription.ends_at
         user_response.daily_messages_used = subscription.daily_messages_used
@@ -308,6 +350,11 @@ async def toggle_user_subscription(user_id: int, db: AsyncSession = Depends(get_
     
     await db.commit()
     
+    try:
+        await RedisCache().invalidate_entitlement(user_id)
+    except Exception as e:
+        print(f"Error invalidating entitlement cache: {e}")
+    
     return {
         "message": message,
         "subscription_active": active
@@ -326,57 +373,7 @@ async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
     
     try:
-        # Manual deletion in correct order to handle FK constraints
-        from shared.models.subscription import Subscription
-        from shared.models.conversation import Conversation, Message
-        from shared.models.analytics import Event
-        from shared.models.crisis import CrisisEvent
-        
-        # 1. Delete analytics events  
-        try:
-            await db.execute(delete(Event).where(Event.user_id == user_id))
-        except Exception:
-            # Try alternative table name
-            await db.execute(text(f"DELETE FROM analytics_events WHERE user_id = {user_id}"))
-        
-        # 2. Delete crisis events  
-        await db.execute(delete(CrisisEvent).where(CrisisEvent.user_id == user_id))
-        
-        # 3. Delete conversation messages first, then conversations
-        conversations_result = await db.execute(
-            select(Conversation.id).where(Conversation.user_id == user_id)
-        )
-        conversation_ids = [row[0] for row in conversations_result.fetchall()]
-        
-        for conv_id in conversation_ids:
-            # Delete conversation summaries first
-            await db.execute(text(f"DELETE FROM conversation_summaries WHERE conversation_id = {conv_id}"))
-            # Delete messages
-            await db.execute(delete(Message).where(Message.conversation_id == conv_id))
-        
-        await db.execute(delete(Conversation).where(Conversation.user_id == user_id))
-        
-        # 4. Delete subscriptions
-        await db.execute(delete(Subscription).where(Subscription.user_id == user_id))
-        
-        # 5. Delete memory anchors if exist
-        try:
-            from shared.models.memory import MemoryAnchor
-            await db.execute(delete(MemoryAnchor).where(MemoryAnchor.user_id == user_id))
-        except ImportError:
-            pass  # Model might not exist
-        
-        # 6. Delete user sessions if exist
-        try:
-            from shared.models.user_session import UserSession
-            await db.execute(delete(UserSession).where(UserSession.user_id == user_id))
-        except ImportError:
-            pass  # Model might not exist
-        
-        # 7. Finally delete the user
-        await db.execute(delete(User).where(User.id == user_id))
-        
-        await db.commit()
+        await user_deletion_service.delete_user(db, user_id)
         
         return {
             "message": f"User {user.name or user.telegram_id} deleted successfully",
@@ -389,4 +386,24 @@ async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to delete user: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+class BulkDeleteRequest(BaseModel):
+    user_ids: List[int]
+
+
+@router.post("/bulk-delete", status_code=202)
+async def bulk_delete_users(request: BulkDeleteRequest, background_tasks: BackgroundTasks):
+    """Delete many users in the background, in small chunks"""
+    
+    user_ids = list(dict.fromkeys(request.user_ids))
+    if not user_ids:
+        raise HTTPException(status_code=400, detail="No user IDs given")
+    
+    background_tasks.add_task(user_deletion_service.delete_users, user_ids)
+    
+    return {
+        "message": f"Deletion of {len(user_ids)} users scheduled",
+        "scheduled": len(user_ids)
+    }
@@ -11,7 +11,7 @@ interface User {
   terms_accepted: boolean;
   is_active: boolean;
   is_in_crisis: boolean;
-  created_at: string;
+  created_at: string | null;
   subscription_active: boolean;
   subscription_plan?: string;
   subscription_ends_at?: string;
@@ -197,7 +197,7 @@ export default function Users() {
                         </div>
                       </td>
                       <td className="py-3 text-sm text-gray-600">
-                        {new Date(user.created_at).toLocaleDateString('ru-RU')}
+                        {user.created_at ? new Date(user.created_at).toLocaleDateString('ru-RU') : '—'}
                       </td>
                       <td className="py-3">
                         <div className="flex gap-1">
@@ -3,6 +3,7 @@ import json
 import redis.asyncio as redis
 import logging
 from services.settings_service import SettingsService
+from shared.config.settings import settings
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +14,7 @@ class CacheInvalidationListener:
     
     async def start(self):
         try:
-            self.redis_client = redis.from_url("redis://localhost:6379", decode_responses=True)
+            self.redis_client = redis.from_url(settings.redis_url, decode_responses=True)
             pubsub = self.redis_client.pubsub()
             await pubsub.subscribe("settings_update")
             
@@ -23,13 +24,15 @@ class CacheInvalidationListener:
                 if message["type"] == "message":
                     try:
                         data = json.loads(message["data"])
-                        key = data.get("key")
+                        # Batch updates (e.g. defaults bootstrap) send "keys"
+                        keys = data.get("keys") or [data.get("key")]
                         
                         # Invalidate cache in all registered settings services
                         for service in self.settings_services:
-                            await service.invalidate_cache_key(key)
+                            for key in keys:
+                                await service.invalidate_cache_key(key)
                         
-                        logger.info(f"Invalidated cache for setting: {key}")
+                        logger.info(f"Invalidated cache for settings: {', '.join(map(str, keys))}")
                     except Exception as e:
                         logger.error(f"Error processing cache invalidation: {e}")
         except Exception as e:
@@ -21,7 +21,7 @@ async def consent_accept_handler(callback: types.CallbackQuery):
         user = await user_service.get_or_create_user(telegram_id)
         
         # Get current policy version
-        policy_version = await settings_service.get_setting("policy_version", "v1")
+        policy_version = await settings_service.get_setting("policy_version")
         
         # Accept terms
         await user_service.accept_terms(user, policy_version)
@@ -54,10 +54,7 @@ async def show_full_policy_handler(callback: types.CallbackQuery):
     async with async_session() as session:
         settings_service = SettingsService(session)
         
-        full_policy = await settings_service.get_setting(
-            "full_privacy_policy",
-            "📄 <b>Политика конфиденциальности</b>\n\n🏥 <b>Что мы делаем:</b>\n• Предоставляем эмоциональную поддержку\n• Помогаем разобраться в чувствах\n• Сохраняем полную анонимность\n\n⚠️ <b>Ограничения:</b>\n• Это не замена психотерапии\n• Мы не врачи и не психологи\n• В кризисе звоните 112 🆘\n\n🛡️ <b>Безопасность:</b>\n• Не сохраняем содержание сообщений\n• Вы можете удалить данные в любое время"
-        )
+        full_policy = await settings_service.get_setting("full_privacy_policy")
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="⬅️ К началу", callback_data="back_to_consent")],
@@ -1,15 +1,17 @@
-import asyncio
 from aiogram import Dispatcher, types, F
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 import sys
 sys.path.append('../../../')
 
 from shared.config.database import async_session
+from shared.config.settings_registry import BotConfig
 from services.user_service import UserService
 from services.conversation_service import ConversationService
 from services.gpt_service import GPTService
 from services.rhythm_service import RhythmService
 from services.settings_cache import settings_cache
+from services.outbound_scheduler import outbound_scheduler
+from services.typing_manager import typing_manager
 from utils.ux_helper import UXHelper, OnboardingUX, AnimatedMessages
 
 
@@ -41,7 +43,7 @@ async def dialog_message_handler(message: types.Message):
             return
         
         # Show typing indicator IMMEDIATELY after receiving message
-        await message.bot.send_chat_action(message.chat.id, "typing")
+        await typing_manager.pulse(message.bot, message.chat.id)
         
         # Check if user can send messages
         limit_check = await conv_service.can_user_send_message(user)
@@ -50,14 +52,13 @@ async def dialog_message_handler(message: types.Message):
             await show_paywall(message, limit_check)
             return
         
+        reply_stored = False
+        # Typing stays on through DB work and the GPT call (which joins this lease)
+        typing = typing_manager.acquire(message.bot, message.chat.id)
         try:
-            # Start continuous typing task for long operations
-            typing_task = asyncio.create_task(
-                rhythm_service._maintain_typing_indicator(message.bot, message.chat.id)
-            )
             
-            # Load settings from Redis cache (much faster than 6 DB queries)
-            settings_dict = await settings_cache.get_bot_settings()
+            # Decoded settings snapshot, no I/O
+            cfg = settings_cache.config
             
             # Execute database operations efficiently
             conversation = await conv_service.get_or_create_active_conversation(user)
@@ -65,7 +66,7 @@ async def dialog_message_handler(message: types.Message):
             history = await conv_service.get_conversation_history(conversation)
             
             # Get memory context if enabled
-            if settings_dict['long_memory_enabled']:
+            if cfg.long_memory_enabled:
                 enhanced_context = await conv_service.get_enhanced_conversation_context(user, history)
                 memory_anchors = enhanced_context.get('memory_anchors', [])
             else:
@@ -81,31 +82,24 @@ async def dialog_message_handler(message: types.Message):
                 'memory_anchors': memory_anchors
             }
             
-            # Stop the continuous typing task before GPT call (GPT service has its own typing)
-            typing_task.cancel()
-            try:
-                await typing_task
-            except asyncio.CancelledError:
-                pass
-            
             # Generate response with continued typing
             gpt_response = await gpt_service.generate_response(
                 message.text or "",
                 user_profile,
                 history,
-                settings_dict,
+                cfg,
                 bot=message.bot,
                 chat_id=message.chat.id
             )
             
             # Handle crisis response
             if gpt_response['is_crisis']:
+                # Crisis replies don't count against the daily limit
+                await conv_service.release_daily_message(user, limit_check)
+                reply_stored = True
                 await handle_crisis_response(message, user, user_service, conv_service, conversation)
                 return
             
-            # Consume daily message (only for non-subscribers)
-            await conv_service.consume_daily_message(user)
-            
             # Add assistant message to conversation
             await conv_service.add_message(
                 conversation, 
@@ -113,13 +107,15 @@ async def dialog_message_handler(message: types.Message):
                 gpt_response['response'],
                 gpt_response['token_count']
             )
+            reply_stored = True
             
-            # Send response with beautiful rhythm (pass settings to avoid DB calls)
+            # Queue the response with its rhythm; delivery happens after the session is released
+            typing.release()
             await rhythm_service.send_blocks_with_rhythm(
                 message, 
                 gpt_response['blocks'], 
                 user.id,  # type: ignore
-                settings_dict  # Pass settings to avoid additional DB queries
+                cfg
             )
             print(f"[DEBUG] GPT response sent, checking limit warning: remaining={limit_check.get('remaining')}")
             
@@ -141,13 +137,14 @@ async def dialog_message_handler(message: types.Message):
                 print(f"[DEBUG] Showing warning: remaining_after={remaining_after}")
                 if remaining_after > 0:
                     warning_text = f"⏰ <b>Внимание!</b>\n\nОсталось <b>{remaining_after}</b> бесплатных сообщений на сегодня"
-                    await UXHelper.smooth_answer(
-                        message, 
-                        warning_text,
-                        typing_delay=0.5
-                    )
+                    # Queued behind the reply blocks of the same chat
+                    outbound_scheduler.enqueue_blocks(message.bot, message.chat.id, [warning_text], cfg)
             
         except Exception as e:
+            # The reserved daily message is only spent on a stored reply
+            if not reply_stored:
+                await conv_service.release_daily_message(user, limit_check)
+            
             # Beautiful error handling with RhythmService
             await rhythm_service.send_error_with_retry(
                 message,
@@ -155,28 +152,13 @@ async def dialog_message_handler(message: types.Message):
                 "retry_dialog"
             )
             print(f"Dialog error: {e}")
+        finally:
+            typing.release()
 
 
-async def send_response_blocks(message: types.Message, blocks: list, settings_dict: dict):
+async def send_response_blocks(message: types.Message, blocks: list, cfg: BotConfig):
     """Send response blocks with natural delays and beautiful UX"""
-    
-    delay_min = settings_dict['delay_between_blocks_min'] / 1000  # Convert to seconds
-    delay_max = settings_dict['delay_between_blocks_max'] / 1000
-    
-    for i, block in enumerate(blocks):
-        if i > 0:  # No delay before first block
-            # Random delay between blocks
-            import random
-            delay = random.uniform(delay_min, delay_max)
-            await asyncio.sleep(delay)
-        
-        # Show typing action with UX helper
-        await UXHelper.typing_action(message.chat.id, message.bot, duration=1.0)
-        
-        # No action buttons needed
-        keyboard = None
-        
-        await message.answer(block, reply_markup=keyboard, parse_mode="HTML")
+    outbound_scheduler.enqueue_blocks(message.bot, message.chat.id, blocks, cfg)
 
 
 async def show_paywall(message: types.Message, limit_check: dict):
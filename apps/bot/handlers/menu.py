@@ -1,31 +1,17 @@
 from aiogram import Dispatcher, types, F
 from aiogram.filters import Command
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup
 import sys
 sys.path.append('../../../')
 
 from shared.config.database import async_session
 from services.user_service import UserService
+from utils.keyboard_cache import keyboard_cache
 
 
 async def show_main_menu() -> ReplyKeyboardMarkup:
-    """Create main reply keyboard menu"""
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [
-                KeyboardButton(text="🙋 Мой профиль"),
-                KeyboardButton(text="💳 Подписка"),
-                KeyboardButton(text="ℹ️ Помощь")
-            ],
-            [
-                KeyboardButton(text="💭 Продолжить"),
-                KeyboardButton(text="🔄 Новая тема")
-            ]
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=False
-    )
-    return keyboard
+    """Create main reply keyboard menu (built once, shared by all users)"""
+    return keyboard_cache.main_menu()
 
 
 async def menu_handler(message: types.Message):
@@ -1,6 +1,6 @@
 from aiogram import Dispatcher, types, F
 from aiogram.filters import Command
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy import select, desc
@@ -11,8 +11,12 @@ sys.path.append('../../../')
 from shared.config.database import async_session
 from shared.models.user import User
 from shared.models.subscription import Subscription
+from shared.services.user_deletion_service import user_deletion_service
 from services.user_service import UserService
 from services.conversation_service import ConversationService
+from services.quota_service import quota_service
+from services.typing_manager import typing_manager
+from utils.keyboard_cache import keyboard_cache
 
 
 class ProfileStates(StatesGroup):
@@ -20,23 +24,8 @@ class ProfileStates(StatesGroup):
 
 
 async def show_main_menu():
-    """Create main menu keyboard"""
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [
-                KeyboardButton(text="🙋 Мой профиль"),
-                KeyboardButton(text="💳 Подписка"),
-                KeyboardButton(text="ℹ️ Помощь")
-            ],
-            [
-                KeyboardButton(text="💭 Продолжить"),
-                KeyboardButton(text="🔄 Новая тема")
-            ]
-        ],
-        resize_keyboard=True,
-        persistent=True
-    )
-    return keyboard
+    """Create main menu keyboard (built once, shared by all users)"""
+    return keyboard_cache.main_menu()
 
 
 async def profile_handler(message: types.Message):
@@ -80,21 +69,21 @@ async def profile_handler(message: types.Message):
         profile_text += "\n\n"
         
         # Emotions and topics
-        if user.emotion_tags:
-            emotions_text = ", ".join([tag.split(" ", 1)[1] if " " in tag else tag for tag in user.emotion_tags[:5]])
-            if len(user.emotion_tags) > 5:
+        if user.emotion_names:
+            emotions_text = ", ".join(user.emotion_names[:5])
+            if len(user.emotion_names) > 5:
                 emotions_text += "..."
             profile_text += f"**Эмоции:** {emotions_text}\n"
         
-        if user.topic_tags:
-            topics_text = ", ".join([tag.split(" ", 1)[1] if " " in tag else tag for tag in user.topic_tags[:5]])
-            if len(user.topic_tags) > 5:
+        if user.topic_names:
+            topics_text = ", ".join(user.topic_names[:5])
+            if len(user.topic_names) > 5:
                 topics_text += "..."
             profile_text += f"**Темы:** {topics_text}\n"
         
         # Subscription status
         profile_text += "\n**💳 Подписка:**\n"
-        if subscription and subscription.is_active and subscription.ends_at and subscription.ends_at > datetime.utcnow():
+        if subscription and subscription.is_paid_active():
             # Active subscription
             profile_text += f"✅ Активна до {subscription.ends_at.strftime('%d.%m.%Y')}"
         elif subscription and subscription.ends_at and subscription.ends_at < datetime.utcnow() and subscription.plan_name:
@@ -105,8 +94,11 @@ async def profile_handler(message: types.Message):
             profile_text += "❌ Подписка отсутствует"
         
         # Daily messages info for free users
-        if subscription and (not subscription.is_active or subscription.ends_at <= datetime.utcnow()):
-            profile_text += f"\n📝 Сообщений сегодня: {subscription.daily_messages_used}/{subscription.daily_messages_limit}"
+        if subscription and not subscription.is_paid_active():
+            used_today = await quota_service.get_used(user.id)
+            if used_today is None:
+                used_today = subscription.daily_messages_used
+            profile_text += f"\n📝 Сообщений сегодня: {used_today}/{subscription.daily_messages_limit}"
         
         # Profile action buttons
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -245,9 +237,8 @@ async def handle_delete_confirmation(message: types.Message, state: FSMContext):
             user = result.scalar_one_or_none()
             
             if user:
-                # Delete all related data (cascade should handle this)
-                await session.delete(user)
-                await session.commit()
+                # Delete all related data and cached keys
+                await user_deletion_service.delete_user(session, user.id)
         
         await message.answer(
             "🚫 Профиль полностью удален.\n\n"
@@ -288,7 +279,7 @@ async def subscription_menu_handler(message: types.Message):
         settings_service = SettingsService(session)
         
         # Get subscription plans from admin settings
-        plans = await settings_service.get_setting("subscription_plans", [])
+        plans = await settings_service.get_setting("subscription_plans")
         
         # Check if plans are configured
         if not plans:
@@ -312,7 +303,7 @@ async def subscription_menu_handler(message: types.Message):
         # Build subscription status text
         text = "💳 **Подписка**\n\n"
         
-        if subscription and subscription.is_active and subscription.ends_at and subscription.ends_at > datetime.utcnow():
+        if subscription and subscription.is_paid_active():
             text += f"✅ **Активна до:** {subscription.ends_at.strftime('%d.%m.%Y %H:%M')}\n\n"
         elif subscription and subscription.ends_at and subscription.ends_at < datetime.utcnow() and subscription.plan_name:
             text += f"❌ **Истекла:** {subscription.ends_at.strftime('%d.%m.%Y %H:%M')}\n\n"
@@ -370,18 +361,19 @@ async def continue_handler(message: types.Message):
         history = await conv_service.get_conversation_history(conversation)
         
         if not history:
+            await conv_service.release_daily_message(user, limit_check)
             await message.answer("💭 Давайте сначала начнем диалог! Расскажите, что у вас на душе?")
             return
         
         # Show typing
-        await message.bot.send_chat_action(message.chat.id, "typing")
+        await typing_manager.pulse(message.bot, message.chat.id)
         
         # Generate continue response
         from services.gpt_service import GPTService
         from services.settings_cache import settings_cache
         
         gpt_service = GPTService()
-        settings_dict = await settings_cache.get_bot_settings()
+        cfg = settings_cache.config
         
         user_profile = {
             'name': user.name,
@@ -392,14 +384,11 @@ async def continue_handler(message: types.Message):
         }
         
         # Use special continue prompt
-        continue_prompt = settings_dict.get('continue_prompt', 
-            "Продолжи мысль, дай развернутый совет или поддержку. Будь эмпатичным и полезным.")
-        
         gpt_response = await gpt_service.generate_continue_response(
             user_profile,
             history,
-            settings_dict,
-            continue_prompt,
+            cfg,
+            cfg.continue_prompt,
             bot=message.bot,
             chat_id=message.chat.id
         )
@@ -407,12 +396,10 @@ async def continue_handler(message: types.Message):
         # Handle crisis if detected
         if gpt_response['is_crisis']:
             from .dialog import handle_crisis_response
+            await conv_service.release_daily_message(user, limit_check)
             await handle_crisis_response(message, user, user_service, conv_service, conversation)
             return
         
-        # Consume daily message
-        await conv_service.consume_daily_message(user)
-        
         # Add continue message to conversation
         await conv_service.add_message(
             conversation, 
@@ -428,7 +415,7 @@ async def continue_handler(message: types.Message):
             message, 
             gpt_response['blocks'], 
             user.id,
-            settings_dict
+            cfg
         )
         
         # Log event
@@ -10,6 +10,8 @@ from shared.models.user import User
 from shared.models.analytics import Event
 from services.user_service import UserService
 from services.settings_service import SettingsService
+from services.settings_cache import settings_cache
+from services.greeting_pool import greeting_pool
 from utils.ux_helper import UXHelper, OnboardingUX
 
 
@@ -28,14 +30,11 @@ async def start_handler(message: types.Message):
         await user_service.log_event(user.id, "start")
         
         # Check if user needs to accept terms
-        current_policy_version = await settings_service.get_setting("policy_version", "v1")
+        current_policy_version = await settings_service.get_setting("policy_version")
         
         if not user.terms_accepted or user.policy_version != current_policy_version:
             # Show configurable welcome message first
-            welcome_text = await settings_service.get_setting(
-                "welcome_message", 
-                f"👋 Привет, {user_name}! Добро пожаловать в бота эмоциональной поддержки."
-            )
+            welcome_text = await settings_service.get_setting("welcome_message")
             
             welcome_msg = await UXHelper.smooth_answer(
                 message, 
@@ -71,34 +70,21 @@ async def start_handler(message: types.Message):
             else:
                 # User fully onboarded - show main menu with dynamic greeting
                 from .menu import show_main_menu
-                from services.greeting_service import GreetingService
                 
                 main_menu = await show_main_menu()
                 
                 # Check if dynamic greetings are enabled
-                greeting_enabled = await settings_service.get_setting("greeting_enabled", True)
-                
-                if greeting_enabled:
-                    try:
-                        # Generate personalized return greeting
-                        greeting_service = GreetingService()
-                        user_profile = {
-                            "name": user_name,
-                            "age": user.age,
-                            "emotion_tags": user.emotion_tags or [],
-                            "topic_tags": user.topic_tags or [],
-                            "timezone": user.timezone
-                        }
-                        
-                        welcome_back_text = await greeting_service.generate_greeting(
-                            user_profile,
-                            scenario="return_user"
-                        )
-                        
-                    except Exception as e:
-                        print(f"Failed to generate return greeting: {e}")
-                        # Fallback to static greeting
-                        welcome_back_text = f"🌸 С возвращением, {user_name}! Как дела? Что у тебя на душе?"
+                if settings_cache.config.greeting_enabled:
+                    user_profile = {
+                        "name": user_name,
+                        "age": user.age,
+                        "emotion_tags": user.emotion_tags or [],
+                        "topic_tags": user.topic_tags or [],
+                        "timezone": user.timezone
+                    }
+                    
+                    # Pre-generated greeting (templates when the pool is empty), no GPT wait
+                    welcome_back_text = await greeting_pool.get_greeting(user_profile, "return_user")
                 else:
                     # Static greeting when disabled
                     welcome_back_text = f"🌸 С возвращением, {user_name}! Как дела? Что у тебя на душе?"
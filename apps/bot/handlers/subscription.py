@@ -9,6 +9,7 @@ from services.user_service import UserService
 from services.settings_service import SettingsService
 from services.conversation_service import ConversationService
 from services.payment_service import PaymentService
+from services.entitlement_service import entitlement_service
 from utils.ux_helper import UXHelper
 
 
@@ -18,7 +19,7 @@ async def show_subscription_handler(callback: types.CallbackQuery):
     async with async_session() as session:
         settings_service = SettingsService(session)
         
-        plans = await settings_service.get_setting("subscription_plans", [])
+        plans = await settings_service.get_setting("subscription_plans")
     
     if not plans:
         await callback.message.edit_text(
@@ -58,7 +59,7 @@ async def select_plan_handler(callback: types.CallbackQuery):
     async with async_session() as session:
         settings_service = SettingsService(session)
         
-        plans = await settings_service.get_setting("subscription_plans", [])
+        plans = await settings_service.get_setting("subscription_plans")
         selected_plan = next((p for p in plans if p['name'] == plan_name), None)
         
         if not selected_plan:
@@ -193,7 +194,7 @@ async def process_successful_payment(user_id: int, plan_name: str, payment_provi
         conv_service = ConversationService(session)
         
         # Get plan details
-        plans = await settings_service.get_setting("subscription_plans", [])
+        plans = await settings_service.get_setting("subscription_plans")
         plan = next((p for p in plans if p['name'] == plan_name), None)
         
         if not plan:
@@ -252,6 +253,7 @@ async def process_successful_payment(user_id: int, plan_name: str, payment_provi
             subscription.daily_messages_limit = 999999  # Unlimited for subscribers
         
         await session.commit()
+        await entitlement_service.invalidate(user_id)
         
         # Log payment success
         await user_service.log_event(user_id, "payment_ok", {
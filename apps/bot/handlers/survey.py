@@ -7,8 +7,8 @@ sys.path.append('../../../')
 
 from shared.config.database import async_session
 from services.user_service import UserService
-from services.settings_service import SettingsService
 from utils.ux_helper import UXHelper, OnboardingUX, AnimatedMessages
+from utils.keyboard_cache import keyboard_cache, selection_mask, selected_items
 
 
 class SurveyStates(StatesGroup):
@@ -284,20 +284,7 @@ async def show_timezone_selection(message: types.Message, state: FSMContext):
         "Это поможет мне учитывать ваше время 🕐"
     )
     
-    timezones = [
-        "🇰🇿 МСК-1 (UTC+2)", "🇷🇺 МСК (UTC+3)", "🇷🇺 МСК+1 (UTC+4)",
-        "🇰🇿 МСК+2 (UTC+5)", "🇰🇿 МСК+3 (UTC+6)", "🇷🇺 МСК+4 (UTC+7)",
-        "🇷🇺 МСК+5 (UTC+8)", "🇷🇺 МСК+6 (UTC+9)", "🇷🇺 МСК+7 (UTC+10)",
-        "🇷🇺 МСК+8 (UTC+11)", "🇷🇺 МСК+9 (UTC+12)"
-    ]
-    
-    keyboard = OnboardingUX.create_selection_keyboard(
-        timezones, 
-        "timezone",
-        max_cols=1,  # По одному в строке для удобства
-        done_text="✅ Выбрать",
-        single_choice=True  # Только один выбор
-    )
+    keyboard = keyboard_cache.selection_keyboard("timezone")
     
     await UXHelper.smooth_edit_text(
         message,
@@ -368,26 +355,13 @@ async def timezone_text_handler(message: types.Message, state: FSMContext):
 
 
 async def show_emotions_selection(message: types.Message, state: FSMContext = None):
-    async with async_session() as session:
-        settings_service = SettingsService(session)
-        
-        emotions = await settings_service.get_setting("emotion_tags", [
-            "😰 тревога", "😥 чувство вины", "😡 злость", "😞 усталость",
-            "😔 грусть", "😨 страх", "😤 раздражение", "😟 беспокойство"
-        ])
-    
     question_text = OnboardingUX.format_survey_question(
         "Какие эмоции часто с вами?",
         5, 6,
         "Выберите до 10 вариантов. Это поможет мне лучше понимать ваше состояние 💭"
     )
     
-    keyboard = OnboardingUX.create_selection_keyboard(
-        emotions, 
-        "emotion",
-        max_cols=2,
-        done_text="✅ Продолжить"
-    )
+    keyboard = keyboard_cache.selection_keyboard("emotion")
     
     await UXHelper.smooth_edit_text(
         message,
@@ -420,48 +394,45 @@ async def emotions_text_handler(message: types.Message, state: FSMContext):
 
 
 async def emotion_handler(callback: types.CallbackQuery, state: FSMContext):
+    await toggle_selection(callback, state, "emotion", "selected_emotions", 10, "Максимум 10 эмоций 😊")
+
+
+async def toggle_selection(
+    callback: types.CallbackQuery,
+    state: FSMContext,
+    prefix: str,
+    data_key: str,
+    limit: int,
+    limit_text: str
+):
+    """Переключить пункт списка: выбор хранится битовой маской, клавиатура берётся из кэша"""
     data = await state.get_data()
-    selected_emotions = data.get("selected_emotions", set())
+    mask = selection_mask(data.get(data_key))
     
-    emotion_index = callback.data.replace("emotion_", "")
+    index = int(callback.data[len(prefix) + 1:])
+    bit = 1 << index
     
-    if emotion_index in selected_emotions:
-        selected_emotions.remove(emotion_index)
-        await callback.answer(f"❌ Убрал. Выбрано: {len(selected_emotions)}")
+    if mask & bit:
+        mask &= ~bit
+        await callback.answer(f"❌ Убрал. Выбрано: {mask.bit_count()}")
+    elif mask.bit_count() < limit:
+        mask |= bit
+        await callback.answer(f"✅ Добавил! Выбрано: {mask.bit_count()}")
     else:
-        if len(selected_emotions) < 10:
-            selected_emotions.add(emotion_index)
-            await callback.answer(f"✅ Добавил! Выбрано: {len(selected_emotions)}")
-        else:
-            await callback.answer("Максимум 10 эмоций 😊")
-    
-    await state.update_data(selected_emotions=selected_emotions)
+        await callback.answer(limit_text)
+        return
     
-    # Update keyboard to show selections
-    async with async_session() as session:
-        settings_service = SettingsService(session)
-        emotions = await settings_service.get_setting("emotion_tags", [
-            "😰 тревога", "😥 чувство вины", "😡 злость", "😞 усталость",
-            "😔 грусть", "😨 страх", "😤 раздражение", "😟 беспокойство"
-        ])
-    
-    keyboard = OnboardingUX.create_selection_keyboard(
-        emotions, 
-        "emotion",
-        selected_indices=selected_emotions,
-        max_cols=2,
-        done_text="✅ Продолжить"
-    )
+    await state.update_data({data_key: mask})
     
     try:
-        await callback.message.edit_reply_markup(reply_markup=keyboard)
+        await callback.message.edit_reply_markup(reply_markup=keyboard_cache.selection_keyboard(prefix, mask))
     except Exception:
         pass  # Ignore if message is the same
 
 
 async def emotions_done_handler(callback: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    selected_count = len(data.get("selected_emotions", set()))
+    selected_count = selection_mask(data.get("selected_emotions")).bit_count()
     
     if selected_count == 0:
         await callback.answer("Выберите хотя бы одну эмоцию 😊")
@@ -479,26 +450,13 @@ async def emotions_done_handler(callback: types.CallbackQuery, state: FSMContext
 
 
 async def show_topics_selection(message: types.Message, state: FSMContext = None):
-    async with async_session() as session:
-        settings_service = SettingsService(session)
-        
-        topics = await settings_service.get_setting("topic_tags", [
-            "💼 работа", "❤️ отношения", "👨‍👩‍👧 семья", "🏥 здоровье",
-            "💰 деньги", "🎓 учеба", "🤝 друзья", "🏠 быт"
-        ])
-    
     question_text = OnboardingUX.format_survey_question(
         "Какие темы вас волнуют?",
         6, 6,
         "Выберите до 8 тем, о которых хотели бы поговорить 💬"
     )
     
-    keyboard = OnboardingUX.create_selection_keyboard(
-        topics, 
-        "topic",
-        max_cols=2,
-        done_text="🎉 Завершить анкету"
-    )
+    keyboard = keyboard_cache.selection_keyboard("topic")
     
     await UXHelper.smooth_edit_text(
         message,
@@ -531,48 +489,12 @@ async def topics_text_handler(message: types.Message, state: FSMContext):
 
 
 async def topic_handler(callback: types.CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    selected_topics = data.get("selected_topics", set())
-    
-    topic_index = callback.data.replace("topic_", "")
-    
-    if topic_index in selected_topics:
-        selected_topics.remove(topic_index)
-        await callback.answer(f"❌ Убрал. Выбрано: {len(selected_topics)}")
-    else:
-        if len(selected_topics) < 8:
-            selected_topics.add(topic_index)
-            await callback.answer(f"✅ Добавил! Выбрано: {len(selected_topics)}")
-        else:
-            await callback.answer("Максимум 8 тем 😊")
-    
-    await state.update_data(selected_topics=selected_topics)
-    
-    # Update keyboard to show selections
-    async with async_session() as session:
-        settings_service = SettingsService(session)
-        topics = await settings_service.get_setting("topic_tags", [
-            "💼 работа", "❤️ отношения", "👨‍👩‍👧 семья", "🏥 здоровье",
-            "💰 деньги", "🎓 учеба", "🤝 друзья", "🏠 быт"
-        ])
-    
-    keyboard = OnboardingUX.create_selection_keyboard(
-        topics, 
-        "topic",
-        selected_indices=selected_topics,
-        max_cols=2,
-        done_text="🎉 Завершить анкету"
-    )
-    
-    try:
-        await callback.message.edit_reply_markup(reply_markup=keyboard)
-    except Exception:
-        pass  # Ignore if message is the same
+    await toggle_selection(callback, state, "topic", "selected_topics", 8, "Максимум 8 тем 😊")
 
 
 async def topics_done_handler(callback: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    selected_count = len(data.get("selected_topics", set()))
+    selected_count = selection_mask(data.get("selected_topics")).bit_count()
     
     if selected_count == 0:
         await callback.answer("Выберите хотя бы одну тему 😊")
@@ -585,8 +507,8 @@ async def show_confirmation(message: types.Message, state: FSMContext):
     data = await state.get_data()
     
     # Get selected emotion/topic counts
-    emotions_count = len(data.get('selected_emotions', set()))
-    topics_count = len(data.get('selected_topics', set()))
+    emotions_count = selection_mask(data.get('selected_emotions')).bit_count()
+    topics_count = selection_mask(data.get('selected_topics')).bit_count()
     
     # Build beautiful confirmation text
     text = "🎉 <b>Отлично! Анкета заполнена</b>\n\n"
@@ -657,8 +579,9 @@ async def survey_confirm_handler(callback: types.CallbackQuery, state: FSMContex
         user.gender = data.get('gender')
         user.city = data.get('city')
         user.timezone = data.get('timezone')
-        user.emotion_tags = list(data.get('selected_emotions', []))
-        user.topic_tags = list(data.get('selected_topics', []))
+        # Сохраняем подписи, а не индексы: их читают GPT, пинги и аналитика
+        user.emotion_tags = selected_items(keyboard_cache.items("emotion"), selection_mask(data.get('selected_emotions')))
+        user.topic_tags = selected_items(keyboard_cache.items("topic"), selection_mask(data.get('selected_topics')))
         
         await session.commit()
         
@@ -1,4 +1,5 @@
 import asyncio
+import json
 import logging
 import sys
 from aiogram import Bot, Dispatcher
@@ -8,20 +9,35 @@ from aiogram.enums import ParseMode
 sys.path.append('../../')
 
 from shared.config.settings import settings
-from shared.config.database import init_db
-from shared.config.redis import init_redis
+from shared.config.database import init_db, pool_metrics
+from shared.config.db_pool import process_key
+from shared.config.redis import init_redis, get_redis
 from handlers import register_handlers
 from middlewares import ConsentMiddleware, CrisisMiddleware, SurveyMiddleware
+from utils.fsm_storage import create_fsm_storage
 from services.admin_settings_service import AdminSettingsService
 from services.ping_service import PingService
 from services.subscription_reminder_service import SubscriptionReminderService
 from services.cryptocloud_polling_service import CryptoCloudPollingService
+from services.session_sweeper_service import SessionSweeperService
+from services.settings_service import SettingsService
+from services.quota_service import quota_service
+from services.entitlement_service import entitlement_service
 from services.settings_cache import settings_cache
+from services.greeting_pool import greeting_pool
+from services.outbound_scheduler import outbound_scheduler
+from services.typing_manager import typing_manager
 from shared.config.database import async_session
+from shared.analytics.rollups import refresh_rollups, refresh_tag_counts
+from shared.analytics.partitions import ensure_partitions, run_maintenance
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Must stay below the container stop grace period
+OUTBOUND_DRAIN_SECONDS = 25
+
+
 async def ping_scheduler(bot_instance):
     """Background task for periodic ping checks"""
     ping_service = PingService()
@@ -47,24 +63,124 @@ async def subscription_reminder_scheduler(bot_instance):
         await asyncio.sleep(1800)
 
 
+async def session_sweeper_scheduler():
+    """Background task for closing timed-out sessions"""
+    sweeper_service = SessionSweeperService()
+    while True:
+        try:
+            # Also picks up summaries left behind by a crashed or failed worker
+            await sweeper_service.requeue_stale_summaries()
+            await sweeper_service.sweep_expired_sessions()
+        except Exception as e:
+            logger.error(f"Error in session sweeper scheduler: {e}")
+        
+        # Sweep every 10 minutes
+        await asyncio.sleep(600)
+
+
+async def summary_worker():
+    """Background task for summarizing closed sessions from the queue"""
+    sweeper_service = SessionSweeperService()
+    while True:
+        try:
+            await sweeper_service.process_summary_queue()
+        except Exception as e:
+            logger.error(f"Error in summary worker: {e}")
+            await asyncio.sleep(5)
+
+
+async def quota_reconcile_scheduler():
+    """Background task for syncing Redis message quotas to subscriptions"""
+    while True:
+        try:
+            await quota_service.reconcile()
+        except Exception as e:
+            logger.error(f"Error in quota reconcile scheduler: {e}")
+        
+        # Reconcile every 5 minutes
+        await asyncio.sleep(300)
+
+
+async def analytics_rollup_scheduler():
+    """Background task for folding new analytics events into rollups"""
+    while True:
+        try:
+            async with async_session() as session:
+                await refresh_rollups(session)
+                await refresh_tag_counts(session)
+        except Exception as e:
+            logger.error(f"Error in analytics rollup scheduler: {e}")
+        
+        # Refresh every 5 minutes
+        await asyncio.sleep(300)
+
+
+async def analytics_partition_scheduler():
+    """Background task for creating and archiving analytics_events partitions"""
+    while True:
+        try:
+            async with async_session() as session:
+                settings_service = SettingsService(session)
+                retention_days = await settings_service.get_setting('analytics_retention_days')
+                await run_maintenance(
+                    session,
+                    int(retention_days),
+                    settings.analytics_archive_dir,
+                    settings.analytics_archive_persistent
+                )
+        except Exception as e:
+            logger.error(f"Error in analytics partition scheduler: {e}")
+        
+        # Check once a day
+        await asyncio.sleep(24 * 3600)
+
+
 async def settings_cache_refresh_scheduler():
-    """Background scheduler for settings cache refresh"""
-    # Initial cache warm-up
-    try:
-        await settings_cache.get_bot_settings()
-        logger.info("Settings cache warmed up")
-    except Exception as e:
-        logger.error(f"Settings cache warm-up failed: {e}")
-    
+    """Background scheduler for settings cache refresh (changes are also pushed via settings_update)"""
     while True:
+        # Refresh every 2 minutes (cache TTL is 5 minutes)
+        await asyncio.sleep(2 * 60)
+        
         try:
             await settings_cache.refresh_cache()
             logger.debug("Settings cache refreshed")
         except Exception as e:
             logger.error(f"Settings cache refresh error: {e}")
+
+
+async def greeting_pool_scheduler():
+    """Background task for keeping the pre-generated greeting pools filled"""
+    while True:
+        try:
+            await greeting_pool.top_up()
+        except Exception as e:
+            logger.error(f"Error in greeting pool scheduler: {e}")
         
-        # Refresh every 2 minutes (cache TTL is 5 minutes)
-        await asyncio.sleep(2 * 60)
+        # Top up every 10 minutes; pools drained by /start refill on their own
+        await asyncio.sleep(600)
+
+
+async def db_pool_metrics_scheduler():
+    """Background task for publishing this process's DB pool and typing metrics for the admin panel"""
+    while True:
+        try:
+            redis_client = await get_redis()
+            if redis_client:
+                await redis_client.setex(
+                    f"db_pool_metrics:{process_key()}",
+                    180,
+                    json.dumps(pool_metrics())
+                )
+                await redis_client.setex(
+                    f"typing_metrics:{process_key()}",
+                    180,
+                    json.dumps(typing_manager.snapshot())
+                )
+        except Exception as e:
+            logger.error(f"Error in DB pool metrics scheduler: {e}")
+        
+        # Publish every minute
+        await asyncio.sleep(60)
 
 
 async def cryptocloud_payment_scheduler(bot_instance):
@@ -79,6 +195,9 @@ async def cryptocloud_payment_scheduler(bot_instance):
 async def main():
     # Initialize database
     await init_db()
+    async with async_session() as session:
+        # Events can only be written once their month's partition exists
+        await ensure_partitions(session)
     logger.info("Database initialized")
     
     # Initialize Redis
@@ -89,6 +208,8 @@ async def main():
     async with async_session() as session:
         admin_service = AdminSettingsService(session)
         await admin_service.initialize_default_settings()
+    # Handlers read settings_cache.config, so load it before polling
+    await settings_cache.refresh_cache()
     logger.info("Settings initialized")
     
     # Initialize bot and dispatcher
@@ -96,7 +217,8 @@ async def main():
         token=settings.bot_token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
-    dp = Dispatcher()
+    # FSM state in Redis so survey progress survives restarts and is shared between processes
+    dp = Dispatcher(storage=await create_fsm_storage(settings.redis_url, settings.fsm_state_ttl))
     
     # Register middlewares
     dp.message.middleware(ConsentMiddleware())
@@ -115,17 +237,42 @@ async def main():
     reminder_task = asyncio.create_task(subscription_reminder_scheduler(bot))
     cryptocloud_task = asyncio.create_task(cryptocloud_payment_scheduler(bot))
     settings_cache_task = asyncio.create_task(settings_cache_refresh_scheduler())
+    settings_update_task = asyncio.create_task(settings_cache.listen_for_updates())
+    sweeper_task = asyncio.create_task(session_sweeper_scheduler())
+    summary_task = asyncio.create_task(summary_worker())
+    quota_task = asyncio.create_task(quota_reconcile_scheduler())
+    entitlement_task = asyncio.create_task(entitlement_service.listen_for_invalidations())
+    rollup_task = asyncio.create_task(analytics_rollup_scheduler())
+    partition_task = asyncio.create_task(analytics_partition_scheduler())
+    pool_metrics_task = asyncio.create_task(db_pool_metrics_scheduler())
+    greeting_pool_task = asyncio.create_task(greeting_pool_scheduler())
+    outbound_task = asyncio.create_task(outbound_scheduler.run())
     logger.info("Background schedulers started")
     
     # Start polling
     logger.info("Starting bot...")
     try:
-        await dp.start_polling(bot)
+        # The bot session stays open for the outbound drain below
+        await dp.start_polling(bot, close_bot_session=False)
     finally:
+        # Replies are already stored as sent; deliver them before the loop goes away
+        await outbound_scheduler.drain(OUTBOUND_DRAIN_SECONDS)
         ping_task.cancel()
         reminder_task.cancel()
         cryptocloud_task.cancel()
         settings_cache_task.cancel()
+        settings_update_task.cancel()
+        sweeper_task.cancel()
+        summary_task.cancel()
+        quota_task.cancel()
+        entitlement_task.cancel()
+        rollup_task.cancel()
+        partition_task.cancel()
+        pool_metrics_task.cancel()
+        greeting_pool_task.cancel()
+        outbound_task.cancel()
+        await dp.storage.close()
+        await bot.session.close()
 
 
 if __name__ == "__main__":
@@ -6,7 +6,7 @@ sys.path.append('../../../')
 
 from shared.config.database import async_session
 from services.user_service import UserService
-from services.settings_service import SettingsService
+from services.settings_cache import settings_cache
 from utils.ux_helper import UXHelper, OnboardingUX
 
 
@@ -41,13 +41,12 @@ class ConsentMiddleware(BaseMiddleware):
         
         async with async_session() as session:
             user_service = UserService(session)
-            settings_service = SettingsService(session)
             
             # Get user
             user = await user_service.get_or_create_user(telegram_id)
             
             # Check consent status
-            current_policy_version = await settings_service.get_setting("policy_version", "v1")
+            current_policy_version = settings_cache.config.policy_version
             
             if not user.terms_accepted or user.policy_version != current_policy_version:
                 # User hasn't accepted terms - redirect to consent
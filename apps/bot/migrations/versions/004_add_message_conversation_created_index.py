@@ -0,0 +1,28 @@
+"""add messages (conversation_id, created_at) index for session sweeper
+
+Revision ID: 004
+Revises: 99e4d9d3bb7c
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '99e4d9d3bb7c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Session sweeper looks up the newest message of every active conversation
+    op.create_index(
+        'ix_messages_conversation_id_created_at',
+        'messages',
+        ['conversation_id', 'created_at']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_conversation_id_created_at', table_name='messages')
@@ -0,0 +1,89 @@
+"""add denormalized last-activity columns to users and conversations
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('last_user_message_at', sa.DateTime(), nullable=True))
+    op.add_column('users', sa.Column('last_ping_at', sa.DateTime(), nullable=True))
+    op.add_column('users', sa.Column('pings_since_last_message', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('conversations', sa.Column('last_message_at', sa.DateTime(), nullable=True))
+    
+    # Backfill from messages and ping events
+    op.execute("""
+        UPDATE conversations c
+        SET last_message_at = m.last_at
+        FROM (
+            SELECT conversation_id, max(created_at) AS last_at
+            FROM messages
+            GROUP BY conversation_id
+        ) m
+        WHERE c.id = m.conversation_id
+    """)
+    op.execute("""
+        UPDATE users u
+        SET last_user_message_at = m.last_at
+        FROM (
+            SELECT c.user_id, max(msg.created_at) AS last_at
+            FROM messages msg
+            JOIN conversations c ON c.id = msg.conversation_id
+            WHERE msg.role = 'user'
+            GROUP BY c.user_id
+        ) m
+        WHERE u.id = m.user_id
+    """)
+    op.execute("""
+        UPDATE users u
+        SET last_ping_at = e.last_at
+        FROM (
+            SELECT user_id, max(created_at) AS last_at
+            FROM analytics_events
+            WHERE event_type = 'ping_sent'
+            GROUP BY user_id
+        ) e
+        WHERE u.id = e.user_id
+    """)
+    op.execute("""
+        UPDATE users u
+        SET pings_since_last_message = e.ping_count
+        FROM (
+            SELECT ev.user_id, count(*) AS ping_count
+            FROM analytics_events ev
+            JOIN users usr ON usr.id = ev.user_id
+            WHERE ev.event_type = 'ping_sent'
+              AND usr.last_user_message_at IS NOT NULL
+              AND ev.created_at > usr.last_user_message_at
+            GROUP BY ev.user_id
+        ) e
+        WHERE u.id = e.user_id
+    """)
+    
+    op.create_index('ix_users_last_user_message_at', 'users', ['last_user_message_at'])
+    op.create_index(
+        'ix_conversations_active_last_message_at',
+        'conversations',
+        ['last_message_at'],
+        postgresql_where=sa.text('is_active')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_active_last_message_at', table_name='conversations')
+    op.drop_index('ix_users_last_user_message_at', table_name='users')
+    op.drop_column('conversations', 'last_message_at')
+    op.drop_column('users', 'pings_since_last_message')
+    op.drop_column('users', 'last_ping_at')
+    op.drop_column('users', 'last_user_message_at')
@@ -0,0 +1,30 @@
+"""add created_at indexes on analytics_events for time-bucketed stats
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Daily stats and dashboards filter every event query by created_at
+    op.create_index('ix_analytics_events_created_at', 'analytics_events', ['created_at'])
+    op.create_index(
+        'ix_analytics_events_event_type_created_at',
+        'analytics_events',
+        ['event_type', 'created_at']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analytics_events_event_type_created_at', table_name='analytics_events')
+    op.drop_index('ix_analytics_events_created_at', table_name='analytics_events')
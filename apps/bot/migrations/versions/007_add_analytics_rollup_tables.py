@@ -0,0 +1,68 @@
+"""add incremental analytics rollup tables
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analytics_rollups',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('granularity', sa.String(), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('metric', sa.String(), nullable=False),
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'granularity', 'bucket_start', 'metric', 'dimension',
+            name='uq_analytics_rollups_bucket'
+        )
+    )
+    op.create_index(op.f('ix_analytics_rollups_id'), 'analytics_rollups', ['id'])
+
+    op.create_table(
+        'analytics_daily_active_users',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('day', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'user_id', name='uq_analytics_daily_active_users_day_user')
+    )
+    op.create_index(op.f('ix_analytics_daily_active_users_id'), 'analytics_daily_active_users', ['id'])
+
+    op.create_table(
+        'analytics_rollup_watermarks',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('watermark', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_analytics_rollup_watermarks_id'), 'analytics_rollup_watermarks', ['id'])
+    # The rollup job backfills from the oldest event on its first run,
+    # active user counts per day included
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_rollup_watermarks')
+    op.drop_table('analytics_daily_active_users')
+    op.drop_table('analytics_rollups')
@@ -0,0 +1,109 @@
+"""partition analytics_events by month on created_at
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+from shared.analytics.partitions import month_start, add_months, create_partition_sql, MONTHS_AHEAD
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+COLUMNS = "id, user_id, event_type, event_id, properties, message_length, token_count, created_at, updated_at"
+
+INDEXES = [
+    ('ix_analytics_events_id', ['id']),
+    ('ix_analytics_events_event_type', ['event_type']),
+    ('ix_analytics_events_event_id', ['event_id']),
+    ('ix_analytics_events_created_at', ['created_at']),
+    ('ix_analytics_events_event_type_created_at', ['event_type', 'created_at']),
+]
+
+
+def _prepare_old_table():
+    op.execute("ALTER TABLE analytics_events RENAME TO analytics_events_old")
+    op.execute("ALTER TABLE analytics_events_old RENAME CONSTRAINT analytics_events_pkey TO analytics_events_old_pkey")
+    for name, _ in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def _finish():
+    op.execute("ALTER SEQUENCE analytics_events_id_seq OWNED BY analytics_events.id")
+    op.execute("DROP TABLE analytics_events_old")
+    for name, columns in INDEXES:
+        op.create_index(name, 'analytics_events', columns)
+
+
+def upgrade() -> None:
+    _prepare_old_table()
+
+    op.execute("""
+        CREATE TABLE analytics_events (
+            id BIGINT NOT NULL DEFAULT nextval('analytics_events_id_seq'),
+            user_id BIGINT NOT NULL REFERENCES users (id),
+            event_type VARCHAR NOT NULL,
+            event_id VARCHAR,
+            properties JSON,
+            message_length BIGINT,
+            token_count BIGINT,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    # One partition per month from the oldest event up to MONTHS_AHEAD months from now
+    connection = op.get_bind()
+    oldest = connection.execute(sa.text("SELECT min(created_at) FROM analytics_events_old")).scalar()
+    last = add_months(month_start(datetime.utcnow()), MONTHS_AHEAD)
+    month = month_start(oldest) if oldest and oldest < last else last
+    while month <= last:
+        op.execute(create_partition_sql(month))
+        month = add_months(month, 1)
+
+    op.execute(f"""
+        INSERT INTO analytics_events ({COLUMNS})
+        SELECT id, user_id, event_type, event_id, properties, message_length, token_count,
+               COALESCE(created_at, now()), updated_at
+        FROM analytics_events_old
+    """)
+
+    _finish()
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE analytics_events RENAME TO analytics_events_partitioned")
+    op.execute("ALTER TABLE analytics_events_partitioned RENAME CONSTRAINT analytics_events_pkey TO analytics_events_partitioned_pkey")
+    for name, _ in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+    op.execute("""
+        CREATE TABLE analytics_events (
+            id BIGINT NOT NULL DEFAULT nextval('analytics_events_id_seq'),
+            user_id BIGINT NOT NULL REFERENCES users (id),
+            event_type VARCHAR NOT NULL,
+            event_id VARCHAR,
+            properties JSON,
+            message_length BIGINT,
+            token_count BIGINT,
+            created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+            updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+            PRIMARY KEY (id)
+        )
+    """)
+    op.execute(f"INSERT INTO analytics_events ({COLUMNS}) SELECT {COLUMNS} FROM analytics_events_partitioned")
+    op.execute("ALTER SEQUENCE analytics_events_id_seq OWNED BY analytics_events.id")
+
+    # Dropping the parent drops its partitions; archived months are not restored
+    op.execute("DROP TABLE analytics_events_partitioned")
+    for name, columns in INDEXES:
+        op.create_index(name, 'analytics_events', columns)
@@ -0,0 +1,41 @@
+"""add keyset, trigram and latest-subscription indexes for the admin user list
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+TRIGRAM_COLUMNS = ['name', 'telegram_id', 'city']
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'])
+    for column in TRIGRAM_COLUMNS:
+        op.create_index(
+            f'ix_users_{column}_trgm',
+            'users',
+            [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'}
+        )
+
+    op.create_index('ix_subscriptions_user_id_created_at', 'subscriptions', ['user_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_subscriptions_user_id_created_at', table_name='subscriptions')
+    for column in TRIGRAM_COLUMNS:
+        op.drop_index(f'ix_users_{column}_trgm', table_name='users')
+    op.drop_index('ix_users_created_at_id', table_name='users')
+    # pg_trgm is left installed; other objects may depend on it
@@ -0,0 +1,58 @@
+"""move user tags to JSONB with normalized names and GIN indexes
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+TAG_COLUMNS = [('emotion_tags', 'emotion_names'), ('topic_tags', 'topic_names')]
+
+
+def upgrade() -> None:
+    for tags_column, names_column in TAG_COLUMNS:
+        op.alter_column(
+            'users', tags_column,
+            type_=postgresql.JSONB(),
+            postgresql_using=f'{tags_column}::jsonb'
+        )
+        op.add_column('users', sa.Column(names_column, postgresql.JSONB(), nullable=True))
+
+        # Same normalization as shared.models.user.tag_name: drop everything up to the first space
+        op.execute(f"""
+            UPDATE users
+            SET {names_column} = (
+                SELECT COALESCE(jsonb_agg(
+                    CASE WHEN position(' ' IN tag) > 0
+                         THEN substr(tag, position(' ' IN tag) + 1)
+                         ELSE tag
+                    END
+                    ORDER BY ordinality
+                ), '[]'::jsonb)
+                FROM jsonb_array_elements_text({tags_column}) WITH ORDINALITY AS t(tag, ordinality)
+            )
+            WHERE jsonb_typeof({tags_column}) = 'array'
+        """)
+
+        op.create_index(f'ix_users_{names_column}', 'users', [names_column], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    for tags_column, names_column in TAG_COLUMNS:
+        op.drop_index(f'ix_users_{names_column}', table_name='users')
+        op.drop_column('users', names_column)
+        op.alter_column(
+            'users', tags_column,
+            type_=sa.JSON(),
+            postgresql_using=f'{tags_column}::json'
+        )
@@ -0,0 +1,84 @@
+"""replace survey index strings in user tags with the tag labels
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from shared.config.settings_registry import decode_value, default_for
+from shared.models.user import tag_name
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+# Index strings ("0", "3") become labels[index]; anything else is kept as is.
+# __TAGS__/__NAMES__ are swapped for fixed column names with str.replace (the
+# regex quantifiers rule out str.format).
+MAP_TAGS = """
+    UPDATE users
+    SET __TAGS__ = mapped.tags, __NAMES__ = mapped.names
+    FROM (
+        SELECT u.id,
+               jsonb_agg(COALESCE((CAST(:labels AS text[]))[t.label_index], t.tag) ORDER BY t.ordinality) AS tags,
+               jsonb_agg(COALESCE((CAST(:names AS text[]))[t.label_index], t.name) ORDER BY t.ordinality) AS names
+        FROM users u,
+             LATERAL (
+                 SELECT tag, ordinality,
+                        CASE WHEN tag ~ '^[0-9]{1,6}$' THEN tag::int + 1 END AS label_index,
+                        CASE WHEN strpos(tag, ' ') > 0 THEN substr(tag, strpos(tag, ' ') + 1) ELSE tag END AS name
+                 FROM jsonb_array_elements_text(u.__TAGS__) WITH ORDINALITY AS e(tag, ordinality)
+             ) t
+        WHERE jsonb_typeof(u.__TAGS__) = 'array'
+          AND u.__TAGS__ @? '$[*] ? (@ like_regex "^[0-9]+$")'
+        GROUP BY u.id
+    ) mapped
+    WHERE users.id = mapped.id
+"""
+
+# (setting with the labels, statement)
+TAG_STATEMENTS = [
+    ('emotion_tags', MAP_TAGS.replace('__TAGS__', 'emotion_tags').replace('__NAMES__', 'emotion_names')),
+    ('topic_tags', MAP_TAGS.replace('__TAGS__', 'topic_tags').replace('__NAMES__', 'topic_names')),
+]
+
+
+def _current_labels(connection, key: str) -> list:
+    """The tag list as configured now, or the registry default"""
+    row = connection.execute(
+        sa.text("""
+            SELECT string_value, integer_value, boolean_value, json_value
+            FROM bot_settings WHERE key = :key AND is_active = true
+        """),
+        {'key': key}
+    ).first()
+    if row is not None:
+        try:
+            return list(decode_value(key, *row))
+        except ValueError:
+            pass
+    return list(default_for(key))
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    for setting_key, sql in TAG_STATEMENTS:
+        labels = _current_labels(connection, setting_key)
+        statement = sa.text(sql).bindparams(
+            sa.bindparam('labels', type_=postgresql.ARRAY(sa.Text())),
+            sa.bindparam('names', type_=postgresql.ARRAY(sa.Text())),
+        )
+        connection.execute(statement, {'labels': labels, 'names': [tag_name(label) for label in labels]})
+
+
+def downgrade() -> None:
+    # Labels are valid tags for every earlier revision; nothing to undo
+    pass
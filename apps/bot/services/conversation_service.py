@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, update, desc, func, or_
 from typing import List, Dict, Optional
 import sys
 sys.path.append('../../../')
@@ -11,6 +11,8 @@ from shared.models.conversation import Conversation, Message
 from shared.models.subscription import Subscription
 from shared.config.redis import RedisCache
 from .memory_service import MemoryService
+from .quota_service import quota_service
+from .entitlement_service import entitlement_service
 
 
 class ConversationService:
@@ -63,6 +65,22 @@ class ConversationService:
         )
         
         self.session.add(message)
+        
+        # Keep denormalized activity columns in the same transaction
+        await self.session.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation.id)
+            .values(last_message_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        if role == "user":
+            await self.session.execute(
+                update(User)
+                .where(User.id == conversation.user_id)
+                .values(last_user_message_at=func.now(), pings_since_last_message=0)
+                .execution_options(synchronize_session=False)
+            )
+        
         await self.session.commit()
         await self.session.refresh(message)
         
@@ -130,72 +148,109 @@ class ConversationService:
         await self.cache.clear_conversation_cache(conversation.user_id)
     
     async def can_user_send_message(self, user: User) -> Dict:
-        """Check if user can send message (daily limit or subscription)"""
+        """
+        Check if user can send message (daily limit or subscription).
+        For free users one message is reserved atomically; call
+        release_daily_message if no reply ends up being delivered.
+        """
         
-        # Get user's subscription
-        result = await self.session.execute(
-            select(Subscription)
-            .where(Subscription.user_id == user.id)
-            .order_by(desc(Subscription.created_at))
-        )
-        subscription = result.scalar_one_or_none()
+        # Get user's subscription (cached)
+        entitlement = await entitlement_service.get(user.id, self.session)
         
-        if not subscription:
+        if not entitlement:
             return {'can_send': False, 'reason': 'no_subscription'}
         
         # Check if subscription is active (unlimited messages)
-        if subscription.is_active and subscription.ends_at > datetime.utcnow():
+        if entitlement_service.is_paid(entitlement):
             return {'can_send': True, 'reason': 'active_subscription'}
         
-        # Reset daily limit if needed
-        await self._reset_daily_limit_if_needed(subscription)
+        limit = entitlement['daily_messages_limit']
         
-        # Check daily free messages limit
-        if subscription.daily_messages_used < subscription.daily_messages_limit:
+        # Atomic check-and-consume in Redis, DB conditional update as fallback
+        quota = await quota_service.try_consume(user.id, limit)
+        if quota is None:
+            quota = await self._consume_daily_message_db(entitlement['subscription_id'])
+        
+        if quota['allowed']:
             return {
                 'can_send': True, 
                 'reason': 'daily_free_limit',
-                'remaining': subscription.daily_messages_limit - subscription.daily_messages_used
+                # Remaining before this message, as shown to the user
+                'remaining': limit - quota['used'] + 1
             }
         
         return {
             'can_send': False, 
             'reason': 'daily_limit_exceeded',
-            'used': subscription.daily_messages_used,
-            'limit': subscription.daily_messages_limit
+            'used': quota['used'],
+            'limit': limit
         }
     
-    async def _reset_daily_limit_if_needed(self, subscription: Subscription):
-        """Reset daily message limit if 24 hours have passed"""
+    async def _consume_daily_message_db(self, subscription_id: int) -> Dict:
+        """Reserve one message with a single conditional UPDATE (no Redis)"""
         now = datetime.utcnow()
         
-        # If no reset time set or 24 hours have passed
-        if (not subscription.daily_reset_at or 
-            now >= subscription.daily_reset_at):
-            
-            subscription.daily_messages_used = 0
-            subscription.daily_reset_at = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        # Reset daily limit if 24 hours have passed
+        await self.session.execute(
+            update(Subscription)
+            .where(
+                Subscription.id == subscription_id,
+                or_(Subscription.daily_reset_at.is_(None), Subscription.daily_reset_at <= now)
+            )
+            .values(
+                daily_messages_used=0,
+                daily_reset_at=now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        
+        result = await self.session.execute(
+            update(Subscription)
+            .where(
+                Subscription.id == subscription_id,
+                Subscription.daily_messages_used < Subscription.daily_messages_limit
+            )
+            .values(daily_messages_used=Subscription.daily_messages_used + 1)
+            .returning(Subscription.daily_messages_used)
+            .execution_options(synchronize_session=False)
+        )
+        used = result.scalar_one_or_none()
+        
+        if used is None:
+            result = await self.session.execute(
+                select(Subscription.daily_messages_used).where(Subscription.id == subscription_id)
+            )
             await self.session.commit()
+            return {'allowed': False, 'used': result.scalar_one_or_none() or 0}
+        
+        await self.session.commit()
+        return {'allowed': True, 'used': used}
     
-    async def consume_daily_message(self, user: User):
-        """Consume one daily message from user's limit"""
+    async def release_daily_message(self, user: User, limit_check: Dict):
+        """Give back a message reserved by can_user_send_message"""
+        if limit_check.get('reason') != 'daily_free_limit':
+            return
         
-        result = await self.session.execute(
-            select(Subscription)
-            .where(Subscription.user_id == user.id)
-            .order_by(desc(Subscription.created_at))
+        if await quota_service.release(user.id):
+            return
+        
+        await self.session.execute(
+            update(Subscription)
+            .where(
+                Subscription.user_id == user.id,
+                Subscription.daily_messages_used > 0,
+                Subscription.id == (
+                    select(Subscription.id)
+                    .where(Subscription.user_id == user.id)
+                    .order_by(desc(Subscription.created_at))
+                    .limit(1)
+                    .scalar_subquery()
+                )
+            )
+            .values(daily_messages_used=Subscription.daily_messages_used - 1)
+            .execution_options(synchronize_session=False)
         )
-        subscription = result.scalar_one_or_none()
-        
-        if subscription:
-            # Reset daily limit if needed
-            await self._reset_daily_limit_if_needed(subscription)
-            
-            # Only consume if not on active subscription and under limit
-            if (not subscription.is_active or subscription.ends_at <= datetime.utcnow()) and \
-               subscription.daily_messages_used < subscription.daily_messages_limit:
-                subscription.daily_messages_used += 1
-                await self.session.commit()
+        await self.session.commit()
     
     async def clear_conversation_history(self, user: User, clear_memory: bool = False):
         """Clear user's conversation history (keep profile and subscription)"""
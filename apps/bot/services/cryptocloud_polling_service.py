@@ -5,7 +5,7 @@ import asyncio
 import httpx
 import logging
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, List, NamedTuple, Optional
 from aiogram import Bot
 
 import sys
@@ -16,112 +16,193 @@ from shared.config.settings import settings
 from shared.models.subscription import Subscription
 from shared.models.user import User
 from services.settings_service import SettingsService
+from services.entitlement_service import entitlement_service
 from sqlalchemy import select, update
 
 logger = logging.getLogger(__name__)
 
 
+class PendingInvoice(NamedTuple):
+    """
+    Plain copy of a pending subscription row: activations roll back on a lost
+    webhook race, which would expire ORM instances shared by the whole batch
+    """
+    id: int
+    payment_id: str
+    user_id: int
+    created_at: datetime
+
+
 class CryptoCloudPollingService:
-    def __init__(self):
+    """
+    Fallback for the CryptoCloud webhook: polls unpaid invoices in batches
+    over one persistent HTTP client. Invoices are left to the webhook for a
+    grace period, then re-checked less often as they age, and dropped once
+    they are older than the invoice TTL.
+    """
+    
+    BATCH_SIZE = 100
+    BASE_INTERVAL = 20  # seconds between polling rounds
+    MAX_INTERVAL = 1800  # seconds between checks of one old invoice
+    BACKOFF_STEP = 600  # check interval doubles every 10 minutes of invoice age
+    
+    def __init__(self, api_url: Optional[str] = None):
         self.running = False
+        self.api_url = (api_url or settings.cryptocloud_api_url).rstrip("/")
+        self._client: Optional[httpx.AsyncClient] = None
+        self._next_check: Dict[int, datetime] = {}
     
     async def poll_cryptocloud_payments(self, bot: Bot):
         """
-        Background task to check pending CryptoCloud payments every 20 seconds
+        Background task to check pending CryptoCloud payments
         """
         self.running = True
+        self._client = httpx.AsyncClient(base_url=self.api_url, timeout=30)
         logger.info("Started CryptoCloud payment polling")
         
-        while self.running:
-            try:
-                async with async_session() as session:
-                    settings_service = SettingsService(session)
-                    
-                    # Get API credentials
-                    api_key = await settings_service.get_setting("cryptocloud_api_key", "")
-                    
-                    if not api_key:
-                        logger.warning("CryptoCloud API key not configured")
-                        await asyncio.sleep(60)  # Wait longer if not configured
-                        continue
-                    
-                    # Get pending CryptoCloud subscriptions
-                    result = await session.execute(
-                        select(Subscription)
-                        .where(Subscription.payment_provider == "cryptocloud")
-                        .where(Subscription.is_active == False)
-                        .where(Subscription.payment_id.isnot(None))
-                    )
-                    pending_subscriptions = result.scalars().all()
-                    
-                    logger.debug(f"Checking {len(pending_subscriptions)} pending CryptoCloud payments")
-                    
-                    for subscription in pending_subscriptions:
+        try:
+            while self.running:
+                try:
+                    await self.poll_once(bot)
+                    await asyncio.sleep(self.BASE_INTERVAL)
+                except Exception as e:
+                    logger.error(f"Error in CryptoCloud polling: {e}")
+                    await asyncio.sleep(60)  # Wait before retrying
+        finally:
+            await self._client.aclose()
+            self._client = None
+    
+    async def poll_once(self, bot: Bot) -> int:
+        """
+        Check all invoices that are due in one pass
+        
+        Returns:
+            Number of activated subscriptions
+        """
+        async with async_session() as session:
+            settings_service = SettingsService(session)
+            
+            # Get API credentials
+            api_key = await settings_service.get_setting("cryptocloud_api_key")
+            
+            if not api_key:
+                logger.warning("CryptoCloud API key not configured")
+                await asyncio.sleep(40)  # Wait longer if not configured
+                return 0
+            
+            invoice_ttl_hours = await settings_service.get_setting("cryptocloud_invoice_ttl_hours")
+            webhook_grace_seconds = await settings_service.get_setting("cryptocloud_webhook_grace_seconds")
+            
+            now = datetime.utcnow()
+            
+            # Unpaid invoices the webhook had time to confirm but didn't, and that haven't expired
+            result = await session.execute(
+                select(Subscription.id, Subscription.payment_id, Subscription.user_id, Subscription.created_at)
+                .where(Subscription.payment_provider == "cryptocloud")
+                .where(Subscription.is_active == False)
+                .where(Subscription.payment_id.isnot(None))
+                .where(Subscription.created_at >= now - timedelta(hours=invoice_ttl_hours))
+                .where(Subscription.created_at <= now - timedelta(seconds=webhook_grace_seconds))
+                .order_by(Subscription.id)
+            )
+            pending_subscriptions = [PendingInvoice(*row) for row in result]
+            
+            # Forget backoff state of invoices that were paid or expired
+            pending_ids = {subscription.id for subscription in pending_subscriptions}
+            self._next_check = {
+                sub_id: check_at for sub_id, check_at in self._next_check.items() if sub_id in pending_ids
+            }
+            
+            due = [
+                subscription for subscription in pending_subscriptions
+                if self._next_check.get(subscription.id, now) <= now
+            ]
+            
+            logger.debug(f"Checking {len(due)} of {len(pending_subscriptions)} pending CryptoCloud payments")
+            
+            activated = 0
+            for i in range(0, len(due), self.BATCH_SIZE):
+                batch = due[i:i + self.BATCH_SIZE]
+                statuses = await self._fetch_statuses(api_key, [s.payment_id for s in batch])
+                
+                for subscription in batch:
+                    status = statuses.get(self._normalize_uuid(subscription.payment_id))
+                    if status in ["paid", "overpaid"]:
                         try:
-                            await self._check_payment_status(session, subscription, bot, api_key)
+                            # Payment successful - activate subscription
+                            if await self._activate_subscription(session, subscription, bot):
+                                logger.info(f"Activated subscription {subscription.id} for payment {subscription.payment_id}")
+                                activated += 1
                         except Exception as e:
-                            logger.error(f"Error checking payment {subscription.payment_id}: {e}")
-                            continue
-                
-                await asyncio.sleep(20)  # Check every 20 seconds
-                
-            except Exception as e:
-                logger.error(f"Error in CryptoCloud polling: {e}")
-                await asyncio.sleep(60)  # Wait before retrying
+                            logger.error(f"Error activating payment {subscription.payment_id}: {e}")
+                    else:
+                        self._next_check[subscription.id] = now + self._check_interval(subscription, now)
+            
+            return activated
     
-    async def _check_payment_status(
-        self, 
-        session, 
-        subscription: Subscription, 
-        bot: Bot, 
-        api_key: str
-    ):
-        """Check individual payment status"""
+    async def _fetch_statuses(self, api_key: str, invoice_ids: List[str]) -> Dict[str, str]:
+        """Get statuses of a batch of invoices in one request"""
         try:
-            invoice_id = subscription.payment_id
-            
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.post(
-                    "https://api.cryptocloud.plus/v2/invoice/merchant/info",
-                    headers={"Authorization": f"Token {api_key}"},
-                    json={"uuids": [invoice_id]}
-                )
-                
-                data = response.json()
-                
-                if (
-                    data.get("status") == "success"
-                    and data.get("result")
-                    and isinstance(data["result"], list)
-                    and len(data["result"]) > 0
-                    and data["result"][0].get("status") in ["paid", "overpaid"]
-                ):
-                    # Payment successful - activate subscription
-                    await self._activate_subscription(session, subscription, bot)
-                    logger.info(f"Activated subscription {subscription.id} for payment {invoice_id}")
-                    
+            response = await self._client.post(
+                "/v2/invoice/merchant/info",
+                headers={"Authorization": f"Token {api_key}"},
+                json={"uuids": invoice_ids}
+            )
+            data = response.json()
         except httpx.RequestError as e:
-            logger.error(f"Network error checking payment {subscription.payment_id}: {e}")
-        except Exception as e:
-            logger.error(f"Error checking payment {subscription.payment_id}: {e}")
+            logger.error(f"Network error checking {len(invoice_ids)} payments: {e}")
+            return {}
+        except ValueError as e:
+            logger.error(f"Invalid CryptoCloud response: {e}")
+            return {}
+        
+        if data.get("status") != "success" or not isinstance(data.get("result"), list):
+            logger.warning(f"CryptoCloud status check failed: {data.get('result') or data.get('error')}")
+            return {}
+        
+        return {
+            self._normalize_uuid(invoice.get("uuid", "")): invoice.get("status")
+            for invoice in data["result"]
+        }
+    
+    def _check_interval(self, subscription: PendingInvoice, now: datetime) -> timedelta:
+        """Exponential backoff by invoice age: 20s, 40s, 80s ... capped at MAX_INTERVAL"""
+        age_seconds = max(0, (now - subscription.created_at).total_seconds())
+        exponent = min(int(age_seconds // self.BACKOFF_STEP), 10)
+        return timedelta(seconds=min(self.BASE_INTERVAL * 2 ** exponent, self.MAX_INTERVAL))
+    
+    @staticmethod
+    def _normalize_uuid(invoice_id: str) -> str:
+        """CryptoCloud returns invoice uuids with or without the INV- prefix"""
+        return invoice_id[4:] if invoice_id.startswith("INV-") else invoice_id
     
     async def _activate_subscription(
         self, 
         session, 
-        subscription: Subscription, 
+        subscription: PendingInvoice, 
         bot: Bot
-    ):
-        """Activate a paid subscription"""
+    ) -> bool:
+        """
+        Activate a paid subscription
+
+        Returns:
+            False if the webhook had already activated it
+        """
         try:
-            # Update subscription to active
-            await session.execute(
+            # Update subscription to active unless the webhook already did
+            result = await session.execute(
                 update(Subscription)
                 .where(Subscription.id == subscription.id)
+                .where(Subscription.is_active == False)
                 .values(
                     is_active=True,
                     starts_at=datetime.utcnow()
                 )
             )
+            if result.rowcount == 0:
+                await session.rollback()
+                logger.info(f"Subscription {subscription.id} already confirmed by webhook")
+                return False
             
             # Get user for notification
             user_result = await session.execute(
@@ -130,11 +211,12 @@ class CryptoCloudPollingService:
             user = user_result.scalar_one_or_none()
             
             await session.commit()
+            await entitlement_service.invalidate(subscription.user_id)
             
             if user and user.telegram_id:
                 # Send success notification
                 try:
-                    message = "✅ Оплата прошла успешно!\n\nВаша подписка активирована. Теперь у вас безлимитное общение с ботом. Приятного использования! 🎉",
+                    message = "✅ Оплата прошла успешно!\n\nВаша подписка активирована. Теперь у вас безлимитное общение с ботом. Приятного использования! 🎉"
                     
                     await bot.send_message(
                         chat_id=int(user.telegram_id),
@@ -146,6 +228,8 @@ class CryptoCloudPollingService:
                 except Exception as e:
                     logger.warning(f"Could not send notification to user {user.telegram_id}: {e}")
             
+            return True
+            
         except Exception as e:
             await session.rollback()
             logger.error(f"Error activating subscription {subscription.id}: {e}")
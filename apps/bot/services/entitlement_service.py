@@ -0,0 +1,163 @@
+"""
+Cached subscription entitlements (plan, expiry, daily limit)
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, desc
+import sys
+sys.path.append('../../../')
+
+from shared.config.database import async_session
+from shared.config.redis import RedisCache, get_redis, ENTITLEMENT_CHANNEL
+from shared.models.subscription import Subscription
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EntitlementService:
+    """
+    Two-level cache (process memory + Redis) over the user's latest
+    subscription. Entries never outlive ends_at, and payment paths drop
+    them through invalidate(), which is broadcast to every bot process.
+    The in-process level keeps the LOCAL_MAX_ENTRIES most recently used users.
+    """
+
+    LOCAL_TTL = 60  # seconds
+    LOCAL_MAX_ENTRIES = 10000
+    REDIS_TTL = 3600  # seconds
+    RECONNECT_DELAY = 1  # seconds, doubled up to MAX_RECONNECT_DELAY
+    MAX_RECONNECT_DELAY = 60
+
+    def __init__(self):
+        self._local: "OrderedDict[int, tuple]" = OrderedDict()
+
+    async def get(self, user_id: int, session: Optional[AsyncSession] = None) -> Optional[Dict]:
+        """
+        Get user's entitlement
+
+        Returns:
+            {'subscription_id', 'plan_name', 'ends_at', 'is_paid', 'daily_messages_limit'}
+            or None if the user has no subscription row
+        """
+        now = datetime.utcnow()
+
+        cached = self._local.get(user_id)
+        if cached and cached[0] > time.monotonic():
+            self._local.move_to_end(user_id)
+            return cached[1]
+
+        entitlement = await RedisCache().get_entitlement(user_id)
+        if entitlement:
+            entitlement['ends_at'] = datetime.fromisoformat(entitlement['ends_at'])
+        else:
+            entitlement = await self._load(user_id, session)
+            if not entitlement:
+                return None
+            await RedisCache().set_entitlement(
+                user_id,
+                entitlement,
+                ttl=self._ttl(entitlement, now, self.REDIS_TTL)
+            )
+
+        self._remember(user_id, entitlement, now)
+        return entitlement
+
+    def _remember(self, user_id: int, entitlement: Dict, now: datetime):
+        """Store in process memory, evicting the least recently used users"""
+        self._local[user_id] = (time.monotonic() + self._ttl(entitlement, now, self.LOCAL_TTL), entitlement)
+        self._local.move_to_end(user_id)
+        while len(self._local) > self.LOCAL_MAX_ENTRIES:
+            self._local.popitem(last=False)
+
+    def is_paid(self, entitlement: Optional[Dict], now: datetime = None) -> bool:
+        """Active paid subscription (unlimited messages)"""
+        if not entitlement:
+            return False
+        now = now or datetime.utcnow()
+        return entitlement['is_paid'] and entitlement['ends_at'] > now
+
+    async def invalidate(self, user_id: int):
+        """Drop the entitlement everywhere after a subscription change"""
+        self._local.pop(user_id, None)
+        try:
+            await RedisCache().invalidate_entitlement(user_id)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate entitlement for user {user_id}: {e}")
+
+    async def listen_for_invalidations(self):
+        """
+        Drop in-process entries when another process changes a subscription.
+        Resubscribes with backoff when the Redis connection drops.
+        """
+        redis_client = await get_redis()
+        if not redis_client:
+            return
+
+        delay = self.RECONNECT_DELAY
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(ENTITLEMENT_CHANNEL)
+                delay = self.RECONNECT_DELAY
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        user_id = json.loads(message["data"])["user_id"]
+                        self._local.pop(int(user_id), None)
+                    except Exception as e:
+                        logger.error(f"Bad entitlement invalidation message: {e}")
+            except Exception as e:
+                logger.warning(f"Entitlement invalidation listener lost Redis ({e}), retrying in {delay}s")
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+            # Invalidations published while disconnected were missed
+            self._local.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+
+    async def _load(self, user_id: int, session: Optional[AsyncSession]) -> Optional[Dict]:
+        """Load the latest subscription row"""
+        if session is None:
+            async with async_session() as own_session:
+                return await self._load(user_id, own_session)
+
+        result = await session.execute(
+            select(Subscription)
+            .where(Subscription.user_id == user_id)
+            .order_by(desc(Subscription.created_at))
+            .limit(1)
+        )
+        subscription = result.scalar_one_or_none()
+
+        if not subscription:
+            return None
+
+        return {
+            'subscription_id': subscription.id,
+            'plan_name': subscription.plan_name,
+            'ends_at': subscription.ends_at,
+            'is_paid': bool(subscription.is_active),
+            'daily_messages_limit': subscription.daily_messages_limit
+        }
+
+    def _ttl(self, entitlement: Dict, now: datetime, default_ttl: int) -> int:
+        """Expire naturally at ends_at for paid subscriptions"""
+        if entitlement['is_paid'] and entitlement['ends_at'] > now:
+            seconds_left = int((entitlement['ends_at'] - now).total_seconds())
+            return max(1, min(default_ttl, seconds_left))
+        return default_ttl
+
+
+# Global instance
+entitlement_service = EntitlementService()
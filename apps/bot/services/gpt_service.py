@@ -1,4 +1,3 @@
-import asyncio
 import re
 from openai import AsyncOpenAI
 from typing import List, Dict, Optional
@@ -6,6 +5,8 @@ import sys
 sys.path.append('../../../')
 
 from shared.config.settings import settings
+from shared.config.settings_registry import BotConfig
+from .typing_manager import typing_manager
 
 
 class GPTService:
@@ -17,7 +18,7 @@ class GPTService:
         user_message: str, 
         user_profile: Dict, 
         conversation_history: List[Dict],
-        settings_dict: Dict,
+        cfg: BotConfig,
         bot=None,
         chat_id=None
     ) -> Dict:
@@ -32,10 +33,10 @@ class GPTService:
         """
         
         # Check for crisis keywords first
-        is_crisis = await self._detect_crisis(user_message, settings_dict)
+        is_crisis = self._detect_crisis(user_message, cfg)
         
         if is_crisis:
-            crisis_response = await self._get_crisis_response(settings_dict)
+            crisis_response = cfg.crisis_response_text
             return {
                 'response': crisis_response,
                 'is_crisis': True,
@@ -44,13 +45,13 @@ class GPTService:
             }
         
         # Build system prompt
-        system_prompt = await self._build_system_prompt(user_profile, settings_dict)
+        system_prompt = self._build_system_prompt(user_profile, cfg)
         
         # Build messages for GPT
         messages = [{"role": "system", "content": system_prompt}]
         
         # Add conversation history (last N messages)
-        memory_window = settings_dict.get('memory_window_size', 15)
+        memory_window = cfg.memory_window_size
         recent_history = conversation_history[-memory_window:] if conversation_history else []
         
         for msg in recent_history:
@@ -63,12 +64,8 @@ class GPTService:
         messages.append({"role": "user", "content": user_message})
         
         try:
-            # Start continuous typing indicator if bot provided
-            typing_task = None
-            if bot and chat_id:
-                typing_task = asyncio.create_task(self._maintain_typing(bot, chat_id))
-            
-            try:
+            # Keep typing shown while waiting; coalesced with other holders of this chat
+            async with typing_manager.lease(bot, chat_id):
                 # Call OpenAI API
                 response = await self.client.chat.completions.create(
                     model="gpt-3.5-turbo",
@@ -77,20 +74,12 @@ class GPTService:
                     temperature=0.8,
                     timeout=10.0  # 10 second timeout
                 )
-            finally:
-                # Stop typing indicator
-                if typing_task:
-                    typing_task.cancel()
-                    try:
-                        await typing_task
-                    except asyncio.CancelledError:
-                        pass
             
             response_text = response.choices[0].message.content
             token_count = response.usage.total_tokens
             
             # Process response into blocks
-            blocks = self._process_response_blocks(response_text, settings_dict)
+            blocks = self._process_response_blocks(response_text, cfg)
             
             return {
                 'response': response_text,
@@ -109,77 +98,20 @@ class GPTService:
                 'error': str(e)
             }
     
-    async def _detect_crisis(self, text: str, settings_dict: Dict) -> bool:
+    def _detect_crisis(self, text: str, cfg: BotConfig) -> bool:
         """Detect crisis keywords in user message"""
-        # Get crisis keywords from settings
-        from services.settings_service import SettingsService
-        from shared.config.database import async_session
-        
-        async with async_session() as session:
-            settings_service = SettingsService(session)
-            
-            crisis_keywords = await settings_service.get_setting("crisis_keywords", [
-                "умереть", "умру", "суицид", "покончить", "повеситься", 
-                "убить себя", "не хочу жить", "нет смысла жить", "конец",
-                "прыгнуть с крыши", "таблетки", "смерть", "убийство себя",
-                "повешусь", "отравлюсь", "утоплюсь", "зарежусь", "застрелюсь"
-            ])
-        
         text_lower = text.lower()
         
         # Check for exact phrases and word boundaries
-        for keyword in crisis_keywords:
+        for keyword in cfg.crisis_keywords:
             if keyword.lower() in text_lower:
                 return True
         
         return False
     
-    async def _get_crisis_response(self, settings_dict: Dict) -> str:
-        """Return crisis intervention response"""
-        from services.settings_service import SettingsService
-        from shared.config.database import async_session
-        
-        async with async_session() as session:
-            settings_service = SettingsService(session)
-            
-            crisis_response = await settings_service.get_setting("crisis_response_text", 
-                "Мне очень жаль, что тебе так тяжело. Я не могу заменить живого специалиста, "
-                "но хочу, чтобы ты сейчас получил помощь.\n\n"
-                "🆘 Горячая линия: 8 800 2000 122\n"
-                "📞 Экстренные службы: 112"
-            )
-            
-        return crisis_response
-    
-    async def _build_system_prompt(self, user_profile: Dict, settings_dict: Dict) -> str:
+    def _build_system_prompt(self, user_profile: Dict, cfg: BotConfig) -> str:
         """Build system prompt based on user profile"""
-        
-        # Get system prompt from settings
-        from services.settings_service import SettingsService
-        from shared.config.database import async_session
-        
-        async with async_session() as session:
-            settings_service = SettingsService(session)
-            
-            base_prompt = await settings_service.get_setting(
-                "system_prompt",
-                """Ты эмпатичный помощник для эмоциональной поддержки. 
-
-ВАЖНЫЕ ПРАВИЛА:
-- НЕ давай конкретных советов или медицинских рекомендаций
-- НЕ используй слово "вы", только "ты"
-- НЕ упоминай GPT/AI или что ты робот
-- НЕ выпрашивай доверие фразами типа "я здесь для тебя"
-- НЕ морализируй и не читай лекции
-- Мат и агрессию интерпретируй как выражение эмоций
-
-ЧТО ДЕЛАТЬ:
-- Фокусируйся на эмоциях и поддержке
-- Говори от сердца, человечно
-- Задавай открытые вопросы о чувствах
-- Отражай эмоции пользователя
-- Будь кратким но теплым"""
-            )
+        base_prompt = cfg.system_prompt
 
         # Add user context if available
         if user_profile:
@@ -206,7 +138,7 @@ class GPTService:
         
         return base_prompt
     
-    def _process_response_blocks(self, response: str, settings_dict: Dict) -> List[str]:
+    def _process_response_blocks(self, response: str, cfg: BotConfig) -> List[str]:
         """Split response into blocks for natural delivery"""
         
         # Split by double newlines
@@ -216,7 +148,7 @@ class GPTService:
         blocks = [block.strip() for block in blocks if block.strip()]
         
         # Merge short blocks (less than 30 chars)
-        min_block_length = settings_dict.get('min_block_length', 30)
+        min_block_length = cfg.min_block_length
         merged_blocks = []
         current_block = ""
         
@@ -232,7 +164,7 @@ class GPTService:
             merged_blocks.append(current_block)
         
         # Limit max blocks
-        max_blocks = settings_dict.get('max_blocks_per_reply', 3)
+        max_blocks = cfg.max_blocks_per_reply
         if len(merged_blocks) > max_blocks:
             # Merge tail blocks
             tail = " ".join(merged_blocks[max_blocks-1:])
@@ -240,24 +172,11 @@ class GPTService:
         
         return merged_blocks or [response]  # Fallback to original if processing fails
     
-    async def _maintain_typing(self, bot, chat_id):
-        """Maintain typing indicator during GPT processing"""
-        try:
-            while True:
-                await bot.send_chat_action(chat_id, "typing")
-                await asyncio.sleep(4)  # Typing indicator lasts ~5 seconds, refresh every 4
-        except asyncio.CancelledError:
-            # Task was cancelled, stop typing
-            pass
-        except Exception:
-            # Ignore typing errors
-            pass
-    
     async def generate_continue_response(
         self, 
         user_profile: Dict, 
         conversation_history: List[Dict],
-        settings_dict: Dict,
+        cfg: BotConfig,
         continue_prompt: str,
         bot=None,
         chat_id=None
@@ -267,13 +186,13 @@ class GPTService:
         """
         
         # Build system prompt
-        system_prompt = await self._build_system_prompt(user_profile, settings_dict)
+        system_prompt = self._build_system_prompt(user_profile, cfg)
         
         # Build messages for GPT
         messages = [{"role": "system", "content": system_prompt}]
         
         # Add conversation history 
-        memory_window = settings_dict.get('memory_window_size', 10)
+        memory_window = cfg.memory_window_size
         recent_history = conversation_history[-memory_window:] if conversation_history else []
         
         for msg in recent_history:
@@ -289,12 +208,8 @@ class GPTService:
         })
         
         try:
-            # Start typing indicator
-            typing_task = None
-            if bot and chat_id:
-                typing_task = asyncio.create_task(self._maintain_typing(bot, chat_id))
-            
-            try:
+            # Keep typing shown while waiting
+            async with typing_manager.lease(bot, chat_id):
                 # Call OpenAI API with shorter response
                 response = await self.client.chat.completions.create(
                     model="gpt-3.5-turbo",
@@ -303,23 +218,15 @@ class GPTService:
                     temperature=0.7,
                     timeout=8.0  # 8 second timeout for continue responses
                 )
-            finally:
-                # Stop typing indicator
-                if typing_task:
-                    typing_task.cancel()
-                    try:
-                        await typing_task
-                    except asyncio.CancelledError:
-                        pass
             
             response_text = response.choices[0].message.content
             token_count = response.usage.total_tokens
             
             # Check for crisis in continue response
-            is_crisis = await self._detect_crisis(response_text, settings_dict)
+            is_crisis = self._detect_crisis(response_text, cfg)
             
             if is_crisis:
-                crisis_response = await self._get_crisis_response(settings_dict)
+                crisis_response = cfg.crisis_response_text
                 return {
                     'response': crisis_response,
                     'is_crisis': True,
@@ -328,7 +235,7 @@ class GPTService:
                 }
             
             # Process response into blocks (limit to 2 for continue)
-            blocks = self._process_response_blocks(response_text, settings_dict)
+            blocks = self._process_response_blocks(response_text, cfg)
             if len(blocks) > 2:
                 blocks = blocks[:2]
             
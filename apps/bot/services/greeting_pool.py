@@ -0,0 +1,204 @@
+"""
+Pool of pre-generated greetings in Redis.
+
+/start should not wait on GPT. Greetings are generated in the background for
+every scenario x time of day x tone bucket, with NAME_PLACEHOLDER in place
+of the name, and the handler pops a ready one. A pool that drops below the
+watermark is refilled asynchronously; an empty pool falls back to templates.
+"""
+import asyncio
+import hashlib
+import logging
+import uuid
+from typing import Dict, List
+import sys
+sys.path.append('../../../')
+
+from shared.config.redis import get_redis
+from .greeting_service import GreetingService, NAME_PLACEHOLDER
+from .settings_cache import settings_cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "greeting_pool"
+POOL_TTL = 24 * 3600  # pools of an edited prompt simply expire
+# A refill extends its lock while it runs, so a slow one is never refilled twice
+REFILL_LOCK_SECONDS = 120
+REFILL_LOCK_EXTEND_EVERY = REFILL_LOCK_SECONDS / 3
+
+# Extend / release the refill lock only while it still holds our token
+EXTEND_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+SCENARIOS = ("first_time", "return_user")
+TIMES_OF_DAY = ("morning", "afternoon", "evening", "night")
+
+# Tone buckets follow the tones of the greeting prompt; keywords match tag stems
+TONE_KEYWORDS = {
+    "anxious": ("тревог", "страх", "беспокой", "стресс", "растерян"),
+    "sad": ("грус", "печал", "устал", "вин", "беспомощ"),
+    "angry": ("злост", "раздраж"),
+}
+# What the generator is told about the user of each bucket
+TONE_EMOTIONS = {
+    "anxious": ["тревога"],
+    "sad": ["грусть"],
+    "angry": ["злость"],
+    "neutral": [],
+}
+
+# Keep references so background refills are not garbage-collected mid-flight
+_refill_tasks = set()
+
+
+def tone_bucket(emotion_tags) -> str:
+    """Tone of the first emotion tag that maps to one"""
+    for tag in emotion_tags or []:
+        tag = str(tag).lower()
+        for tone, keywords in TONE_KEYWORDS.items():
+            if any(keyword in tag for keyword in keywords):
+                return tone
+    return "neutral"
+
+
+class GreetingPool:
+    """Ready-made greetings per scenario, time of day and tone"""
+
+    def __init__(self):
+        self.greeting_service = GreetingService()
+
+    def _key(self, scenario: str, time_of_day: str, tone: str) -> str:
+        # Keyed on the prompt so an edited prompt starts from fresh pools
+        prompt_hash = hashlib.sha1(settings_cache.config.greeting_prompt.encode()).hexdigest()[:8]
+        return f"{KEY_PREFIX}:{prompt_hash}:{scenario}:{time_of_day}:{tone}"
+
+    def _combinations(self) -> List[tuple]:
+        return [
+            (scenario, time_of_day, tone)
+            for scenario in SCENARIOS
+            for time_of_day in TIMES_OF_DAY
+            for tone in TONE_EMOTIONS
+        ]
+
+    async def get_greeting(self, user_profile: Dict, scenario: str) -> str:
+        """A pooled greeting with the user's name, or a template one when the pool is empty"""
+        cfg = settings_cache.config
+        name = user_profile.get("name") or "друг"
+
+        if scenario in SCENARIOS:
+            time_of_day = self.greeting_service.detect_time_of_day(user_profile.get("timezone"))
+            tone = tone_bucket(user_profile.get("emotion_tags"))
+            key = self._key(scenario, time_of_day, tone)
+            try:
+                redis_client = await get_redis()
+                if redis_client:
+                    pipe = redis_client.pipeline(transaction=False)
+                    pipe.lpop(key)
+                    pipe.llen(key)
+                    greeting, remaining = await pipe.execute()
+
+                    if remaining < cfg.greeting_pool_watermark:
+                        await self._schedule_refill(redis_client, key, scenario, time_of_day, tone)
+                    if greeting:
+                        return greeting.replace(NAME_PLACEHOLDER, name)
+            except Exception as e:
+                logger.warning(f"Greeting pool unavailable: {e}")
+
+        return self.greeting_service.fallback_greeting(cfg.greeting_fallback_templates, user_profile, scenario)
+
+    async def top_up(self):
+        """Refill every pool below the watermark (startup and periodic)"""
+        cfg = settings_cache.config
+        if not cfg.greeting_enabled:
+            return
+
+        redis_client = await get_redis()
+        if not redis_client:
+            return
+
+        combinations = self._combinations()
+        keys = [self._key(*combination) for combination in combinations]
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.llen(key)
+        lengths = await pipe.execute()
+
+        # Refills run in the background; startup does not wait for GPT
+        for key, combination, length in zip(keys, combinations, lengths):
+            if length < cfg.greeting_pool_watermark:
+                await self._schedule_refill(redis_client, key, *combination)
+
+    async def _schedule_refill(self, redis_client, key: str, scenario: str, time_of_day: str, tone: str):
+        """Start one refill per pool across all processes"""
+        token = uuid.uuid4().hex
+        try:
+            acquired = await redis_client.set(f"{key}:refill", token, nx=True, ex=REFILL_LOCK_SECONDS)
+        except Exception:
+            return
+        if not acquired:
+            return
+
+        task = asyncio.create_task(self._refill(redis_client, key, token, scenario, time_of_day, tone))
+        _refill_tasks.add(task)
+        task.add_done_callback(_refill_tasks.discard)
+
+    async def _keep_lock(self, redis_client, lock_key: str, token: str):
+        """Extend the refill lock until cancelled or until it is no longer ours"""
+        while True:
+            await asyncio.sleep(REFILL_LOCK_EXTEND_EVERY)
+            try:
+                if not await redis_client.eval(EXTEND_LOCK_SCRIPT, 1, lock_key, token, REFILL_LOCK_SECONDS):
+                    logger.warning(f"Lost greeting refill lock {lock_key}")
+                    return
+            except Exception as e:
+                logger.warning(f"Failed to extend greeting refill lock {lock_key}: {e}")
+                return
+
+    async def _refill(self, redis_client, key: str, token: str, scenario: str, time_of_day: str, tone: str):
+        """Generate greetings up to greeting_pool_size; caller holds the refill lock with `token`"""
+        cfg = settings_cache.config
+        lock_key = f"{key}:refill"
+        keep_lock = asyncio.create_task(self._keep_lock(redis_client, lock_key, token))
+        try:
+            missing = cfg.greeting_pool_size - await redis_client.llen(key)
+            # Concurrent, bounded by the shared LLM concurrency cap
+            results = await asyncio.gather(*[
+                self.greeting_service.generate_pool_greeting(
+                    cfg.greeting_prompt, scenario, time_of_day, TONE_EMOTIONS[tone]
+                )
+                for _ in range(max(missing, 0))
+            ], return_exceptions=True)
+            greetings = [result for result in results if isinstance(result, str) and result]
+            if len(greetings) < len(results):
+                logger.warning(f"{len(results) - len(greetings)} greeting generations for {key} failed")
+
+            if greetings:
+                pipe = redis_client.pipeline(transaction=False)
+                pipe.rpush(key, *greetings)
+                # Never past the pool size, even if a lost lock let two refills overlap
+                pipe.ltrim(key, 0, cfg.greeting_pool_size - 1)
+                pipe.expire(key, POOL_TTL)
+                await pipe.execute()
+                logger.info(f"Greeting pool {key} refilled with {len(greetings)}")
+        except Exception as e:
+            logger.error(f"Greeting pool refill failed for {key}: {e}")
+        finally:
+            keep_lock.cancel()
+            try:
+                await redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except Exception:
+                pass
+
+
+# Global instance
+greeting_pool = GreetingPool()
@@ -9,6 +9,10 @@ sys.path.append('../../../')
 from shared.config.settings import settings
 from .settings_service import SettingsService
 from shared.config.database import async_session
+from shared.services.llm_cache import llm_cache
+
+# Stands in for the user's name in pre-generated greetings
+NAME_PLACEHOLDER = "{name}"
 
 
 class GreetingService:
@@ -21,7 +25,8 @@ class GreetingService:
         self, 
         user_profile: Dict, 
         scenario: str = "first_time",
-        time_of_day: Optional[str] = None
+        time_of_day: Optional[str] = None,
+        use_cache: bool = False
     ) -> str:
         """
         Generate personalized greeting using GPT
@@ -30,72 +35,87 @@ class GreetingService:
             user_profile: User data (name, age, emotions, topics)
             scenario: Type of greeting (first_time, return_user, onboarding_complete)
             time_of_day: morning, afternoon, evening, night
+            use_cache: Replay an identical earlier request from the LLM cache
             
         Returns:
             Generated greeting text
         """
         
+        greeting_prompt, fallback_templates = await self._load_greeting_settings()
+        return await self._generate(
+            greeting_prompt, fallback_templates, user_profile, scenario, time_of_day, use_cache
+        )
+    
+    async def _load_greeting_settings(self):
         async with async_session() as session:
             settings_service = SettingsService(session)
-            
-            # Get greeting settings
-            greeting_prompt = await settings_service.get_setting(
-                "greeting_prompt",
-                self._get_default_greeting_prompt()
-            )
-            
-            # Build context for greeting
-            context = await self._build_greeting_context(
-                user_profile, 
-                scenario, 
-                time_of_day,
-                settings_service
+            return (
+                await settings_service.get_setting("greeting_prompt"),
+                await settings_service.get_setting("greeting_fallback_templates")
             )
+    
+    async def _generate(
+        self,
+        greeting_prompt: str,
+        fallback_templates: List[str],
+        user_profile: Dict,
+        scenario: str,
+        time_of_day: Optional[str],
+        use_cache: bool,
+        variant: int = 0
+    ) -> str:
+        # Build context for greeting
+        context = await self._build_greeting_context(user_profile, scenario, time_of_day, None)
+        
+        # Generate greeting with GPT
+        try:
+            return await self._complete(greeting_prompt, context, use_cache, variant)
             
-            # Generate greeting with GPT
-            try:
-                response = await self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",  # Much faster than GPT-4
-                    messages=[
-                        {"role": "system", "content": greeting_prompt},
-                        {"role": "user", "content": context}
-                    ],
-                    max_tokens=100,  # Reduced for greetings
-                    temperature=0.9,
-                    timeout=6.0  # 6 second timeout for greetings
-                )
-                
-                greeting = response.choices[0].message.content.strip()
-                
-                # Clean up and validate greeting
-                return self._clean_greeting(greeting)
-                
-            except Exception as e:
-                # Fallback to template greeting if GPT fails
-                print(f"GPT greeting failed: {e}")
-                return await self._get_fallback_greeting(user_profile, scenario, settings_service)
+        except Exception as e:
+            # Fallback to template greeting if GPT fails
+            print(f"GPT greeting failed: {e}")
+            return self.fallback_greeting(fallback_templates, user_profile, scenario)
     
-    def _get_default_greeting_prompt(self) -> str:
-        """Default system prompt for greeting generation"""
-        return """Ты генерируешь персонализированные приветствия для бота эмоциональной поддержки.
-
-ПРАВИЛА ПРИВЕТСТВИЙ:
-- Будь теплым и эмпатичным
-- Используй имя пользователя естественно  
-- НЕ используй "вы", только "ты"
-- Учитывай время суток
-- Будь кратким (1-2 предложения)
-- НЕ упоминай что ты ИИ или бот
-- Избегай клише типа "я здесь для тебя"
-
-ЭМОЦИОНАЛЬНЫЙ ТОН:
-- Для тревожных - успокаивающий
-- Для грустных - поддерживающий  
-- Для злых - понимающий
-- Для радостных - разделяющий радость
-
-ФОРМАТ ОТВЕТА:
-Только текст приветствия, без кавычек и пояснений."""
+    async def generate_pool_greeting(
+        self,
+        greeting_prompt: str,
+        scenario: str,
+        time_of_day: str,
+        emotion_tags: List[str]
+    ) -> str:
+        """
+        Greeting with NAME_PLACEHOLDER instead of a name, for the pre-generated pool.
+        Raises when GPT fails: the pool must not fill up with template greetings.
+        """
+        context = await self._build_greeting_context(
+            {"name": NAME_PLACEHOLDER, "emotion_tags": emotion_tags},
+            scenario,
+            time_of_day,
+            None
+        )
+        context += f"Вместо имени напиши ровно {NAME_PLACEHOLDER}, его подставят позже\n"
+        return await self._complete(greeting_prompt, context)
+    
+    async def _complete(self, greeting_prompt: str, context: str, use_cache: bool = False, variant: int = 0) -> str:
+        """One GPT greeting call (through the shared LLM cache and concurrency cap)"""
+        result = await llm_cache.complete(
+            self.client,
+            use_cache=use_cache,
+            variant=variant,
+            timeout=6.0,  # 6 second timeout for greetings
+            model="gpt-3.5-turbo",  # Much faster than GPT-4
+            messages=[
+                {"role": "system", "content": greeting_prompt},
+                {"role": "user", "content": context}
+            ],
+            max_tokens=100,  # Reduced for greetings
+            temperature=0.9
+        )
+        
+        greeting = result["content"].strip()
+        
+        # Clean up and validate greeting
+        return self._clean_greeting(greeting)
     
     async def _build_greeting_context(
         self, 
@@ -109,7 +129,7 @@ class GreetingService:
         # Detect time of day if not provided
         if not time_of_day:
             user_timezone = user_profile.get('timezone')
-            time_of_day = self._detect_time_of_day(user_timezone)
+            time_of_day = self.detect_time_of_day(user_timezone)
         
         context = f"Генерируй приветствие для пользователя:\n"
         
@@ -150,7 +170,7 @@ class GreetingService:
         
         return context
     
-    def _detect_time_of_day(self, user_timezone: Optional[str] = None) -> str:
+    def detect_time_of_day(self, user_timezone: Optional[str] = None) -> str:
         """Detect current time of day based on user timezone"""
         try:
             if user_timezone:
@@ -186,27 +206,11 @@ class GreetingService:
         
         return greeting
     
-    async def _get_fallback_greeting(
-        self, 
-        user_profile: Dict, 
-        scenario: str, 
-        settings_service: SettingsService
-    ) -> str:
-        """Fallback greeting templates if GPT fails"""
+    def fallback_greeting(self, default_templates, user_profile: Dict, scenario: str) -> str:
+        """Random template greeting for the scenario"""
         
         name = user_profile.get('name', 'друг')
         
-        # Get fallback templates from settings
-        default_templates = await settings_service.get_setting(
-            "greeting_fallback_templates",
-            [
-                "Привет, {name}! Как дела? 😊",
-                "Здравствуй, {name}! Рад тебя видеть 🌸",
-                "Привет! Как настроение, {name}? 💭",
-                "Добро пожаловать, {name}! Что у тебя на душе? ✨",
-            ]
-        )
-        
         # Format templates with actual name
         fallback_templates = [template.format(name=name) for template in default_templates]
         
@@ -229,19 +233,24 @@ class GreetingService:
     async def generate_multiple_greetings(
         self, 
         user_profile: Dict, 
-        count: int = 3
+        count: int = 3,
+        use_cache: bool = False
     ) -> List[str]:
-        """Generate multiple greeting variations for testing"""
+        """Generate multiple greeting variations for testing, concurrently"""
         
         scenarios = ['first_time', 'return_user', 'daily_return']
-        greetings = []
-        
-        for i in range(count):
-            scenario = scenarios[i % len(scenarios)]
-            greeting = await self.generate_greeting(user_profile, scenario)
-            greetings.append(greeting)
-            
-            # Small delay to get different results
-            await asyncio.sleep(0.1)
+        greeting_prompt, fallback_templates = await self._load_greeting_settings()
         
-        return greetings
\ No newline at end of file
+        # Each variation has its own cache entry; OpenAI calls share the global cap
+        return list(await asyncio.gather(*[
+            self._generate(
+                greeting_prompt,
+                fallback_templates,
+                user_profile,
+                scenarios[i % len(scenarios)],
+                None,
+                use_cache,
+                variant=i
+            )
+            for i in range(count)
+        ]))
@@ -0,0 +1,175 @@
+"""
+Timed delivery of bot replies with typing simulation
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from shared.config.settings_registry import BotConfig
+from .settings_cache import settings_cache
+from .typing_manager import typing_manager
+
+logger = logging.getLogger(__name__)
+
+TYPING = "typing"
+SEND = "send"
+
+
+class OutboundScheduler:
+    """
+    Handlers enqueue reply blocks with their send times and return at once;
+    a single loop emits "typing" actions and messages when they fall due.
+
+    Every chat has a FIFO of timed actions, and only the head of each chat
+    sits in the timer heap, so a chat's actions go out strictly in order
+    while different chats are sent concurrently.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, int]] = []
+        self._chats: Dict[int, Deque[Tuple[float, str, Bot, Optional[str], Optional[dict]]]] = {}
+        self._in_flight: Dict[int, asyncio.Task] = {}
+        # Chats held back by flood control, until the time Telegram gave us
+        self._retry_at: Dict[int, float] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def pending(self) -> int:
+        """Actions waiting to be emitted or in flight"""
+        return sum(len(actions) for actions in self._chats.values()) + len(self._in_flight)
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Deliver everything queued before shutdown: remaining actions are made
+        due now (still in order per chat) and we wait until none are left.
+        A chat under flood control is not sent before its retry time.
+
+        Returns:
+            True if the queue emptied within `timeout`
+        """
+        now = time.monotonic()
+        self._heap = []
+        for chat_id, actions in self._chats.items():
+            due = max(now, self._retry_at.get(chat_id, now))
+            for i, (_, kind, bot, text, kwargs) in enumerate(actions):
+                actions[i] = (due, kind, bot, text, kwargs)
+            if actions and chat_id not in self._in_flight:
+                self._heap.append((due, next(self._seq), chat_id))
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+        deadline = now + timeout
+        while self.pending():
+            if time.monotonic() >= deadline:
+                logger.error(f"Shutting down with {self.pending()} undelivered outbound actions")
+                return False
+            await asyncio.sleep(0.1)
+        return True
+
+    def typing_duration(self, text: str, cfg: BotConfig) -> float:
+        duration = cfg.typing_duration_base + len(text.split()) * cfg.typing_duration_per_word
+        return min(duration, cfg.typing_duration_max)
+
+    def enqueue_blocks(
+        self,
+        bot: Bot,
+        chat_id: int,
+        blocks: List[str],
+        cfg: BotConfig = None,
+        reply_markup=None
+    ) -> float:
+        """
+        Schedule blocks with typing before each and a random pause between them,
+        after anything already queued for the chat. reply_markup goes on the last block.
+
+        Returns:
+            Delay in seconds until the last block is sent
+        """
+        cfg = cfg or settings_cache.config
+        now = time.monotonic()
+        actions = self._chats.get(chat_id)
+        at = max(now, actions[-1][0]) if actions else now
+
+        scheduled = []
+        for i, block in enumerate(blocks):
+            if i > 0:
+                at += random.uniform(cfg.delay_between_blocks_min / 1000, cfg.delay_between_blocks_max / 1000)
+            scheduled.append((at, TYPING, bot, None, None))
+            at += self.typing_duration(block, cfg)
+            markup = {"reply_markup": reply_markup} if reply_markup is not None and i == len(blocks) - 1 else None
+            scheduled.append((at, SEND, bot, block, markup))
+
+        self._push(chat_id, scheduled)
+        return at - now
+
+    def _push(self, chat_id: int, scheduled: list):
+        if not scheduled:
+            return
+        actions = self._chats.get(chat_id)
+        if actions is None:
+            actions = self._chats[chat_id] = deque()
+        was_idle = not actions
+        actions.extend(scheduled)
+
+        # A busy chat reschedules itself when its in-flight action completes
+        if was_idle and chat_id not in self._in_flight:
+            heapq.heappush(self._heap, (actions[0][0], next(self._seq), chat_id))
+            self._wakeup.set()
+
+    async def run(self):
+        """Emit due actions forever (started once from main)"""
+        while True:
+            try:
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, chat_id = heapq.heappop(self._heap)
+                    self._in_flight[chat_id] = asyncio.create_task(self._emit(chat_id))
+
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbound scheduler error: {e}")
+                await asyncio.sleep(1)
+
+    async def _emit(self, chat_id: int):
+        actions = self._chats[chat_id]
+        _, kind, bot, text, kwargs = actions.popleft()
+        self._retry_at.pop(chat_id, None)
+        try:
+            if kind == TYPING:
+                await typing_manager.pulse(bot, chat_id)
+            else:
+                await bot.send_message(chat_id, text, parse_mode="HTML", **(kwargs or {}))
+                typing_manager.message_sent(chat_id)
+        except TelegramRetryAfter as e:
+            # Flood control: put the block back at the head instead of losing it mid-reply
+            logger.warning(f"Flood control for chat {chat_id}, retrying {kind} in {e.retry_after}s")
+            retry_at = self._retry_at[chat_id] = time.monotonic() + e.retry_after
+            actions.appendleft((retry_at, kind, bot, text, kwargs))
+        except Exception as e:
+            logger.error(f"Failed to deliver {kind} to chat {chat_id}: {e}")
+        finally:
+            del self._in_flight[chat_id]
+            if actions:
+                heapq.heappush(self._heap, (actions[0][0], next(self._seq), chat_id))
+                self._wakeup.set()
+            else:
+                del self._chats[chat_id]
+
+
+# Global instance
+outbound_scheduler = OutboundScheduler()
@@ -35,7 +35,7 @@ class PaymentRetryService:
                 user = await user_service.get_or_create_user(str(telegram_user_id))
                 
                 # Get retry settings
-                max_attempts = await settings_service.get_setting('payment_retry_attempts', 3)
+                max_attempts = await settings_service.get_setting('payment_retry_attempts')
                 
                 # Get current attempt count from events
                 result = await session.execute(
@@ -76,10 +76,7 @@ class PaymentRetryService:
             from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
             
             # Get retry message template
-            template = await settings_service.get_setting(
-                'payment_retry_template',
-                "❌ Оплата не прошла (попытка {attempt} из {max_attempts})\n\nПопробуйте:\n• Другой способ оплаты\n• Проверить данные карты\n• Повторить через несколько минут"
-            )
+            template = await settings_service.get_setting('payment_retry_template')
             
             retry_text = template.replace("{attempt}", str(attempt))
             retry_text = retry_text.replace("{max_attempts}", str(max_attempts))
@@ -120,13 +117,10 @@ class PaymentRetryService:
             from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
             
             # Get support contact
-            support_contact = await settings_service.get_setting('support_contact', '@support')
+            support_contact = await settings_service.get_setting('support_contact')
             
             # Get max attempts message template
-            template = await settings_service.get_setting(
-                'payment_max_attempts_template',
-                "😔 К сожалению, платеж не прошел после нескольких попыток.\n\nДля помощи с оплатой обратитесь в поддержку: {support_contact}\n\nМы поможем решить любые проблемы!"
-            )
+            template = await settings_service.get_setting('payment_max_attempts_template')
             
             message_text = template.replace("{support_contact}", support_contact)
             
@@ -15,10 +15,12 @@ import sys
 sys.path.append('../../../')
 
 from shared.config.database import async_session
+from shared.config.settings import settings
 from shared.models.user import User
 from shared.models.subscription import Subscription
 from .settings_service import SettingsService
 from .user_service import UserService
+from .entitlement_service import entitlement_service
 from utils.ux_helper import UXHelper
 import logging
 
@@ -36,7 +38,7 @@ class PaymentService:
                 settings_service = SettingsService(session)
                 
                 # Get subscription plans
-                plans = await settings_service.get_setting("subscription_plans", [])
+                plans = await settings_service.get_setting("subscription_plans")
                 selected_plan = next((p for p in plans if p['name'] == plan_name), None)
                 
                 if not selected_plan:
@@ -82,15 +84,15 @@ class PaymentService:
                 settings_service = SettingsService(session)
                 
                 # Get subscription plans and CryptoCloud settings
-                plans = await settings_service.get_setting("subscription_plans", [])
+                plans = await settings_service.get_setting("subscription_plans")
                 selected_plan = next((p for p in plans if p['name'] == plan_name), None)
                 
                 if not selected_plan:
                     return None, "План не найден"
                 
                 # Get CryptoCloud API credentials
-                api_key = await settings_service.get_setting("cryptocloud_api_key", "")
-                shop_id = await settings_service.get_setting("cryptocloud_shop_id", "")
+                api_key = await settings_service.get_setting("cryptocloud_api_key")
+                shop_id = await settings_service.get_setting("cryptocloud_shop_id")
                 
                 if not api_key or not shop_id:
                     return None, "CryptoCloud не настроен. Обратитесь к администратору"
@@ -109,7 +111,7 @@ class PaymentService:
                 
                 async with httpx.AsyncClient(timeout=30) as client:
                     response = await client.post(
-                        "https://api.cryptocloud.plus/v2/invoice/create",
+                        f"{settings.cryptocloud_api_url}/v2/invoice/create",
                         headers={"Authorization": f"Token {api_key}"},
                         json=payload
                     )
@@ -137,6 +139,8 @@ class PaymentService:
                         )
                         session.add(subscription)
                         await session.commit()
+                        # The pending row is now the user's latest subscription
+                        await entitlement_service.invalidate(user.id)
                         
                         # Log payment attempt using the internal database user ID
                         await user_service.log_event(user.id, "payment_attempt", {
@@ -185,7 +189,7 @@ class PaymentService:
                 user_service = UserService(session)
                 
                 # Get plan details
-                plans = await settings_service.get_setting("subscription_plans", [])
+                plans = await settings_service.get_setting("subscription_plans")
                 plan = next((p for p in plans if p['name'] == plan_name), None)
                 
                 if not plan:
@@ -229,6 +233,7 @@ class PaymentService:
                     subscription.payment_id = payment_charge_id
                 
                 await session.commit()
+                await entitlement_service.invalidate(user.id)
                 
                 # Log successful payment
                 await user_service.log_event(user_id, "payment_ok", {
@@ -250,14 +255,14 @@ class PaymentService:
         try:
             async with async_session() as session:
                 settings_service = SettingsService(session)
-                api_key = await settings_service.get_setting("cryptocloud_api_key", "")
+                api_key = await settings_service.get_setting("cryptocloud_api_key")
                 
                 if not api_key:
                     return {"status": "error", "message": "API key not configured"}
                 
                 async with httpx.AsyncClient(timeout=30) as client:
                     response = await client.post(
-                        "https://api.cryptocloud.plus/v2/invoice/merchant/info",
+                        f"{settings.cryptocloud_api_url}/v2/invoice/merchant/info",
                         headers={"Authorization": f"Token {api_key}"},
                         json={"uuids": [invoice_id]}
                     )
@@ -304,6 +309,7 @@ class PaymentService:
                 # Activate subscription
                 subscription.is_active = True
                 await session.commit()
+                await entitlement_service.invalidate(subscription.user_id)
                 
                 # Log successful payment
                 user_service = UserService(session)
@@ -2,17 +2,24 @@
 AI-сервис для генерации текстов пингов
 """
 import asyncio
+import json
 from openai import AsyncOpenAI
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import sys
 sys.path.append('../../../')
 
 from shared.config.settings import settings
 from shared.models.user import User
+from shared.services.llm_cache import llm_cache
+from shared.services.message_templates import render_for_user
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Максимум вариантов в одном запросе пакетной генерации
+PING_VARIANTS_PER_CALL = 10
+GENDER_NAMES = {"male": "мужской", "female": "женский"}
+
 
 class PingAIService:
     """Сервис для AI-генерации текстов пингов"""
@@ -79,6 +86,76 @@ class PingAIService:
             # Возвращаем fallback сообщение
             return self._get_fallback_ping(ping_level, user)
     
+    async def generate_ping_batch(
+        self,
+        ping_level: int,
+        system_prompt: str,
+        count: int,
+        emotion_tags: Optional[List[str]] = None,
+        gender: Optional[str] = None
+    ) -> List[str]:
+        """
+        Генерирует несколько вариантов пинга одним запросом для группы похожих пользователей
+        
+        Ответ запрашивается как JSON, имя остаётся плейсхолдером {name} и
+        подставляется для каждого пользователя отдельно.
+        
+        Args:
+            ping_level: Уровень пинга (1, 2, 3)
+            system_prompt: Системный промпт для генерации
+            count: Сколько вариантов нужно (не больше PING_VARIANTS_PER_CALL)
+            emotion_tags: Эмоции, общие для группы
+            gender: Пол пользователей группы (male, female) или None
+            
+        Returns:
+            Список вариантов; исключение при ошибке API или формата ответа
+        """
+        count = max(1, min(count, PING_VARIANTS_PER_CALL))
+        
+        group_info = []
+        if gender in GENDER_NAMES:
+            group_info.append(f"Пол: {GENDER_NAMES[gender]}")
+        if emotion_tags:
+            group_info.append(f"Основные эмоции: {', '.join(emotion_tags)}")
+        
+        messages = [
+            {
+                "role": "system",
+                "content": f"{system_prompt}\n\n{self._get_level_instructions(ping_level)}"
+            },
+            {
+                "role": "user",
+                "content": (
+                    f"Создай {count} разных сообщений для пинга {ping_level} уровня.\n\n"
+                    + ("\n".join(group_info) + "\n\n" if group_info else "")
+                    + "Каждое сообщение короткое (до 50 символов), теплое и подходит для данного уровня контакта. "
+                    "Если обращаешься по имени, пиши {name} вместо имени.\n"
+                    'Ответь только JSON-объектом вида {"messages": ["...", "..."]}.'
+                )
+            }
+        ]
+        
+        result = await llm_cache.complete(
+            self.client,
+            use_cache=False,
+            timeout=20.0,
+            model="gpt-3.5-turbo",
+            messages=messages,
+            max_tokens=60 * count + 50,
+            temperature=0.9,
+            response_format={"type": "json_object"}
+        )
+        
+        variants = [
+            text.strip() for text in json.loads(result["content"]).get("messages", [])
+            if isinstance(text, str) and text.strip() and len(text) <= 200
+        ]
+        if not variants:
+            raise ValueError("AI ping batch returned no usable messages")
+        
+        logger.info(f"Generated {len(variants)} ping variants for level {ping_level}")
+        return variants
+    
     def _get_level_instructions(self, ping_level: int) -> str:
         """Получает инструкции для конкретного уровня пинга"""
         instructions = {
@@ -114,37 +191,7 @@ class PingAIService:
     
     def _substitute_user_variables(self, text: str, user: User) -> str:
         """Подставляет переменные пользователя в сгенерированный текст"""
-        import pytz
-        from datetime import datetime
-        
-        # Подстановка имени
-        if '{name}' in text:
-            name = user.name if user.name else "друг мой"
-            text = text.replace('{name}', name)
-        
-        # Подстановка времени суток
-        if '{day_part}' in text:
-            try:
-                if user.timezone:
-                    tz = pytz.timezone(user.timezone)
-                    current_hour = datetime.now(tz).hour
-                else:
-                    current_hour = datetime.utcnow().hour
-                    
-                if 5 <= current_hour < 12:
-                    day_part = "Доброе утро"
-                elif 12 <= current_hour < 17:
-                    day_part = "Добрый день" 
-                elif 17 <= current_hour < 22:
-                    day_part = "Добрый вечер"
-                else:
-                    day_part = "Доброй ночи"
-                    
-                text = text.replace('{day_part}', day_part)
-            except Exception:
-                text = text.replace('{day_part}', "Привет")
-        
-        return text
+        return render_for_user(text, user)
     
     def _get_fallback_ping(self, ping_level: int, user: User) -> str:
         """Возвращает fallback сообщение при ошибке AI-генерации"""
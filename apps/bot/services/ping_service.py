@@ -3,23 +3,32 @@
 """
 import asyncio
 from datetime import datetime, timedelta
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
-from typing import List, Dict, Optional
+from sqlalchemy import select, update, and_, func
+from typing import List, Dict, Optional, Tuple
 import sys
 sys.path.append('../../../')
 
 from shared.config.database import async_session
 from shared.models.user import User
-from shared.models.conversation import Conversation, Message
 from shared.models.analytics import Event
-from .settings_service import SettingsService
+from shared.services.message_templates import render_for_user
+from .settings_cache import settings_cache
+from .greeting_pool import tone_bucket, TONE_EMOTIONS
 from utils.ux_helper import UXHelper
 import pytz
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Настройки, которые читает сервис пингов
+PING_SETTING_KEYS = (
+    'ping_enabled', 'allowed_ping_hours_start', 'allowed_ping_hours_end', 'session_close_timeout',
+    'progressive_ping_1_delay', 'progressive_ping_2_delay', 'progressive_ping_3_delay',
+    'ping_ai_generation_enabled', 'ping_ai_system_prompt',
+    'progressive_ping_1_templates', 'progressive_ping_2_templates', 'progressive_ping_3_templates',
+    'idle_ping_templates', 'idle_ping_delay'
+)
+
 
 class PingService:
     """Сервис управления пингами пользователей"""
@@ -27,6 +36,11 @@ class PingService:
     def __init__(self):
         pass
     
+    def _ping_settings(self) -> Dict:
+        """Настройки пингов из уже декодированного снимка, без запросов к БД"""
+        cfg = settings_cache.config
+        return {key: getattr(cfg, key) for key in PING_SETTING_KEYS}
+    
     async def should_send_ping(self, user: User, settings: Dict) -> Dict:
         """
         Определяет, нужно ли отправить пинг пользователю
@@ -55,64 +69,17 @@ class PingService:
         if not await self._is_allowed_ping_time(user, settings):
             return None
             
-        now = datetime.utcnow()
-        # Use new progressive delay settings, fallback to legacy idle_ping_delay
-        progressive_ping_1_delay = settings.get('progressive_ping_1_delay', settings.get('idle_ping_delay', 30))
-        
-        async with async_session() as session:
-            # Ищем последнее сообщение пользователя
-            last_message = await session.execute(
-                select(Message)
-                .join(Conversation)
-                .where(
-                    and_(
-                        Conversation.user_id == user.id,
-                        Message.role == 'user'
-                    )
-                )
-                .order_by(Message.created_at.desc())
-                .limit(1)
-            )
-            last_message_obj = last_message.scalar_one_or_none()
-            
-            if not last_message_obj:
-                return None
-                
-            time_since_last = now - last_message_obj.created_at
-            
-            # Проверяем последний отправленный пинг
-            last_ping_event = await session.execute(
-                select(Event)
-                .where(
-                    and_(
-                        Event.user_id == user.id,
-                        Event.event_type == 'ping_sent'
-                    )
-                )
-                .order_by(Event.created_at.desc())
-                .limit(1)
-            )
-            last_ping = last_ping_event.scalar_one_or_none()
+        # Последнее сообщение пользователя хранится прямо в users
+        if not user.last_user_message_at:
+            return None
             
-            # Прогрессивная система пингов
-            return await self._calculate_progressive_ping(
-                user.id, 
-                last_message_obj.created_at, 
-                last_ping, 
-                now, 
-                session,
-                settings
-            )
-        
-        return None
+        # Прогрессивная система пингов
+        return self._calculate_progressive_ping(user, datetime.utcnow(), settings)
 
-    async def _calculate_progressive_ping(
+    def _calculate_progressive_ping(
         self, 
-        user_id: int, 
-        last_message_time: datetime, 
-        last_ping_event, 
+        user: User, 
         now: datetime,
-        session: AsyncSession,
         settings: Dict
     ) -> Dict:
         """
@@ -121,6 +88,7 @@ class PingService:
         2. Через progressive_ping_2_delay минут после первого пинга  
         3. Через progressive_ping_3_delay минут после второго пинга
         """
+        last_message_time = user.last_user_message_at
         time_since_last_message = now - last_message_time
         
         # Получаем настройки задержек (в минутах)
@@ -128,18 +96,8 @@ class PingService:
         ping_2_delay = settings.get('progressive_ping_2_delay', 120)  # 2 часа
         ping_3_delay = settings.get('progressive_ping_3_delay', 1440)  # 24 часа
         
-        # Считаем количество пингов после последнего сообщения пользователя
-        pings_after_last_message = await session.execute(
-            select(func.count(Event.id))
-            .where(
-                and_(
-                    Event.user_id == user_id,
-                    Event.event_type == 'ping_sent',
-                    Event.created_at > last_message_time
-                )
-            )
-        )
-        ping_count = pings_after_last_message.scalar() or 0
+        # Количество пингов после последнего сообщения пользователя
+        ping_count = user.pings_since_last_message or 0
         
         # 1-й пинг: через настраиваемое время после последнего сообщения
         if ping_count == 0 and time_since_last_message >= timedelta(minutes=ping_1_delay):
@@ -150,8 +108,8 @@ class PingService:
             }
         
         # 2-й пинг: через настраиваемое время после первого пинга
-        if ping_count == 1 and last_ping_event:
-            time_since_first_ping = now - last_ping_event.created_at
+        if ping_count == 1 and user.last_ping_at:
+            time_since_first_ping = now - user.last_ping_at
             if time_since_first_ping >= timedelta(minutes=ping_2_delay):
                 return {
                     'type': 'progressive_ping_2', 
@@ -160,8 +118,8 @@ class PingService:
                 }
         
         # 3-й пинг: через настраиваемое время после второго пинга
-        if ping_count == 2 and last_ping_event:
-            time_since_second_ping = now - last_ping_event.created_at
+        if ping_count == 2 and user.last_ping_at:
+            time_since_second_ping = now - user.last_ping_at
             if time_since_second_ping >= timedelta(minutes=ping_3_delay):
                 return {
                     'type': 'progressive_ping_3',
@@ -172,54 +130,6 @@ class PingService:
         # После 3-го пинга больше не отправляем (или можно добавить логику повтора через неделю)
         return None
     
-    async def check_session_timeout(self, user: User, settings: Dict) -> bool:
-        """
-        Проверяет и закрывает сессии по таймауту
-        
-        Returns:
-            True если сессия была закрыта
-        """
-        session_close_timeout = settings.get('session_close_timeout', 48)
-        now = datetime.utcnow()
-        timeout_threshold = now - timedelta(hours=session_close_timeout)
-        
-        async with async_session() as session:
-            # Ищем активные сессии пользователя
-            active_conversations = await session.execute(
-                select(Conversation)
-                .where(
-                    and_(
-                        Conversation.user_id == user.id,
-                        Conversation.is_active == True
-                    )
-                )
-                .order_by(Conversation.created_at.desc())
-            )
-            active_convs = active_conversations.scalars().all()
-            
-            sessions_closed = False
-            
-            for conv in active_convs:
-                # Ищем последнее сообщение в сессии
-                last_message = await session.execute(
-                    select(Message)
-                    .where(Message.conversation_id == conv.id)
-                    .order_by(Message.created_at.desc())
-                    .limit(1)
-                )
-                last_msg = last_message.scalar_one_or_none()
-                
-                # Если последнее сообщение старше timeout_threshold, закрываем сессию
-                if last_msg and last_msg.created_at < timeout_threshold:
-                    from services.conversation_service import ConversationService
-                    conv_service = ConversationService(session)
-                    await conv_service.close_conversation(conv)
-                    sessions_closed = True
-                    
-                    logger.info(f"Closed session {conv.id} for user {user.id} due to timeout")
-            
-            return sessions_closed
-    
     async def _is_allowed_ping_time(self, user: User, settings: Dict) -> bool:
         """
         Проверяет, входит ли текущее время в разрешенные часы для пингов
@@ -298,6 +208,49 @@ class PingService:
             user_context=user_context
         )
     
+    async def _generate_ai_ping_texts(self, due: List[Tuple[User, Dict]], settings: Dict) -> Dict[int, str]:
+        """
+        Пакетная AI-генерация текстов для всех пользователей одного прогона
+        
+        Пользователи группируются по уровню пинга, тону эмоций и полу (текст на
+        русском зависит от рода); на группу делается один запрос, варианты
+        раздаются по кругу с подстановкой переменных для каждого пользователя.
+        
+        Returns:
+            {user_id: текст}; пользователей из групп с ошибкой генерации в словаре нет
+        """
+        from .ping_ai_service import PingAIService, PING_VARIANTS_PER_CALL
+        
+        groups: Dict[Tuple, List[User]] = {}
+        for user, ping_info in due:
+            gender = user.gender if user.gender in ('male', 'female') else None
+            group_key = (ping_info['level'], tone_bucket(user.emotion_tags), gender)
+            groups.setdefault(group_key, []).append(user)
+        
+        ping_ai_service = PingAIService()
+        group_keys = list(groups)
+        results = await asyncio.gather(*[
+            ping_ai_service.generate_ping_batch(
+                ping_level=level,
+                system_prompt=settings['ping_ai_system_prompt'],
+                count=min(len(groups[(level, tone, gender)]), PING_VARIANTS_PER_CALL),
+                emotion_tags=TONE_EMOTIONS[tone],
+                gender=gender
+            )
+            for level, tone, gender in group_keys
+        ], return_exceptions=True)
+        
+        texts = {}
+        for group_key, variants in zip(group_keys, results):
+            if isinstance(variants, Exception):
+                logger.warning(f"AI ping batch failed for group {group_key}: {variants}, falling back to templates")
+                continue
+            for i, user in enumerate(groups[group_key]):
+                texts[user.id] = self._substitute_variables(variants[i % len(variants)], user)
+        
+        logger.info(f"Generated AI pings for {len(texts)} users in {len(group_keys)} requests")
+        return texts
+    
     async def _get_template_ping_text(self, user: User, settings: Dict, ping_type: str) -> str:
         """Получает текст пинга из шаблонов (legacy метод)"""
         # Прогрессивные пинги с разной интенсивностью
@@ -355,53 +308,22 @@ class PingService:
     
     def _substitute_variables(self, template: str, user: User) -> str:
         """Заменяет переменные в шаблоне пинга"""
-        import pytz
-        from datetime import datetime
-        
-        # Подстановка имени
-        if '{name}' in template:
-            name = user.name if user.name else "друг мой"
-            template = template.replace('{name}', name)
-        
-        # Подстановка времени суток
-        if '{day_part}' in template:
-            try:
-                if user.timezone:
-                    tz = pytz.timezone(user.timezone)
-                    current_hour = datetime.now(tz).hour
-                else:
-                    current_hour = datetime.utcnow().hour
-                    
-                if 5 <= current_hour < 12:
-                    day_part = "Доброе утро"
-                elif 12 <= current_hour < 17:
-                    day_part = "Добрый день" 
-                elif 17 <= current_hour < 22:
-                    day_part = "Добрый вечер"
-                else:
-                    day_part = "Доброй ночи"
-                    
-                template = template.replace('{day_part}', day_part)
-            except Exception:
-                template = template.replace('{day_part}', "Привет")
-        
-        return template
+        return render_for_user(template, user)
     
-    async def send_ping(self, user_id: int, bot_instance) -> bool:
+    async def send_ping(self, user_id: int, bot_instance, ping_text: Optional[str] = None) -> bool:
         """
         Отправляет пинг конкретному пользователю
         
         Args:
             user_id: ID пользователя
             bot_instance: Экземпляр бота для отправки сообщений
+            ping_text: Готовый текст пинга; если не задан, генерируется здесь
             
         Returns:
             True если пинг отправлен успешно
         """
         try:
             async with async_session() as session:
-                settings_service = SettingsService(session)
-                
                 # Получаем пользователя
                 user_result = await session.execute(
                     select(User).where(User.id == user_id)
@@ -411,37 +333,16 @@ class PingService:
                     return False
                 
                 # Получаем настройки пингов
-                settings = {
-                    'ping_enabled': await settings_service.get_setting('ping_enabled', True),
-                    'allowed_ping_hours_start': await settings_service.get_setting('allowed_ping_hours_start', 10),
-                    'allowed_ping_hours_end': await settings_service.get_setting('allowed_ping_hours_end', 21),
-                    'session_close_timeout': await settings_service.get_setting('session_close_timeout', 48),
-                    
-                    # Progressive ping timing settings
-                    'progressive_ping_1_delay': await settings_service.get_setting('progressive_ping_1_delay', 30),
-                    'progressive_ping_2_delay': await settings_service.get_setting('progressive_ping_2_delay', 120),
-                    'progressive_ping_3_delay': await settings_service.get_setting('progressive_ping_3_delay', 1440),
-                    
-                    # AI settings
-                    'ping_ai_generation_enabled': await settings_service.get_setting('ping_ai_generation_enabled', False),
-                    'ping_ai_system_prompt': await settings_service.get_setting('ping_ai_system_prompt', "Создай короткое теплое сообщение для проверки связи с пользователем."),
-                    
-                    # Template settings
-                    'progressive_ping_1_templates': await settings_service.get_setting('progressive_ping_1_templates', []),
-                    'progressive_ping_2_templates': await settings_service.get_setting('progressive_ping_2_templates', []),
-                    'progressive_ping_3_templates': await settings_service.get_setting('progressive_ping_3_templates', [])
-                }
+                settings = self._ping_settings()
                 
                 # Проверяем, нужно ли отправлять пинг
                 ping_info = await self.should_send_ping(user, settings)
                 if not ping_info:
                     return False
                 
-                # Проверяем и закрываем сессии по таймауту
-                await self.check_session_timeout(user, settings)
-                
-                # Генерируем текст пинга
-                ping_text = await self.get_ping_text(user, settings, ping_info['type'])
+                # Генерируем текст пинга, если он не подготовлен заранее
+                if ping_text is None:
+                    ping_text = await self.get_ping_text(user, settings, ping_info['type'])
                 
                 # Отправляем пинг
                 await bot_instance.send_message(
@@ -456,6 +357,17 @@ class PingService:
                     properties={'ping_text': ping_text}
                 )
                 session.add(ping_event)
+                
+                # Обновляем счётчики пингов в той же транзакции
+                await session.execute(
+                    update(User)
+                    .where(User.id == user.id)
+                    .values(
+                        last_ping_at=func.now(),
+                        pings_since_last_message=func.coalesce(User.pings_since_last_message, 0) + 1
+                    )
+                    .execution_options(synchronize_session=False)
+                )
                 await session.commit()
                 
                 logger.info(f"Ping sent to user {user_id}")
@@ -472,59 +384,51 @@ class PingService:
         """
         try:
             async with async_session() as session:
-                settings_service = SettingsService(session)
-                
                 # Получаем общие настройки пингов
-                ping_enabled = await settings_service.get_setting('ping_enabled', True)
-                if not ping_enabled:
+                settings = self._ping_settings()
+                if not settings['ping_enabled']:
                     return
                 
-                # Получаем всех активных пользователей с включенными пингами
+                # Кандидаты на пинг: молчат дольше первой задержки и ещё не получили все 3 пинга
+                idle_threshold = datetime.utcnow() - timedelta(
+                    minutes=settings.get('progressive_ping_1_delay', settings.get('idle_ping_delay', 30))
+                )
                 users_result = await session.execute(
                     select(User).where(
                         and_(
                             User.is_active == True,
                             User.ping_enabled == True,
                             User.is_in_crisis == False,
-                            User.terms_accepted == True
+                            User.terms_accepted == True,
+                            User.last_user_message_at <= idle_threshold,
+                            User.pings_since_last_message < 3
                         )
                     )
                 )
                 users = users_result.scalars().all()
                 
-                settings = {
-                    'ping_enabled': ping_enabled,
-                    'allowed_ping_hours_start': await settings_service.get_setting('allowed_ping_hours_start', 10),
-                    'allowed_ping_hours_end': await settings_service.get_setting('allowed_ping_hours_end', 21),
-                    'session_close_timeout': await settings_service.get_setting('session_close_timeout', 48),
-                    
-                    # Progressive ping timing settings
-                    'progressive_ping_1_delay': await settings_service.get_setting('progressive_ping_1_delay', 30),
-                    'progressive_ping_2_delay': await settings_service.get_setting('progressive_ping_2_delay', 120),
-                    'progressive_ping_3_delay': await settings_service.get_setting('progressive_ping_3_delay', 1440),
-                    
-                    # AI settings
-                    'ping_ai_generation_enabled': await settings_service.get_setting('ping_ai_generation_enabled', False),
-                    'ping_ai_system_prompt': await settings_service.get_setting('ping_ai_system_prompt', "Создай короткое теплое сообщение для проверки связи с пользователем."),
-                    
-                    # Template settings
-                    'progressive_ping_1_templates': await settings_service.get_setting('progressive_ping_1_templates', []),
-                    'progressive_ping_2_templates': await settings_service.get_setting('progressive_ping_2_templates', []),
-                    'progressive_ping_3_templates': await settings_service.get_setting('progressive_ping_3_templates', []),
-                    
-                    # Legacy settings for backward compatibility
-                    'idle_ping_delay': await settings_service.get_setting('idle_ping_delay', 30)
-                }
+                due = []
+                for user in users:
+                    ping_info = await self.should_send_ping(user, settings)
+                    if ping_info:
+                        due.append((user, ping_info))
+                
+                # Тексты готовятся до рассылки, чтобы в цикле отправки не ждать GPT
+                ai_texts = {}
+                if due and settings['ping_ai_generation_enabled']:
+                    ai_texts = await self._generate_ai_ping_texts(due, settings)
                 
                 ping_count = 0
-                for user in users:
-                    if await self.should_send_ping(user, settings):
-                        success = await self.send_ping(user.id, bot_instance)
-                        if success:
-                            ping_count += 1
-                        
-                        # Небольшая задержка между пингами чтобы не заспамить
-                        await asyncio.sleep(0.5)
+                for user, ping_info in due:
+                    ping_text = ai_texts.get(user.id)
+                    if ping_text is None:
+                        ping_text = await self._get_template_ping_text(user, settings, ping_info['type'])
+                    success = await self.send_ping(user.id, bot_instance, ping_text)
+                    if success:
+                        ping_count += 1
+                    
+                    # Небольшая задержка между пингами чтобы не заспамить
+                    await asyncio.sleep(0.5)
                 
                 logger.info(f"Ping check completed. Sent {ping_count} pings to {len(users)} users")
                 
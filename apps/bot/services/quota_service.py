@@ -0,0 +1,212 @@
+"""
+Atomic daily message quota backed by Redis
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import text
+import sys
+sys.path.append('../../../')
+
+from shared.config.database import async_session
+from shared.config.redis import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Check and consume in one round-trip: never lets the counter pass the limit.
+# A missing counter is seeded from ARGV[3] (today's count in the DB); without
+# a seed the script returns {-1, 0} so the caller can look it up and retry.
+CONSUME_SCRIPT = """
+local used = redis.call('GET', KEYS[1])
+if not used then
+    if not ARGV[3] then
+        return {-1, 0}
+    end
+    redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[2], 'NX')
+    used = redis.call('GET', KEYS[1])
+end
+used = tonumber(used)
+if used >= tonumber(ARGV[1]) then
+    return {0, used}
+end
+return {1, redis.call('INCR', KEYS[1])}
+"""
+
+# Give back a reserved message without going below zero
+RELEASE_SCRIPT = """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+if used > 0 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
+
+class QuotaService:
+    """Daily free-message counters keyed by user and UTC day"""
+
+    KEY_PREFIX = "quota"
+    # Keep the counter past midnight so the last reconcile of the day can read it
+    TTL_GRACE_SECONDS = 3600
+
+    def __init__(self):
+        self._redis = None
+        self._consume_script = None
+        self._release_script = None
+
+    async def try_consume(self, user_id: int, limit: int) -> Optional[Dict]:
+        """
+        Atomically reserve one message if the user is under the limit
+
+        Returns:
+            {'allowed': bool, 'used': int} or None if Redis is unavailable
+        """
+        redis_client = await get_redis()
+        if not redis_client:
+            return None
+
+        try:
+            self._register_scripts(redis_client)
+            now = datetime.utcnow()
+            key = self._key(user_id, now)
+            allowed, used = await self._consume_script(keys=[key], args=[limit, self._ttl(now)])
+            if allowed == -1:
+                # First message of the day in Redis: continue from the DB count
+                seed = await self._stored_used(user_id, now)
+                allowed, used = await self._consume_script(keys=[key], args=[limit, self._ttl(now), seed])
+            return {'allowed': bool(allowed), 'used': int(used)}
+        except Exception as e:
+            logger.warning(f"Quota consume failed for user {user_id}: {e}")
+            return None
+
+    async def _stored_used(self, user_id: int, now: datetime) -> int:
+        """
+        Today's count on the latest subscription row: written by the DB
+        fallback or by reconcile before the Redis counter was lost
+        """
+        async with async_session() as session:
+            result = await session.execute(
+                text("""
+                    SELECT daily_messages_used FROM subscriptions
+                    WHERE user_id = :user_id AND daily_reset_at > :now
+                    ORDER BY created_at DESC
+                    LIMIT 1
+                """),
+                {'user_id': user_id, 'now': now}
+            )
+            return result.scalar_one_or_none() or 0
+
+    async def release(self, user_id: int) -> bool:
+        """Return a reserved message (reply was not delivered)"""
+        redis_client = await get_redis()
+        if not redis_client:
+            return False
+
+        try:
+            self._register_scripts(redis_client)
+            await self._release_script(keys=[self._key(user_id, datetime.utcnow())])
+            return True
+        except Exception as e:
+            logger.warning(f"Quota release failed for user {user_id}: {e}")
+            return False
+
+    async def get_used(self, user_id: int) -> Optional[int]:
+        """Messages used today, or None if Redis is unavailable"""
+        redis_client = await get_redis()
+        if not redis_client:
+            return None
+
+        try:
+            used = await redis_client.get(self._key(user_id, datetime.utcnow()))
+            return int(used or 0)
+        except Exception:
+            return None
+
+    async def reconcile(self, batch_size: int = 500) -> int:
+        """
+        Copy today's Redis counters into subscriptions.daily_messages_used
+        so the admin panel and reports see current numbers. Within a day the
+        DB value only goes up: a counter lost and re-created in Redis never
+        lowers what was already recorded.
+
+        Returns:
+            Number of users reconciled
+        """
+        redis_client = await get_redis()
+        if not redis_client:
+            return 0
+
+        now = datetime.utcnow()
+        day = now.strftime('%Y%m%d')
+        reset_at = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+        reconciled = 0
+        keys = []
+        async for key in redis_client.scan_iter(match=f"{self.KEY_PREFIX}:*:{day}", count=batch_size):
+            keys.append(key)
+            if len(keys) >= batch_size:
+                reconciled += await self._write_counters(redis_client, keys, reset_at)
+                keys = []
+
+        if keys:
+            reconciled += await self._write_counters(redis_client, keys, reset_at)
+
+        return reconciled
+
+    async def _write_counters(self, redis_client, keys, reset_at: datetime) -> int:
+        """Bulk-update the latest subscription row of each user"""
+        values = await redis_client.mget(keys)
+
+        params = []
+        for key, used in zip(keys, values):
+            if used is None:
+                continue
+            params.append({
+                'user_id': int(key.split(':')[1]),
+                'used': int(used),
+                'reset_at': reset_at
+            })
+
+        if not params:
+            return 0
+
+        async with async_session() as session:
+            await session.execute(
+                text("""
+                    UPDATE subscriptions
+                    SET daily_messages_used = CASE
+                            WHEN daily_reset_at = :reset_at THEN GREATEST(daily_messages_used, :used)
+                            ELSE :used
+                        END,
+                        daily_reset_at = :reset_at
+                    WHERE id = (
+                        SELECT id FROM subscriptions
+                        WHERE user_id = :user_id
+                        ORDER BY created_at DESC
+                        LIMIT 1
+                    )
+                """),
+                params
+            )
+            await session.commit()
+
+        return len(params)
+
+    def _register_scripts(self, redis_client):
+        """Register Lua scripts once per client so calls go through EVALSHA"""
+        if self._redis is not redis_client:
+            self._redis = redis_client
+            self._consume_script = redis_client.register_script(CONSUME_SCRIPT)
+            self._release_script = redis_client.register_script(RELEASE_SCRIPT)
+
+    def _key(self, user_id: int, now: datetime) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}:{now.strftime('%Y%m%d')}"
+
+    def _ttl(self, now: datetime) -> int:
+        next_midnight = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        return int((next_midnight - now).total_seconds()) + self.TTL_GRACE_SECONDS
+
+
+# Global instance
+quota_service = QuotaService()
@@ -1,12 +1,12 @@
 import asyncio
-import random
 from typing import List
 from aiogram import types
 import sys
 sys.path.append('../../../')
 
-from shared.config.database import async_session
-from services.settings_service import SettingsService
+from shared.config.settings_registry import BotConfig
+from services.outbound_scheduler import outbound_scheduler
+from services.typing_manager import typing_manager
 from utils.ux_helper import UXHelper
 
 
@@ -21,10 +21,13 @@ class RhythmService:
         message: types.Message, 
         blocks: List[str], 
         user_id: int,
-        settings_dict: dict = None
-    ) -> types.Message:
+        cfg: BotConfig = None
+    ) -> float:
         """
-        Send response blocks with natural rhythm and pauses
+        Queue response blocks for delivery with natural rhythm and pauses
+        
+        Returns immediately; the outbound scheduler shows typing and sends
+        each block at its time, so the handler can release its session.
         
         Args:
             message: Original user message to reply to
@@ -32,59 +35,12 @@ class RhythmService:
             user_id: User ID for personalized settings
             
         Returns:
-            Last sent message (for adding inline buttons)
+            Seconds until the last block goes out
         """
         if not blocks:
-            return message
-        
-        # Use provided settings or get from database
-        if settings_dict:
-            delay_min = settings_dict.get("delay_between_blocks_min", 1500)
-            delay_max = settings_dict.get("delay_between_blocks_max", 2500)
-        else:
-            # Fallback to database if settings not provided
-            async with async_session() as session:
-                settings_service = SettingsService(session)
-                delay_min = await settings_service.get_setting("delay_between_blocks_min", 1500)
-                delay_max = await settings_service.get_setting("delay_between_blocks_max", 2500)
-            
-        typing_duration_base = 0.5
-        typing_duration_per_word = 0.05
-        
-        last_message = None
+            return 0.0
         
-        for i, block in enumerate(blocks):
-            # Calculate typing duration based on block length
-            word_count = len(block.split())
-            typing_duration = typing_duration_base + (word_count * typing_duration_per_word)
-            typing_duration = min(typing_duration, 4.0)  # Max 5 seconds typing
-            
-            # Show typing action
-            await message.bot.send_chat_action(message.chat.id, "typing")
-            await asyncio.sleep(typing_duration)
-            
-            # Send the block
-            if i == 0:
-                # First block is a reply to user message
-                last_message = await message.answer(
-                    block,
-                    parse_mode="HTML"
-                )
-            else:
-                # Subsequent blocks are regular messages
-                last_message = await message.answer(
-                    block,
-                    parse_mode="HTML"
-                )
-            
-            # Add pause between blocks (except for last one)
-            if i < len(blocks) - 1:
-                pause_duration = random.uniform(delay_min / 1000, delay_max / 1000)
-                await asyncio.sleep(pause_duration)
-        
-        # No buttons needed - clean conversation flow
-        
-        return last_message
+        return outbound_scheduler.enqueue_blocks(message.bot, message.chat.id, blocks, cfg)
     
     async def send_with_typing(
         self, 
@@ -114,11 +70,13 @@ class RhythmService:
             text = text[:4093] + "..."
         
         # Show typing
-        await message.bot.send_chat_action(message.chat.id, "typing")
+        await typing_manager.pulse(message.bot, message.chat.id)
         await asyncio.sleep(delay)
         
         # Send message
-        return await message.answer(text, parse_mode="HTML")
+        sent = await message.answer(text, parse_mode="HTML")
+        typing_manager.message_sent(message.chat.id)
+        return sent
     
     async def send_error_with_retry(
         self, 
@@ -188,14 +146,3 @@ class RhythmService:
                 pass  # Ignore if message can't be edited
         
         return thinking_msg
-    
-    async def _maintain_typing_indicator(self, bot, chat_id):
-        """Maintain continuous typing indicator during long operations"""
-        try:
-            while True:
-                await bot.send_chat_action(chat_id, "typing")
-                await asyncio.sleep(4)  # Typing lasts ~5 seconds, refresh every 4
-        except asyncio.CancelledError:
-            pass  # Task was cancelled, stop typing
-        except Exception:
-            pass  # Ignore typing errors
\ No newline at end of file
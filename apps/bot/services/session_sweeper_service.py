@@ -0,0 +1,190 @@
+"""
+Сервис закрытия неактивных сессий по таймауту
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, and_
+from typing import List, Tuple
+import sys
+sys.path.append('../../../')
+
+from shared.config.database import async_session
+from shared.config.redis import get_redis, RedisCache
+from shared.models.conversation import Conversation
+from .settings_service import SettingsService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SessionSweeperService:
+    """Закрывает все просроченные сессии одним запросом и ставит резюме в очередь"""
+
+    SUMMARY_QUEUE_KEY = "summary_queue"
+    # Взятые в работу сессии остаются здесь до успешного резюме
+    SUMMARY_PROCESSING_KEY = "summary_queue:processing"
+    SUMMARY_CLAIMS_KEY = "summary_queue:claims"
+    SUMMARY_ATTEMPTS_KEY = "summary_queue:attempts"
+    # Сессия, которая столько висит в обработке, возвращается в очередь
+    SUMMARY_STALE_SECONDS = 15 * 60
+    # После стольких возвратов в очередь сессия остаётся без резюме
+    SUMMARY_MAX_ATTEMPTS = 5
+    ENQUEUE_BATCH_SIZE = 1000
+
+    def __init__(self):
+        self.cache = RedisCache()
+
+    async def sweep_expired_sessions(self) -> int:
+        """
+        Закрывает все активные сессии, последнее сообщение в которых
+        старше session_close_timeout
+
+        Returns:
+            Количество закрытых сессий
+        """
+        async with async_session() as session:
+            settings_service = SettingsService(session)
+            session_close_timeout = await settings_service.get_setting('session_close_timeout')
+
+            now = datetime.utcnow()
+            timeout_threshold = now - timedelta(hours=session_close_timeout)
+
+            result = await session.execute(
+                update(Conversation)
+                .where(
+                    and_(
+                        Conversation.is_active == True,
+                        Conversation.last_message_at < timeout_threshold
+                    )
+                )
+                .values(is_active=False, is_closed=True, closed_at=now)
+                .returning(Conversation.id, Conversation.user_id)
+                .execution_options(synchronize_session=False)
+            )
+            closed = [(row.id, row.user_id) for row in result]
+            await session.commit()
+
+        if closed:
+            await self._enqueue_summaries(closed)
+            logger.info(f"Closed {len(closed)} sessions due to timeout")
+
+        return len(closed)
+
+    async def _enqueue_summaries(self, closed: List[Tuple[int, int]]):
+        """Ставит закрытые сессии в очередь на создание резюме"""
+        redis_client = await get_redis()
+
+        if not redis_client:
+            # Без Redis очереди нет - создаём резюме сразу
+            for conversation_id, user_id in closed:
+                await self._summarize_conversation(conversation_id)
+            return
+
+        for i in range(0, len(closed), self.ENQUEUE_BATCH_SIZE):
+            batch = closed[i:i + self.ENQUEUE_BATCH_SIZE]
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.rpush(self.SUMMARY_QUEUE_KEY, *[conversation_id for conversation_id, _ in batch])
+            pipe.delete(*{f"conversation:{user_id}" for _, user_id in batch})
+            await pipe.execute()
+
+    async def process_summary_queue(self, timeout: int = 30) -> bool:
+        """
+        Берёт одну сессию из очереди и создаёт для неё резюме. Сессия
+        переносится в список обработки и удаляется из него только после
+        успешного резюме, так что сбой воркера её не теряет.
+
+        Returns:
+            True если из очереди была взята сессия
+        """
+        redis_client = await get_redis()
+        if not redis_client:
+            await asyncio.sleep(timeout)
+            return False
+
+        item = await redis_client.blmove(
+            self.SUMMARY_QUEUE_KEY, self.SUMMARY_PROCESSING_KEY, timeout, "LEFT", "RIGHT"
+        )
+        if item is None:
+            return False
+
+        await redis_client.hset(self.SUMMARY_CLAIMS_KEY, item, time.time())
+        if await self._summarize_conversation(int(item)):
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.lrem(self.SUMMARY_PROCESSING_KEY, 1, item)
+            pipe.hdel(self.SUMMARY_CLAIMS_KEY, item)
+            pipe.hdel(self.SUMMARY_ATTEMPTS_KEY, item)
+            await pipe.execute()
+        return True
+
+    async def requeue_stale_summaries(self) -> int:
+        """
+        Возвращает в очередь сессии, застрявшие в обработке дольше
+        SUMMARY_STALE_SECONDS (упавший процесс или ошибка резюме)
+
+        Returns:
+            Количество возвращённых сессий
+        """
+        redis_client = await get_redis()
+        if not redis_client:
+            return 0
+
+        items = await redis_client.lrange(self.SUMMARY_PROCESSING_KEY, 0, -1)
+        if not items:
+            return 0
+
+        now = time.time()
+        claims = await redis_client.hmget(self.SUMMARY_CLAIMS_KEY, items)
+        requeued = 0
+        for item, claimed_at in zip(items, claims):
+            if claimed_at is None:
+                # Процесс упал до отметки - считаем время с этого момента
+                await redis_client.hsetnx(self.SUMMARY_CLAIMS_KEY, item, now)
+                continue
+            if now - float(claimed_at) < self.SUMMARY_STALE_SECONDS:
+                continue
+            # Из нескольких процессов вернуть сессию сможет только один
+            if not await redis_client.lrem(self.SUMMARY_PROCESSING_KEY, 1, item):
+                continue
+            await redis_client.hdel(self.SUMMARY_CLAIMS_KEY, item)
+            attempts = await redis_client.hincrby(self.SUMMARY_ATTEMPTS_KEY, item, 1)
+            if attempts >= self.SUMMARY_MAX_ATTEMPTS:
+                await redis_client.hdel(self.SUMMARY_ATTEMPTS_KEY, item)
+                logger.error(f"Giving up on summary for conversation {item} after {attempts} attempts")
+                continue
+            await redis_client.rpush(self.SUMMARY_QUEUE_KEY, item)
+            requeued += 1
+
+        if requeued:
+            logger.info(f"Requeued {requeued} stale session summaries")
+        return requeued
+
+    async def _summarize_conversation(self, conversation_id: int) -> bool:
+        """
+        Создаёт резюме и якоря памяти для закрытой сессии
+
+        Returns:
+            False если резюме не удалось и сессию стоит повторить
+        """
+        from .memory_service import MemoryService
+
+        try:
+            async with async_session() as session:
+                result = await session.execute(
+                    select(Conversation).where(Conversation.id == conversation_id)
+                )
+                conversation = result.scalar_one_or_none()
+                if not conversation:
+                    return True
+
+                memory_service = MemoryService(session)
+                summary = await memory_service.create_conversation_summary(conversation)
+                # Без сообщений резюме не нужно; иначе None - ошибка GPT или разбора
+                if summary is None and conversation.last_message_at is not None:
+                    return False
+
+                await self.cache.clear_conversation_cache(conversation.user_id)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to summarize conversation {conversation_id}: {e}")
+            return False
@@ -2,10 +2,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import sys
 import json
-import redis.asyncio as redis
+import logging
 sys.path.append('../../../')
 
+from shared.config.redis import get_redis
 from shared.models.settings import Settings
+from shared.config.settings_registry import decode_value, default_for, encode_value
+
+logger = logging.getLogger(__name__)
 
 
 class SettingsService:
@@ -15,6 +19,10 @@ class SettingsService:
         self._redis = None
     
     async def get_setting(self, key: str, default_value=None):
+        # Callers only pass a default for keys missing from the registry
+        if default_value is None:
+            default_value = default_for(key)
+        
         # Check cache first
         if key in self._cache:
             return self._cache[key]
@@ -25,18 +33,16 @@ class SettingsService:
         )
         setting = result.scalar_one_or_none()
         
-        if not setting:
-            value = default_value
-        elif setting.string_value is not None:
-            value = setting.string_value
-        elif setting.integer_value is not None:
-            value = setting.integer_value
-        elif setting.boolean_value is not None:
-            value = setting.boolean_value
-        elif setting.json_value is not None:
-            value = setting.json_value
-        else:
-            value = default_value
+        value = default_value
+        if setting:
+            try:
+                value = decode_value(
+                    key, setting.string_value, setting.integer_value, setting.boolean_value, setting.json_value
+                )
+            except ValueError as e:
+                logger.warning(f"Using default for setting {e}")
+            if value is None:
+                value = default_value
         
         # Cache the value
         self._cache[key] = value
@@ -54,14 +60,8 @@ class SettingsService:
             self.session.add(setting)
         
         # Set the appropriate value field based on type
-        if isinstance(value, str):
-            setting.string_value = value
-        elif isinstance(value, int):
-            setting.integer_value = value
-        elif isinstance(value, bool):
-            setting.boolean_value = value
-        else:
-            setting.json_value = value
+        for column, column_value in encode_value(key, value).items():
+            setattr(setting, column, column_value)
         
         setting.is_active = True
         await self.session.commit()
@@ -72,10 +72,7 @@ class SettingsService:
     
     async def get_redis(self):
         if not self._redis:
-            try:
-                self._redis = redis.from_url("redis://localhost:6379", decode_responses=True)
-            except:
-                self._redis = None
+            self._redis = await get_redis()
         return self._redis
     
     async def invalidate_global_cache(self, key: str, value):
@@ -86,6 +83,15 @@ class SettingsService:
         except:
             pass
     
+    async def invalidate_global_cache_keys(self, keys):
+        """One broadcast for a batch of changed keys"""
+        try:
+            redis_client = await self.get_redis()
+            if redis_client:
+                await redis_client.publish("settings_update", json.dumps({"keys": list(keys)}))
+        except:
+            pass
+    
     async def invalidate_cache_key(self, key: str):
         if key in self._cache:
             del self._cache[key]
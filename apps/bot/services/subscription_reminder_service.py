@@ -13,6 +13,7 @@ sys.path.append('../../../')
 from shared.config.database import async_session
 from shared.models.user import User
 from shared.models.subscription import Subscription
+from shared.services.message_templates import render_for_user
 from .settings_service import SettingsService
 from .user_service import UserService
 from utils.ux_helper import UXHelper
@@ -33,7 +34,7 @@ class SubscriptionReminderService:
                 settings_service = SettingsService(session)
                 
                 # Check if reminders are enabled
-                reminders_enabled = await settings_service.get_setting('subscription_reminders_enabled', True)
+                reminders_enabled = await settings_service.get_setting('subscription_reminders_enabled')
                 if not reminders_enabled:
                     return
                 
@@ -83,14 +84,10 @@ class SubscriptionReminderService:
         """Send 24-hour reminder"""
         try:
             # Get reminder template
-            template = await settings_service.get_setting(
-                'subscription_reminder_24h_template',
-                "🔔 {name}, ваша подписка истекает через 24 часа!\n\nХотите продлить для продолжения безлимитного общения?"
-            )
+            template = await settings_service.get_setting('subscription_reminder_24h_template')
             
             # Format template
-            reminder_text = template.replace("{name}", user.name or "пользователь")
-            reminder_text = reminder_text.replace("{days}", str(subscription.ends_at - datetime.utcnow()).split(",")[0])
+            reminder_text = render_for_user(template, user, default_name="пользователь", ends_at=subscription.ends_at)
             
             # Send reminder with subscription button
             from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
@@ -132,15 +129,10 @@ class SubscriptionReminderService:
         """Send expiration day reminder"""
         try:
             # Get reminder template
-            template = await settings_service.get_setting(
-                'subscription_reminder_expiry_template',
-                "⚠️ {name}, ваша подписка истекает сегодня!\n\nПродлите сейчас, чтобы сохранить безлимитное общение."
-            )
+            template = await settings_service.get_setting('subscription_reminder_expiry_template')
             
             # Format template
-            reminder_text = template.replace("{name}", user.name or "пользователь")
-            hours_left = int((subscription.ends_at - datetime.utcnow()).total_seconds() / 3600)
-            reminder_text = reminder_text.replace("{hours_left}", str(max(0, hours_left)))
+            reminder_text = render_for_user(template, user, default_name="пользователь", ends_at=subscription.ends_at)
             
             # Send urgent reminder with subscription button
             from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
@@ -181,8 +173,8 @@ class SubscriptionReminderService:
         """Check if current time is within user's allowed notification hours"""
         try:
             # Get default allowed hours
-            default_start = await settings_service.get_setting('allowed_ping_hours_start', 10)
-            default_end = await settings_service.get_setting('allowed_ping_hours_end', 22)
+            default_start = await settings_service.get_setting('allowed_ping_hours_start')
+            default_end = await settings_service.get_setting('allowed_ping_hours_end')
             
             # Use user's ping hours if available, otherwise defaults
             hours_start = getattr(user, 'ping_hours_start', default_start) or default_start
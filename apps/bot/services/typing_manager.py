@@ -0,0 +1,154 @@
+"""
+One "typing" indicator per chat, shared by everything that wants it shown
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Telegram shows "typing" for ~5 seconds or until the next message
+REFRESH_INTERVAL = 4.5
+PRUNE_THRESHOLD = 1024
+
+
+class _ChatTyping:
+    __slots__ = ("holders", "task", "last_sent")
+
+    def __init__(self):
+        self.holders = 0
+        self.task: Optional[asyncio.Task] = None
+        self.last_sent = 0.0
+
+
+class TypingLease:
+    """Keeps the indicator on until released; releasing twice is a no-op"""
+
+    __slots__ = ("manager", "chat_id", "released")
+
+    def __init__(self, manager: "TypingManager", chat_id: int):
+        self.manager = manager
+        self.chat_id = chat_id
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.manager._release(self.chat_id)
+
+
+class TypingManager:
+    """
+    Consumers take a lease (long waits such as GPT calls) or send a pulse
+    (right before a message). One refresh loop per chat runs while any lease
+    is held, and nothing is sent while the last indicator is still visible.
+
+    Counters are process-local: `requested` is what independent loops and
+    calls would have sent - pulse/acquire calls are counted as made, refreshes
+    are estimated from the holder count - and `sent` is what reached Telegram,
+    so `saved` in the snapshot is an estimate.
+    """
+
+    def __init__(self):
+        self._chats: Dict[int, _ChatTyping] = {}
+        self.requested = 0
+        self.sent = 0
+        self.failed = 0
+
+    def _state(self, chat_id: int) -> _ChatTyping:
+        state = self._chats.get(chat_id)
+        if state is None:
+            if len(self._chats) >= PRUNE_THRESHOLD:
+                self._prune()
+            state = self._chats[chat_id] = _ChatTyping()
+        return state
+
+    def _prune(self):
+        expired = time.monotonic() - REFRESH_INTERVAL
+        for chat_id in [
+            chat_id for chat_id, state in self._chats.items()
+            if not state.holders and state.last_sent < expired
+        ]:
+            del self._chats[chat_id]
+
+    async def _send(self, bot, chat_id: int, state: _ChatTyping):
+        state.last_sent = time.monotonic()
+        self.sent += 1
+        try:
+            await bot.send_chat_action(chat_id, "typing")
+        except Exception as e:
+            self.failed += 1
+            logger.debug(f"Typing action for chat {chat_id} failed: {e}")
+
+    async def _refresh(self, bot, chat_id: int, state: _ChatTyping):
+        first = True
+        while True:
+            wait = state.last_sent + REFRESH_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if not first:
+                # Every holder's own loop would have refreshed here
+                self.requested += state.holders
+            first = False
+            await self._send(bot, chat_id, state)
+
+    def acquire(self, bot, chat_id: int) -> TypingLease:
+        """Show typing until the returned lease is released"""
+        state = self._state(chat_id)
+        state.holders += 1
+        self.requested += 1
+        if state.task is None:
+            state.task = asyncio.create_task(self._refresh(bot, chat_id, state))
+        return TypingLease(self, chat_id)
+
+    def _release(self, chat_id: int):
+        state = self._chats.get(chat_id)
+        if state is None:
+            return
+        state.holders -= 1
+        if state.holders <= 0:
+            state.holders = 0
+            if state.task:
+                state.task.cancel()
+                state.task = None
+
+    @asynccontextmanager
+    async def lease(self, bot, chat_id: Optional[int]):
+        """Context manager form of acquire; does nothing without a chat"""
+        if not bot or not chat_id:
+            yield
+            return
+        typing = self.acquire(bot, chat_id)
+        try:
+            yield
+        finally:
+            typing.release()
+
+    async def pulse(self, bot, chat_id: int):
+        """Show typing once, unless it is already visible"""
+        self.requested += 1
+        state = self._state(chat_id)
+        if time.monotonic() - state.last_sent < REFRESH_INTERVAL:
+            return
+        await self._send(bot, chat_id, state)
+
+    def message_sent(self, chat_id: int):
+        """A message hides the indicator, so the next pulse must send again"""
+        state = self._chats.get(chat_id)
+        if state is not None:
+            state.last_sent = 0.0
+
+    def snapshot(self) -> Dict:
+        return {
+            "requested": self.requested,
+            "sent": self.sent,
+            "saved": self.requested - self.sent,
+            "failed": self.failed,
+            "active_chats": sum(1 for state in self._chats.values() if state.holders),
+        }
+
+
+# Global instance
+typing_manager = TypingManager()
@@ -7,6 +7,7 @@ sys.path.append('../../../')
 from shared.models.user import User
 from shared.models.subscription import Subscription
 from shared.models.analytics import Event
+from .entitlement_service import entitlement_service
 
 
 class UserService:
@@ -41,6 +42,7 @@ class UserService:
             self.session.add(subscription)
             
             await self.session.commit()
+            await entitlement_service.invalidate(user.id)
             await self.session.refresh(user)
         
         return user
@@ -0,0 +1,99 @@
+"""
+Redis FSM storage shared by all bot processes
+"""
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, Mapping, Optional
+import msgpack
+import redis.asyncio as redis
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+from aiogram.fsm.storage.memory import MemoryStorage
+
+logger = logging.getLogger(__name__)
+
+
+def _pack_default(value: Any):
+    """Make the few non-msgpack types handlers put into state data serializable"""
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__} in FSM data")
+
+
+class RedisFSMStorage(BaseStorage):
+    """
+    State and data of one chat live in a single hash (fields "s" and "d"),
+    data encoded with msgpack. Every write refreshes the TTL, so abandoned
+    surveys expire on their own.
+    """
+
+    KEY_PREFIX = "fsm"
+    STATE_FIELD = "s"
+    DATA_FIELD = "d"
+
+    def __init__(self, redis_url: str, ttl: int):
+        # Binary client: msgpack payloads are not valid UTF-8
+        self.redis = redis.from_url(redis_url, decode_responses=False)
+        self.ttl = ttl
+
+    def _key(self, key: StorageKey) -> str:
+        parts = [self.KEY_PREFIX, str(key.bot_id), str(key.chat_id), str(key.user_id)]
+        thread_id = getattr(key, "thread_id", None)
+        if thread_id:
+            parts.append(str(thread_id))
+        business_connection_id = getattr(key, "business_connection_id", None)
+        if business_connection_id:
+            # Marked so an opaque connection id can never read as a thread id
+            parts.append(f"b{business_connection_id}")
+        destiny = getattr(key, "destiny", "default")
+        if destiny != "default":
+            parts.append(destiny)
+        return ":".join(parts)
+
+    async def _write(self, key: StorageKey, field: str, value: Optional[bytes]):
+        """Set or clear one field and refresh the TTL in one round-trip"""
+        redis_key = self._key(key)
+        pipe = self.redis.pipeline(transaction=True)
+        if value is None:
+            pipe.hdel(redis_key, field)
+        else:
+            pipe.hset(redis_key, field, value)
+        pipe.expire(redis_key, self.ttl)
+        await pipe.execute()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        if isinstance(state, State):
+            state = state.state
+        await self._write(key, self.STATE_FIELD, state.encode() if state else None)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        value = await self.redis.hget(self._key(key), self.STATE_FIELD)
+        return value.decode() if value is not None else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        packed = msgpack.packb(dict(data), default=_pack_default, use_bin_type=True) if data else None
+        await self._write(key, self.DATA_FIELD, packed)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = await self.redis.hget(self._key(key), self.DATA_FIELD)
+        return msgpack.unpackb(value, raw=False) if value is not None else {}
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+async def create_fsm_storage(redis_url: str, ttl: int) -> BaseStorage:
+    """RedisFSMStorage, or MemoryStorage with a warning when Redis is unreachable at startup"""
+    storage = RedisFSMStorage(redis_url, ttl)
+    try:
+        await storage.redis.ping()
+    except Exception as e:
+        await storage.close()
+        logger.warning(
+            f"Redis is unreachable ({e}): FSM state falls back to process memory, "
+            f"is lost on restart and is not shared between bot processes"
+        )
+        return MemoryStorage()
+    return storage
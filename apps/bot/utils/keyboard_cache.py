@@ -0,0 +1,115 @@
+"""
+Кэш клавиатур онбординга и меню
+"""
+from typing import Dict, List, Sequence, Tuple
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, KeyboardButton, ReplyKeyboardMarkup
+import sys
+sys.path.append('../../../')
+
+from services.settings_cache import settings_cache
+
+TIMEZONE_LABELS = (
+    "🇰🇿 МСК-1 (UTC+2)", "🇷🇺 МСК (UTC+3)", "🇷🇺 МСК+1 (UTC+4)",
+    "🇰🇿 МСК+2 (UTC+5)", "🇰🇿 МСК+3 (UTC+6)", "🇷🇺 МСК+4 (UTC+7)",
+    "🇷🇺 МСК+5 (UTC+8)", "🇷🇺 МСК+6 (UTC+9)", "🇷🇺 МСК+7 (UTC+10)",
+    "🇷🇺 МСК+8 (UTC+11)", "🇷🇺 МСК+9 (UTC+12)"
+)
+
+# prefix: (ключ настройки со списком или сам список, колонок, текст кнопки "Готово")
+SELECTIONS = {
+    "emotion": ("emotion_tags", 2, "✅ Продолжить"),
+    "topic": ("topic_tags", 2, "🎉 Завершить анкету"),
+    "timezone": (TIMEZONE_LABELS, 1, "✅ Выбрать"),
+}
+
+
+def selection_mask(value) -> int:
+    """Маска выбора из данных FSM; старые анкеты хранили список индексов-строк"""
+    if isinstance(value, int):
+        return value
+    mask = 0
+    for index in value or []:
+        mask |= 1 << int(index)
+    return mask
+
+
+def selected_items(items: Sequence[str], mask: int) -> List[str]:
+    """Подписи выбранных вариантов в порядке списка"""
+    return [item for index, item in enumerate(items) if mask >> index & 1]
+
+
+class _Selection:
+    """Кнопки списка, собранные один раз: для каждого пункта пара (не выбран, выбран)"""
+
+    __slots__ = ("items", "max_cols", "buttons", "done_row")
+
+    def __init__(self, prefix: str, items: Sequence[str], max_cols: int, done_text: str):
+        self.items = tuple(items)
+        self.max_cols = max_cols
+        self.buttons = [
+            (
+                InlineKeyboardButton(text=f"⬜ {item}", callback_data=f"{prefix}_{index}"),
+                InlineKeyboardButton(text=f"✅ {item}", callback_data=f"{prefix}_{index}")
+            )
+            for index, item in enumerate(self.items)
+        ]
+        self.done_row = [InlineKeyboardButton(text=done_text, callback_data=f"{prefix}_done")]
+
+    def keyboard(self, mask: int) -> InlineKeyboardMarkup:
+        # Нажатие меняет один бит: достаточно выбрать готовую кнопку по биту
+        buttons = [pair[mask >> index & 1] for index, pair in enumerate(self.buttons)]
+        rows = [buttons[i:i + self.max_cols] for i in range(0, len(buttons), self.max_cols)]
+        rows.append(self.done_row)
+        return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+class KeyboardCache:
+    """
+    Клавиатуры строятся один раз на версию настроек: новый снимок
+    settings_cache.config сбрасывает кэш. Обработчики не ходят в БД.
+    """
+
+    def __init__(self):
+        self._config = None
+        self._selections: Dict[str, _Selection] = {}
+        self._main_menu = ReplyKeyboardMarkup(
+            keyboard=[
+                [
+                    KeyboardButton(text="🙋 Мой профиль"),
+                    KeyboardButton(text="💳 Подписка"),
+                    KeyboardButton(text="ℹ️ Помощь")
+                ],
+                [
+                    KeyboardButton(text="💭 Продолжить"),
+                    KeyboardButton(text="🔄 Новая тема")
+                ]
+            ],
+            resize_keyboard=True,
+            persistent=True
+        )
+
+    def main_menu(self) -> ReplyKeyboardMarkup:
+        return self._main_menu
+
+    def _selection(self, prefix: str) -> _Selection:
+        cfg = settings_cache.config
+        if cfg is not self._config:
+            self._config = cfg
+            self._selections = {}
+
+        selection = self._selections.get(prefix)
+        if selection is None:
+            source, max_cols, done_text = SELECTIONS[prefix]
+            items = getattr(cfg, source) if isinstance(source, str) else source
+            selection = self._selections[prefix] = _Selection(prefix, items, max_cols, done_text)
+        return selection
+
+    def items(self, prefix: str) -> Tuple[str, ...]:
+        return self._selection(prefix).items
+
+    def selection_keyboard(self, prefix: str, mask: int = 0) -> InlineKeyboardMarkup:
+        return self._selection(prefix).keyboard(mask)
+
+
+# Global instance
+keyboard_cache = KeyboardCache()
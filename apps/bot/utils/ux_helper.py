@@ -158,45 +158,30 @@ class OnboardingUX:
         user_profile: dict = None
     ):
         """Анимированное приветствие с генерируемым GPT текстом"""
-        from services.greeting_service import GreetingService
-        from services.settings_service import SettingsService
-        from shared.config.database import async_session
+        from services.greeting_pool import greeting_pool
+        from services.settings_cache import settings_cache
         
         # Check if dynamic greetings are enabled
-        async with async_session() as session:
-            settings_service = SettingsService(session)
-            greeting_enabled = await settings_service.get_setting("greeting_enabled", True)
+        if settings_cache.config.greeting_enabled:
+            # Pre-generated greeting (templates when the pool is empty), no GPT wait
+            custom_greeting = await greeting_pool.get_greeting(
+                user_profile or {"name": user_name},
+                "first_time"
+            )
             
-            if greeting_enabled:
-                try:
-                    # Generate personalized greeting
-                    greeting_service = GreetingService()
-                    custom_greeting = await greeting_service.generate_greeting(
-                        user_profile or {"name": user_name},
-                        scenario="first_time"
-                    )
-                    
-                    # Use generated greeting as first step
-                    welcome_steps = [
-                        custom_greeting,
-                        f"🌟 Добро пожаловать в безопасное пространство",
-                        # f"🛡️ Всё конфиденциально и анонимно"  # ВРЕМЕННО ОТКЛЮЧЕНО
-                    ]
-                except Exception as e:
-                    print(f"Failed to generate greeting: {e}")
-                    # Fallback to static greeting
-                    welcome_steps = [
-                        f"👋 Привет, {user_name}!",
-                        f"🌟 Добро пожаловать в безопасное пространство",
-                        # f"🛡️ Всё конфиденциально и анонимно"  # ВРЕМЕННО ОТКЛЮЧЕНО
-                    ]
-            else:
-                # Static greeting when disabled
-                welcome_steps = [
-                    f"👋 Привет, {user_name}!",
-                    f"🌟 Добро пожаловать в безопасное пространство",
-                    # f"🛡️ Всё конфиденциально и анонимно"  # ВРЕМЕННО ОТКЛЮЧЕНО
-                ]
+            # Use generated greeting as first step
+            welcome_steps = [
+                custom_greeting,
+                f"🌟 Добро пожаловать в безопасное пространство",
+                # f"🛡️ Всё конфиденциально и анонимно"  # ВРЕМЕННО ОТКЛЮЧЕНО
+            ]
+        else:
+            # Static greeting when disabled
+            welcome_steps = [
+                f"👋 Привет, {user_name}!",
+                f"🌟 Добро пожаловать в безопасное пространство",
+                # f"🛡️ Всё конфиденциально и анонимно"  # ВРЕМЕННО ОТКЛЮЧЕНО
+            ]
         
         final_text = f"""🌸 <b>Добро пожаловать, {user_name}!</b>
 
@@ -271,40 +256,6 @@ class OnboardingUX:
             text += f"\n\n<i>{description}</i>"
             
         return text
-    
-    @staticmethod
-    def create_selection_keyboard(
-        items: List[str], 
-        callback_prefix: str,
-        selected_indices: set = None,
-        max_cols: int = 2,
-        done_text: str = "✅ Готово"
-    ) -> InlineKeyboardMarkup:
-        """Создать клавиатуру для выбора из списка с отметками"""
-        if selected_indices is None:
-            selected_indices = set()
-            
-        keyboard = []
-        
-        # Добавляем элементы
-        for i in range(0, len(items), max_cols):
-            row = []
-            for j in range(max_cols):
-                if i + j < len(items):
-                    item = items[i + j]
-                    index = i + j
-                    # Добавляем галочку слева если выбран
-                    display_text = f"✅ {item}" if str(index) in selected_indices else f"⬜ {item}"
-                    row.append(InlineKeyboardButton(
-                        text=display_text, 
-                        callback_data=f"{callback_prefix}_{index}"
-                    ))
-            keyboard.append(row)
-        
-        # Кнопка "Готово"
-        keyboard.append([InlineKeyboardButton(text=done_text, callback_data=f"{callback_prefix}_done")])
-        
-        return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
 class AnimatedMessages:
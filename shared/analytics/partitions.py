@@ -0,0 +1,229 @@
+"""
+Monthly range partitions of analytics_events: creation ahead of time,
+retention and cold-storage archival.
+
+Partitions are named analytics_events_yYYYYmMM and cover
+[first day of the month, first day of the next month). Expired
+partitions are detached, copied to gzip-compressed CSV and dropped; a
+partition whose archive is missing or empty, or whose archive directory is
+not declared persistent (ANALYTICS_ARCHIVE_PERSISTENT), stays detached
+instead. Every bot process schedules the maintenance, and a session-level
+advisory lock lets only one of them run it at a time.
+"""
+import asyncio
+import gzip
+import logging
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.analytics.rollups import PARTITION_LOCK_KEY, get_watermark
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "analytics_events"
+PARTITION_PATTERN = re.compile(r"^analytics_events_y(\d{4})m(\d{2})$")
+
+# Keep inserts working even if the maintenance job misses a few runs
+MONTHS_AHEAD = 2
+
+# COPY output handed to the compressing thread at a time
+ARCHIVE_WRITE_BYTES = 4 * 1024 * 1024
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    index = moment.year * 12 + moment.month - 1 + months
+    return moment.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def create_partition_sql(month: datetime) -> str:
+    """DDL for the partition holding `month` (shared with the migration)"""
+    lower = month_start(month)
+    upper = add_months(lower, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(lower)} "
+        f"PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{lower.isoformat(' ')}') TO ('{upper.isoformat(' ')}')"
+    )
+
+
+async def ensure_partitions(db: AsyncSession, months_ahead: int = MONTHS_AHEAD) -> None:
+    """Create partitions for the current month and the next `months_ahead`"""
+    current = month_start(datetime.utcnow())
+    for offset in range(months_ahead + 1):
+        await db.execute(text(create_partition_sql(add_months(current, offset))))
+    await db.commit()
+
+
+async def list_partitions(db: AsyncSession) -> List[Tuple[str, datetime, bool]]:
+    """
+    Returns:
+        [(table name, month start, attached to the parent), ...] ordered by month
+    """
+    result = await db.execute(
+        text("""
+            SELECT c.relname, i.inhrelid IS NOT NULL
+            FROM pg_class c
+            LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+            WHERE c.relkind = 'r'
+              AND pg_table_is_visible(c.oid)
+              AND c.relname LIKE :prefix
+        """),
+        {'prefix': f"{PARENT_TABLE}_y%"}
+    )
+
+    partitions = []
+    for name, attached in result:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            month = datetime(int(match.group(1)), int(match.group(2)), 1)
+            partitions.append((name, month, attached))
+
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+async def archive_expired_partitions(
+    db: AsyncSession,
+    retention_days: int,
+    archive_dir: str,
+    archive_persistent: bool
+) -> List[str]:
+    """
+    Detach, export and drop monthly partitions whose rows are all older than
+    `retention_days` (the analytics_retention_days setting).
+    A partition is only archived once the rollups have folded it, so the
+    dashboards keep their history, and only dropped when `archive_persistent`
+    says the archive directory outlives the process.
+
+    Returns:
+        Paths of the written archives
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    watermark: Optional[datetime] = await get_watermark(db)
+
+    archives = []
+    for name, month, attached in await list_partitions(db):
+        upper = add_months(month, 1)
+        if upper > cutoff or watermark is None or upper > watermark:
+            continue
+
+        path = _archive_path(archive_dir, name)
+        if attached:
+            # Detach first so queries stop touching it while it is exported
+            await db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            await db.commit()
+            await _export_table(db, name, path)
+        elif not os.path.exists(path):
+            await _export_table(db, name, path)
+        # else exported by an earlier run: detached partitions do not change
+
+        if not archive_persistent:
+            logger.warning(
+                f"ANALYTICS_ARCHIVE_PERSISTENT is not set; keeping {name} detached "
+                f"next to its archive {path} instead of dropping it"
+            )
+            continue
+        if not _archive_is_complete(path):
+            logger.warning(f"Archive {path} is missing or empty; keeping {name} detached instead of dropping it")
+            continue
+
+        await db.execute(text(f"DROP TABLE {name}"))
+        await db.commit()
+
+        logger.info(f"Archived analytics partition {name} to {path}")
+        archives.append(path)
+
+    return archives
+
+
+def _archive_is_complete(path: str) -> bool:
+    try:
+        return os.path.getsize(path) > 0
+    except OSError:
+        return False
+
+
+def _archive_path(archive_dir: str, name: str) -> str:
+    return os.path.join(archive_dir, f"{name}.csv.gz")
+
+
+async def _export_table(db: AsyncSession, name: str, path: str) -> None:
+    """
+    COPY a table into a gzip-compressed CSV at `path`. Compression runs in a
+    worker thread so a month of events does not stall the bot's event loop.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # A file of this run's own, never one another writer may still hold
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{name}.", suffix=".tmp")
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+
+    try:
+        with os.fdopen(fd, 'wb') as file, gzip.GzipFile(fileobj=file, mode='wb') as archive:
+            pending = bytearray()
+
+            async def write(chunk: bytes):
+                pending.extend(chunk)
+                if len(pending) >= ARCHIVE_WRITE_BYTES:
+                    data = bytes(pending)
+                    pending.clear()
+                    await asyncio.to_thread(archive.write, data)
+
+            await raw_connection.driver_connection.copy_from_table(
+                name, output=write, format='csv', header=True
+            )
+            if pending:
+                await asyncio.to_thread(archive.write, bytes(pending))
+
+        # mkstemp creates it owner-only; archives are read by other tools
+        os.chmod(tmp_path, 0o644)
+        # Only a complete archive gets the final name
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    await db.commit()
+
+
+async def run_maintenance(
+    db: AsyncSession,
+    retention_days: int,
+    archive_dir: str,
+    archive_persistent: bool
+) -> List[str]:
+    """
+    Create upcoming partitions and archive expired ones, unless another
+    process is already doing so (then nothing is done and [] is returned).
+
+    The lock is session-level on a connection of its own: `db` commits
+    between steps, which would release a transaction-level lock.
+    """
+    async with db.bind.connect() as lock_connection:
+        lock_connection = await lock_connection.execution_options(isolation_level="AUTOCOMMIT")
+        acquired = await lock_connection.scalar(
+            text("SELECT pg_try_advisory_lock(:key)"), {'key': PARTITION_LOCK_KEY}
+        )
+        if not acquired:
+            logger.info("Analytics partition maintenance is running in another process; skipping")
+            return []
+
+        try:
+            await ensure_partitions(db)
+            return await archive_expired_partitions(db, retention_days, archive_dir, archive_persistent)
+        finally:
+            await lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': PARTITION_LOCK_KEY})
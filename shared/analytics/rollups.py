@@ -0,0 +1,461 @@
+"""
+Incremental hourly/daily analytics rollups.
+
+Everything created before the watermark is folded into `analytics_rollups`
+(event counts per type, new users, active users per day) and
+`analytics_daily_active_users` (exact per-day user sets). Readers combine
+complete rollup buckets with a raw scan of the small edges that are not
+covered (the part of the window before the first full hour and everything
+after the watermark), so the results are identical to counting the raw
+tables.
+
+Folding and subtracting deleted users both hold ROLLUP_LOCK_KEY for their
+transaction, so several bot processes can run the refresh and a deletion
+never races a fold.
+
+Tag popularity (emotions, topics) describes current profiles rather than
+a time series and is kept as 'snapshot' rows replaced on every refresh.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, insert, delete, desc, func, and_, literal, text, true, union, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.models.analytics import Event, AnalyticsRollup, DailyActiveUser, RollupWatermark
+from shared.models.user import User
+
+WATERMARK_NAME = "analytics"
+
+# Leave recently inserted rows alone so slow transactions can still commit
+REFRESH_LAG = timedelta(minutes=5)
+
+# Keep each refresh transaction short when backfilling history
+REFRESH_CHUNK = timedelta(days=1)
+
+# pg_advisory_xact_lock key serializing folds and subtractions
+ROLLUP_LOCK_KEY = 7_340_001
+
+# pg_try_advisory_lock key letting one process at a time maintain the
+# analytics_events partitions (see shared/analytics/partitions.py)
+PARTITION_LOCK_KEY = 7_340_002
+
+# Tag popularity is a snapshot of current profiles, not a time series
+TAG_METRICS = {
+    'emotion_tags': User.emotion_names,
+    'topic_tags': User.topic_names,
+}
+
+FOLD_STATEMENTS = [
+    # Event counts per type
+    """
+    INSERT INTO analytics_rollups (granularity, bucket_start, metric, dimension, value)
+    SELECT CAST(:granularity AS text), date_trunc(CAST(:granularity AS text), created_at), 'events', event_type, count(*)
+    FROM analytics_events
+    WHERE created_at >= :lo AND created_at < :hi
+    GROUP BY 2, 4
+    ON CONFLICT (granularity, bucket_start, metric, dimension)
+    DO UPDATE SET value = analytics_rollups.value + EXCLUDED.value, updated_at = now()
+    """,
+    # New users
+    """
+    INSERT INTO analytics_rollups (granularity, bucket_start, metric, dimension, value)
+    SELECT CAST(:granularity AS text), date_trunc(CAST(:granularity AS text), created_at), 'new_users', '', count(*)
+    FROM users
+    WHERE created_at >= :lo AND created_at < :hi
+    GROUP BY 2
+    ON CONFLICT (granularity, bucket_start, metric, dimension)
+    DO UPDATE SET value = analytics_rollups.value + EXCLUDED.value, updated_at = now()
+    """,
+]
+
+FOLD_ACTIVE_USERS = """
+    INSERT INTO analytics_daily_active_users (day, user_id)
+    SELECT DISTINCT date_trunc('day', created_at), user_id
+    FROM analytics_events
+    WHERE created_at >= :lo AND created_at < :hi
+    ON CONFLICT (day, user_id) DO NOTHING
+"""
+
+# Recounted from the day sets for every day the folded chunk touched
+FOLD_ACTIVE_USER_COUNTS = """
+    INSERT INTO analytics_rollups (granularity, bucket_start, metric, dimension, value)
+    SELECT 'day', day, 'active_users', '', count(*)
+    FROM analytics_daily_active_users
+    WHERE day >= date_trunc('day', CAST(:lo AS timestamp)) AND day < :hi
+    GROUP BY day
+    ON CONFLICT (granularity, bucket_start, metric, dimension)
+    DO UPDATE SET value = EXCLUDED.value, updated_at = now()
+"""
+
+
+def _floor(moment: datetime, granularity: str) -> datetime:
+    if granularity == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil(moment: datetime, granularity: str) -> datetime:
+    floored = _floor(moment, granularity)
+    if floored == moment:
+        return moment
+    return floored + (timedelta(days=1) if granularity == 'day' else timedelta(hours=1))
+
+
+async def get_watermark(db: AsyncSession) -> Optional[datetime]:
+    result = await db.execute(
+        select(RollupWatermark.watermark).where(RollupWatermark.name == WATERMARK_NAME)
+    )
+    return result.scalar_one_or_none()
+
+
+async def _set_watermark(db: AsyncSession, watermark: datetime):
+    await db.execute(
+        text("""
+            INSERT INTO analytics_rollup_watermarks (name, watermark)
+            VALUES (:name, :watermark)
+            ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark, updated_at = now()
+        """),
+        {'name': WATERMARK_NAME, 'watermark': watermark}
+    )
+
+
+async def _lock(db: AsyncSession):
+    await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': ROLLUP_LOCK_KEY})
+
+
+async def _initial_watermark(db: AsyncSession, target: datetime) -> datetime:
+    """First run: start from the oldest row we have"""
+    result = await db.execute(
+        select(func.least(
+            select(func.min(Event.created_at)).scalar_subquery(),
+            select(func.min(User.created_at)).scalar_subquery()
+        ))
+    )
+    earliest = result.scalar()
+    return _floor(earliest, 'hour') if earliest else target
+
+
+async def refresh_rollups(db: AsyncSession) -> Optional[datetime]:
+    """
+    Fold rows created since the watermark into the rollups, one chunk per
+    transaction. Every chunk takes the rollup lock and re-reads the
+    watermark, so concurrent refreshes never fold the same window twice.
+
+    Returns:
+        The new watermark
+    """
+    target = _floor(datetime.utcnow() - REFRESH_LAG, 'hour')
+
+    while True:
+        await _lock(db)
+        stored = await get_watermark(db)
+        watermark = stored if stored is not None else await _initial_watermark(db, target)
+
+        if watermark >= target:
+            if stored is None:
+                await _set_watermark(db, watermark)
+            await db.commit()
+            return watermark
+
+        hi = min(watermark + REFRESH_CHUNK, target)
+        params = {'lo': watermark, 'hi': hi}
+
+        for granularity in ('hour', 'day'):
+            for statement in FOLD_STATEMENTS:
+                await db.execute(text(statement), {**params, 'granularity': granularity})
+        await db.execute(text(FOLD_ACTIVE_USERS), params)
+        await db.execute(text(FOLD_ACTIVE_USER_COUNTS), params)
+
+        # Same transaction as the fold: the lock is released on commit
+        await _set_watermark(db, hi)
+        await db.commit()
+
+
+SUBTRACT_STATEMENTS = [
+    # Events of the deleted users already folded into the counts
+    """
+    UPDATE analytics_rollups r
+    SET value = r.value - d.n, updated_at = now()
+    FROM (
+        SELECT g.granularity, date_trunc(g.granularity, e.created_at) AS bucket_start,
+               e.event_type AS dimension, count(*) AS n
+        FROM analytics_events e CROSS JOIN (VALUES ('hour'), ('day')) AS g(granularity)
+        WHERE e.user_id = ANY(:user_ids) AND e.created_at < :watermark
+        GROUP BY 1, 2, 3
+    ) d
+    WHERE r.metric = 'events' AND r.granularity = d.granularity
+      AND r.bucket_start = d.bucket_start AND r.dimension = d.dimension
+    """,
+    # The deleted users themselves
+    """
+    UPDATE analytics_rollups r
+    SET value = r.value - d.n, updated_at = now()
+    FROM (
+        SELECT g.granularity, date_trunc(g.granularity, u.created_at) AS bucket_start, count(*) AS n
+        FROM users u CROSS JOIN (VALUES ('hour'), ('day')) AS g(granularity)
+        WHERE u.id = ANY(:user_ids) AND u.created_at < :watermark
+        GROUP BY 1, 2
+    ) d
+    WHERE r.metric = 'new_users' AND r.dimension = '' AND r.granularity = d.granularity
+      AND r.bucket_start = d.bucket_start
+    """,
+    # Their days in the active user counts (the day sets are pruned afterwards)
+    """
+    UPDATE analytics_rollups r
+    SET value = r.value - d.n, updated_at = now()
+    FROM (
+        SELECT day, count(*) AS n
+        FROM analytics_daily_active_users
+        WHERE user_id = ANY(:user_ids)
+        GROUP BY day
+    ) d
+    WHERE r.metric = 'active_users' AND r.dimension = '' AND r.granularity = 'day'
+      AND r.bucket_start = d.day
+    """,
+    # Buckets that only held their rows: readers must not report empty dimensions
+    """
+    DELETE FROM analytics_rollups
+    WHERE value <= 0 AND metric IN ('events', 'new_users', 'active_users')
+    """,
+]
+
+
+async def subtract_users(db: AsyncSession, user_ids: List[int]):
+    """
+    Take already folded rows of users about to be deleted out of the rollups.
+    Runs in the caller's deleting transaction (before the rows are deleted)
+    and holds the rollup lock until it commits.
+    """
+    await _lock(db)
+    watermark = await get_watermark(db)
+    if watermark is None or not user_ids:
+        return
+
+    params = {'user_ids': list(user_ids), 'watermark': watermark}
+    for statement in SUBTRACT_STATEMENTS:
+        await db.execute(text(statement), params)
+    await db.execute(delete(DailyActiveUser).where(DailyActiveUser.user_id.in_(user_ids)))
+
+
+def _plan(since: Optional[datetime], watermark: Optional[datetime]) -> Tuple[List[tuple], List[tuple]]:
+    """
+    Split [since, now) into complete rollup buckets below the watermark
+    and raw ranges for the rest.
+
+    Returns:
+        ([(granularity, lo, hi), ...], [(lo, hi), ...]) - None means unbounded
+    """
+    if watermark is None or (since is not None and since >= watermark):
+        return [], [(since, None)]
+
+    raw = [(watermark, None)]
+    hour_start = None
+    if since is not None:
+        hour_start = _ceil(since, 'hour')
+        if hour_start >= watermark:
+            return [], [(since, None)]
+        if hour_start > since:
+            raw.append((since, hour_start))
+
+    days_end = _floor(watermark, 'day')
+    days_start = _ceil(hour_start, 'day') if hour_start is not None else None
+
+    rollups = []
+    if days_start is None or days_start < days_end:
+        rollups.append(('day', days_start, days_end))
+        if hour_start is not None and hour_start < days_start:
+            rollups.append(('hour', hour_start, days_start))
+        if days_end < watermark:
+            rollups.append(('hour', days_end, watermark))
+    else:
+        rollups.append(('hour', hour_start, watermark))
+
+    return rollups, raw
+
+
+def _in_range(column, lo: Optional[datetime], hi: Optional[datetime]) -> list:
+    conditions = []
+    if lo is not None:
+        conditions.append(column >= lo)
+    if hi is not None:
+        conditions.append(column < hi)
+    return conditions
+
+
+async def _count_metric(
+    db: AsyncSession,
+    metric: str,
+    raw_created_at,
+    raw_dimension,
+    since: Optional[datetime],
+    dimensions: Optional[Iterable[str]] = None
+) -> Dict[str, int]:
+    """Sum a rollup metric over [since, now), grouped by dimension, in one round-trip"""
+    rollups, raw = _plan(since, await get_watermark(db))
+    dimensions = list(dimensions) if dimensions is not None else None
+
+    parts = []
+    for granularity, lo, hi in rollups:
+        conditions = [
+            AnalyticsRollup.metric == metric,
+            AnalyticsRollup.granularity == granularity,
+            *_in_range(AnalyticsRollup.bucket_start, lo, hi)
+        ]
+        if dimensions is not None:
+            conditions.append(AnalyticsRollup.dimension.in_(dimensions))
+        parts.append(
+            select(AnalyticsRollup.dimension.label('dimension'), AnalyticsRollup.value.label('value'))
+            .where(and_(*conditions))
+        )
+
+    for lo, hi in raw:
+        conditions = _in_range(raw_created_at, lo, hi)
+        if dimensions is not None:
+            conditions.append(raw_dimension.in_(dimensions))
+        parts.append(
+            select(raw_dimension.label('dimension'), literal(1).label('value'))
+            .where(and_(*conditions))
+        )
+
+    combined = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    result = await db.execute(
+        select(combined.c.dimension, func.sum(combined.c.value))
+        .group_by(combined.c.dimension)
+        .having(func.sum(combined.c.value) > 0)
+    )
+    return {dimension: int(total) for dimension, total in result}
+
+
+async def count_events(
+    db: AsyncSession,
+    since: Optional[datetime] = None,
+    event_types: Optional[Iterable[str]] = None
+) -> Dict[str, int]:
+    """Event counts per event_type created at or after `since` (all time if None)"""
+    return await _count_metric(db, 'events', Event.created_at, Event.event_type, since, event_types)
+
+
+async def count_new_users(db: AsyncSession, since: Optional[datetime] = None) -> int:
+    """Users created at or after `since`"""
+    counts = await _count_metric(db, 'new_users', User.created_at, literal(''), since)
+    return counts.get('', 0)
+
+
+async def count_active_users(db: AsyncSession, since: datetime) -> int:
+    """Distinct users with at least one event at or after `since`"""
+    watermark = await get_watermark(db)
+
+    if watermark is None or since >= watermark or _floor(since, 'day') != since:
+        result = await db.execute(
+            select(func.count(func.distinct(Event.user_id))).where(Event.created_at >= since)
+        )
+        return result.scalar() or 0
+
+    # Day sets hold users seen before the watermark; the raw tail adds the rest
+    users = union(
+        select(DailyActiveUser.user_id.label('user_id'))
+        .where(and_(DailyActiveUser.day >= since, DailyActiveUser.day < watermark)),
+        select(Event.user_id.label('user_id'))
+        .where(Event.created_at >= watermark)
+    ).subquery()
+
+    result = await db.execute(select(func.count()).select_from(users))
+    return result.scalar() or 0
+
+
+async def rolled_up_until(db: AsyncSession, since: datetime, until: datetime) -> datetime:
+    """
+    End of the whole days in [since, until) covered by the daily rollups
+    (since is a day start). Per-day readers take buckets before it and
+    the raw tables from it on.
+    """
+    watermark = await get_watermark(db)
+    if watermark is None:
+        return since
+    return min(max(_floor(watermark, 'day'), since), until)
+
+
+def daily_counts(
+    metric: str,
+    dimension: str,
+    raw_created_at,
+    raw_count,
+    since: datetime,
+    until: datetime,
+    split: datetime,
+    *raw_conditions
+):
+    """(day, value) rows for [since, until): daily buckets before `split`, a raw GROUP BY after it"""
+    rolled = (
+        select(AnalyticsRollup.bucket_start.label('day'), AnalyticsRollup.value.label('value'))
+        .where(and_(
+            AnalyticsRollup.granularity == 'day',
+            AnalyticsRollup.metric == metric,
+            AnalyticsRollup.dimension == dimension,
+            AnalyticsRollup.bucket_start >= since,
+            AnalyticsRollup.bucket_start < split
+        ))
+    )
+    day = func.date_trunc('day', raw_created_at)
+    raw = (
+        select(day.label('day'), raw_count.label('value'))
+        .where(and_(raw_created_at >= split, raw_created_at < until, *raw_conditions))
+        .group_by(day)
+    )
+    return union_all(rolled, raw).subquery()
+
+
+def _tag_counts(metric: str):
+    """SELECT tag, count(*) over the normalized tag names of all users"""
+    tag = func.jsonb_array_elements_text(TAG_METRICS[metric]).table_valued('value').lateral()
+    return (
+        select(tag.c.value.label('tag'), func.count().label('count'))
+        .select_from(User)
+        .join(tag, true())
+        .group_by(tag.c.value)
+    )
+
+
+async def refresh_tag_counts(db: AsyncSession):
+    """Replace the tag popularity snapshots in one transaction"""
+    now = datetime.utcnow()
+
+    for metric in TAG_METRICS:
+        counts = _tag_counts(metric).subquery()
+        await db.execute(
+            delete(AnalyticsRollup)
+            .where(and_(AnalyticsRollup.granularity == 'snapshot', AnalyticsRollup.metric == metric))
+        )
+        await db.execute(
+            insert(AnalyticsRollup).from_select(
+                ['granularity', 'bucket_start', 'metric', 'dimension', 'value'],
+                select(literal('snapshot'), literal(now), literal(metric), counts.c.tag, counts.c.count)
+            )
+        )
+
+    await db.commit()
+
+
+async def top_tags(db: AsyncSession, metric: str, limit: int = 10) -> List[Tuple[str, int]]:
+    """
+    Most common tags from the latest snapshot; aggregated live if the
+    rollup job has not produced one yet
+    """
+    result = await db.execute(
+        select(AnalyticsRollup.dimension, AnalyticsRollup.value)
+        .where(and_(AnalyticsRollup.granularity == 'snapshot', AnalyticsRollup.metric == metric))
+        .order_by(desc(AnalyticsRollup.value), AnalyticsRollup.dimension)
+        .limit(limit)
+    )
+    rows = result.all()
+
+    if not rows:
+        counts = _tag_counts(metric).subquery()
+        result = await db.execute(
+            select(counts.c.tag, counts.c.count)
+            .order_by(desc(counts.c.count), counts.c.tag)
+            .limit(limit)
+        )
+        rows = result.all()
+
+    return [(tag, int(count)) for tag, count in rows]
@@ -1,16 +1,98 @@
+import asyncio
+import logging
+import time
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from ..models.base import Base
 from .settings import settings
+from .db_pool import engine_options
 
-engine = create_async_engine(settings.database_url)
+logger = logging.getLogger(__name__)
+
+engine = create_async_engine(settings.database_url, **engine_options())
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Optional read replica for heavy admin/analytics reads. It may also be the
+# primary itself reached through a read-only role. Its pool shares the
+# process's connection budget with the primary engine.
+replica_engine = (
+    create_async_engine(settings.database_replica_url, **engine_options(replica=True)).execution_options(postgresql_readonly=True)
+    if settings.database_replica_url else None
+)
+replica_session = (
+    async_sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+    if replica_engine is not None else None
+)
+
+REPLICA_CHECK_INTERVAL = 5  # seconds
+
+# Seconds the replica is behind; 0 when caught up or when it is not a standby
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_replica_state = {"checked_at": 0.0, "usable": False}
+_replica_probe_lock = asyncio.Lock()
+
+
+async def _replica_usable() -> bool:
+    """
+    Replica reachable and within replica_max_lag_seconds (checked at most every
+    few seconds). Only one caller probes; concurrent callers use the last result
+    instead of queueing behind the probe.
+    """
+    now = time.monotonic()
+    if now - _replica_state["checked_at"] < REPLICA_CHECK_INTERVAL or _replica_probe_lock.locked():
+        return _replica_state["usable"]
+
+    async with _replica_probe_lock:
+        try:
+            async with replica_engine.connect() as conn:
+                lag = float((await conn.execute(text(REPLICA_LAG_QUERY))).scalar() or 0)
+            usable = lag <= settings.replica_max_lag_seconds
+            if not usable:
+                logger.warning(f"Read replica is {lag:.1f}s behind, reading from primary")
+        except Exception as e:
+            logger.warning(f"Read replica unavailable, reading from primary: {e}")
+            usable = False
+
+        _replica_state.update(checked_at=time.monotonic(), usable=usable)
+    return usable
+
+
+async def read_sessionmaker() -> async_sessionmaker:
+    """Session factory for read-only work: the replica when healthy, else the primary"""
+    if replica_session is not None and await _replica_usable():
+        return replica_session
+    return async_session
+
+
+def pool_metrics() -> dict:
+    """Pool usage of this process (primary, and replica if configured)"""
+    metrics = {"primary": engine.pool.metrics.snapshot(engine.pool)}
+    if replica_engine is not None:
+        metrics["replica"] = replica_engine.pool.metrics.snapshot(replica_engine.pool)
+    return metrics
+
 
 async def get_db():
     async with async_session() as session:
         yield session
 
 
+async def get_read_db():
+    """Dependency for read-only endpoints (analytics, listings, exports)"""
+    session_factory = await read_sessionmaker()
+    async with session_factory() as session:
+        yield session
+
+
 async def init_db():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        # Trigram indexes on users need this before create_all
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.run_sync(Base.metadata.create_all)
@@ -0,0 +1,137 @@
+"""
+Per-role connection pool configuration and pool metrics.
+
+Each process declares its role with DB_ROLE (bot, admin, worker) and gets
+its own pool sizing from Settings. The pool records how long checkouts wait
+for a connection, so the sizing can be tuned from real numbers.
+
+Connection budget: a process opens at most db_pool_size_<role> +
+db_max_overflow_<role> connections, the read replica engine included (its
+pool is carved out of that budget, not added to it). Summed over the
+production processes - one bot and WORKERS=4 admin workers - the defaults
+come to 30 + 4 * 10 = 70, inside PostgreSQL's default max_connections of
+100 with room for worker jobs (5 each), migrations, backups and psql.
+"""
+import os
+import socket
+import time
+from typing import Dict, List
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from .settings import settings
+
+ROLES = ("bot", "admin", "worker")
+
+
+class PoolMetrics:
+    """Counters for one pool (process-local)"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def snapshot(self, pool: "InstrumentedQueuePool") -> Dict:
+        return {
+            "role": settings.db_role,
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that measures the time spent waiting for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        self.metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # Keep the counters when the pool is rebuilt (e.g. after a disconnect)
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def process_key() -> str:
+    """Role, host and pid: processes of one role publish their metrics side by side"""
+    return f"{settings.db_role}:{socket.gethostname()}:{os.getpid()}"
+
+
+def aggregate_snapshots(snapshots: List[Dict]) -> Dict:
+    """Sum the snapshots of one pool over all processes of a role"""
+    checkouts = sum(snapshot["checkouts"] for snapshot in snapshots)
+    wait_total = sum(snapshot["wait_seconds_avg"] * snapshot["checkouts"] for snapshot in snapshots)
+    return {
+        "processes": len(snapshots),
+        "pool_size": sum(snapshot["pool_size"] for snapshot in snapshots),
+        "checked_out": sum(snapshot["checked_out"] for snapshot in snapshots),
+        "overflow": sum(snapshot["overflow"] for snapshot in snapshots),
+        "checkouts": checkouts,
+        "timeouts": sum(snapshot["timeouts"] for snapshot in snapshots),
+        "wait_seconds_avg": round(wait_total / checkouts, 6) if checkouts else 0.0,
+        "wait_seconds_max": max(snapshot["wait_seconds_max"] for snapshot in snapshots),
+    }
+
+
+def engine_options(role: str = None, replica: bool = False) -> Dict:
+    """
+    create_async_engine() keyword arguments for a process role.
+
+    With a read replica configured, the role's pool size and overflow are
+    split between the primary and the replica engine (replica=True), so
+    the process as a whole stays within its budget.
+    """
+    role = role or settings.db_role
+    if role not in ROLES:
+        raise ValueError(f"Unknown DB_ROLE {role!r}, expected one of {ROLES}")
+
+    pool_size = getattr(settings, f"db_pool_size_{role}")
+    max_overflow = getattr(settings, f"db_max_overflow_{role}")
+    if settings.database_replica_url:
+        # pool_size=0 would mean "unbounded", so each engine keeps at least one
+        replica_size = max(1, min(settings.db_replica_pool_size, pool_size - 1))
+        replica_overflow = min(settings.db_replica_max_overflow, max_overflow)
+        if replica:
+            pool_size, max_overflow = replica_size, replica_overflow
+        else:
+            pool_size, max_overflow = max(1, pool_size - replica_size), max_overflow - replica_overflow
+
+    connect_args = {
+        # asyncpg prepared statements, cached per connection by SQLAlchemy
+        "prepared_statement_cache_size": settings.db_statement_cache_size,
+    }
+    if replica:
+        # An unreachable replica must fail fast: reads fall back to the primary
+        connect_args["timeout"] = settings.db_replica_connect_timeout
+
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "connect_args": connect_args,
+    }
@@ -1,10 +1,14 @@
 import redis.asyncio as redis
+from datetime import datetime, timedelta
 from typing import Optional
 import json
 from .settings import settings
 
 redis_client: Optional[redis.Redis] = None
 
+# Pub/sub channel for subscription entitlement changes
+ENTITLEMENT_CHANNEL = "entitlement_update"
+
 
 async def init_redis():
     """Initialize Redis connection"""
@@ -125,4 +129,71 @@ class RedisCache:
         
         if data:
             return json.loads(data)
-        return None
\ No newline at end of file
+        return None
+
+    async def get_entitlement(self, user_id: int) -> Optional[dict]:
+        """Get cached subscription entitlement"""
+        if not self.redis:
+            return None
+        
+        key = f"entitlement:{user_id}"
+        data = await self.redis.get(key)
+        
+        if data:
+            return json.loads(data)
+        return None
+    
+    async def set_entitlement(self, user_id: int, entitlement: dict, ttl: int = 3600):
+        """Cache subscription entitlement (ttl is capped by the caller at ends_at)"""
+        if not self.redis:
+            return
+        
+        key = f"entitlement:{user_id}"
+        await self.redis.setex(
+            key,
+            ttl,
+            json.dumps(entitlement, default=str)
+        )
+    
+    async def invalidate_entitlement(self, user_id: int):
+        """Drop cached entitlement and notify bot processes holding it in memory"""
+        if not self.redis:
+            return
+        
+        key = f"entitlement:{user_id}"
+        await self.redis.delete(key)
+        await self.redis.publish(ENTITLEMENT_CHANNEL, json.dumps({"user_id": user_id}))
+    
+    async def purge_user_keys(self, user_ids: list, telegram_ids: list = (), anchors: list = ()):
+        """
+        Delete every per-user key (conversation, session, anchors, quota,
+        entitlement, FSM state) in one pipeline. Keys are built from what the
+        caller knows - anchor ids as (user_id, anchor_id), Telegram ids for the
+        FSM - so no SCAN over the keyspace is needed.
+        """
+        if not self.redis or not user_ids:
+            return
+        
+        # Quota counters outlive midnight by a grace period: today and yesterday
+        today = datetime.utcnow()
+        days = [day.strftime('%Y%m%d') for day in (today, today - timedelta(days=1))]
+        
+        keys = []
+        for user_id in user_ids:
+            keys.extend([
+                f"conversation:{user_id}",
+                f"session:{user_id}",
+                f"entitlement:{user_id}"
+            ])
+            keys.extend(f"quota:{user_id}:{day}" for day in days)
+        keys.extend(f"memory_anchor:{user_id}:{anchor_id}" for user_id, anchor_id in anchors)
+        
+        # Private chats: chat id and user id are both the Telegram id
+        bot_id = settings.bot_token.split(':', 1)[0]
+        keys.extend(f"fsm:{bot_id}:{telegram_id}:{telegram_id}" for telegram_id in telegram_ids)
+        
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(*keys)
+        for user_id in user_ids:
+            pipe.publish(ENTITLEMENT_CHANNEL, json.dumps({"user_id": user_id}))
+        await pipe.execute()
@@ -7,9 +7,42 @@ class Settings(BaseSettings):
     bot_token: str
     openai_api_key: str
     database_url: str
+    database_replica_url: Optional[str] = None
+    replica_max_lag_seconds: int = 30
+    
+    # Connection pools, sized per process role (DB_ROLE=bot|admin|worker)
+    db_role: str = "bot"
+    db_pool_size_bot: int = 10
+    db_max_overflow_bot: int = 20
+    db_pool_size_admin: int = 5
+    db_max_overflow_admin: int = 5
+    db_pool_size_worker: int = 3
+    db_max_overflow_worker: int = 2
+    # Taken out of the role's size/overflow above when DATABASE_REPLICA_URL is set
+    db_replica_pool_size: int = 2
+    db_replica_max_overflow: int = 2
+    db_replica_connect_timeout: int = 3
+    db_pool_timeout: int = 10
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 500  # 0 behind pgbouncer in transaction mode
     redis_url: str = "redis://localhost:6379/0"
+    fsm_state_ttl: int = 7 * 24 * 3600  # abandoned FSM state (e.g. surveys) expires after a week
     admin_secret: str
     cryptocloud_api_key: Optional[str] = None
+    cryptocloud_api_url: str = "https://api.cryptocloud.plus"
+    analytics_archive_dir: str = "archive/analytics"
+    # Set once the archive dir is on storage that outlives the process (a mounted
+    # volume, a host disk); until then expired partitions are exported but kept
+    analytics_archive_persistent: bool = False
+    
+    # Admin API response cache (seconds)
+    admin_cache_ttl: int = 30
+    admin_cache_stale_seconds: int = 300
+    
+    # OpenAI calls: in-flight cap per process and response cache lifetime (seconds)
+    llm_max_concurrency: int = 4
+    llm_cache_ttl: int = 24 * 3600
     
     # Database settings
     postgres_user: Optional[str] = None
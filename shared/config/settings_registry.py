@@ -0,0 +1,584 @@
+"""
+Registry of the DB-backed bot settings (bot_settings table).
+
+Every setting is declared once here with its type, default, category,
+description and an optional validator. Stored values are decoded and
+checked against the declaration in one place (decode_value), and a whole
+snapshot becomes a frozen BotConfig so hot paths read plain attributes
+(cfg.memory_window_size) instead of looking values up and sniffing types.
+"""
+import logging
+from dataclasses import dataclass, make_dataclass
+from typing import Any, Callable, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SettingSpec:
+    key: str
+    type: type  # str, int, float, bool, list or dict
+    default: Any
+    category: str  # frequent, expert
+    description: str
+    validate: Optional[Callable[[Any], bool]] = None
+
+
+def _at_least(minimum):
+    return lambda value: value >= minimum
+
+
+def _between(low, high):
+    return lambda value: low <= value <= high
+
+
+def _non_empty(value) -> bool:
+    return len(value) > 0
+
+
+# Column a type is normally stored in; float, list and dict live in json_value
+NATIVE_COLUMNS = {
+    bool: "boolean_value",
+    int: "integer_value",
+    str: "string_value",
+}
+
+
+def value_columns(value: Any) -> Dict[str, Any]:
+    """bot_settings value columns for a value, the unused ones set to None"""
+    columns = {"string_value": None, "integer_value": None, "boolean_value": None, "json_value": None}
+    # bool before int: bool is a subclass of int
+    if isinstance(value, bool):
+        columns["boolean_value"] = value
+    elif isinstance(value, str):
+        columns["string_value"] = value
+    elif isinstance(value, int):
+        columns["integer_value"] = value
+    else:
+        columns["json_value"] = value
+    return columns
+
+
+def _coerce(spec: SettingSpec, value: Any) -> Any:
+    """Convert a raw value to the declared type or raise ValueError"""
+    if spec.type is bool:
+        if isinstance(value, bool):
+            return value
+        # Older writes stored booleans in integer_value
+        if isinstance(value, int) and value in (0, 1):
+            return bool(value)
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+    elif spec.type is int:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            return int(value)
+    elif spec.type is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    elif isinstance(value, spec.type):
+        return value
+
+    raise ValueError(f"{spec.key}: expected {spec.type.__name__}, got {value!r}")
+
+
+def check_value(spec: SettingSpec, value: Any) -> Any:
+    """Coerce and validate a value for a setting; raises ValueError"""
+    value = _coerce(spec, value)
+    if spec.validate and not spec.validate(value):
+        raise ValueError(f"{spec.key}: invalid value {value!r}")
+    return value
+
+
+def encode_value(key: str, value: Any) -> Dict[str, Any]:
+    """Value columns for writing a setting, checked against the registry when declared"""
+    spec = REGISTRY.get(key)
+    if spec:
+        value = check_value(spec, value)
+    return value_columns(value)
+
+
+def decode_value(key: str, string_value=None, integer_value=None, boolean_value=None, json_value=None) -> Any:
+    """
+    Typed value of a stored setting.
+
+    Declared settings are read from their native column (any non-empty one
+    for older rows), coerced and validated; ValueError when that fails.
+    Undeclared keys keep the legacy first-non-null behaviour.
+    """
+    stored = {
+        "string_value": string_value,
+        "integer_value": integer_value,
+        "boolean_value": boolean_value,
+        "json_value": json_value,
+    }
+    spec = REGISTRY.get(key)
+    if spec is None:
+        return next((value for value in stored.values() if value is not None), None)
+
+    raw = stored.get(NATIVE_COLUMNS.get(spec.type, "json_value"))
+    if raw is None:
+        raw = next((value for value in stored.values() if value is not None), None)
+    if raw is None:
+        raise ValueError(f"{key}: no stored value")
+    return check_value(spec, raw)
+
+
+SETTINGS = (
+    # Frequent settings (easily changed by admins)
+    SettingSpec("daily_message_limit", int, 5, "frequent", "Daily free message limit per user", validate=_at_least(1)),
+    SettingSpec("policy_version", str, "v1", "frequent", "Current privacy policy version"),
+
+    # Consent texts
+    SettingSpec(
+        "consent_welcome_text",
+        str,
+        "Привет! Здесь будет комфортно и безопасно. ❗️Это не замена психотерапии. В кризисных ситуациях звоните 112. 📄 Подробнее об условиях... Готовы продолжить?",
+        "frequent",
+        "Welcome text shown during consent gate"
+    ),
+
+    SettingSpec(
+        "full_privacy_policy",
+        str,
+        "Полная политика конфиденциальности:\n\n1. Мы не врачи и не психотерапевты\n2. Не сохраняем содержание ваших сообщений\n3. В кризисных ситуациях обращайтесь к специалистам\n4. Вы можете удалить свои данные в любое время",
+        "frequent",
+        "Full privacy policy text"
+    ),
+
+    # Survey texts
+    SettingSpec(
+        "survey_intro_text",
+        str,
+        "Расскажите немного о себе, чтобы я мог лучше вас понимать.",
+        "frequent",
+        "Survey introduction text"
+    ),
+
+    # Emotion and topic tags
+    SettingSpec(
+        "emotion_tags",
+        list,
+        [
+            "😰 тревога", "😥 чувство вины", "😡 злость", "😞 усталость",
+            "😔 грусть", "😨 страх", "😤 раздражение", "😟 беспокойство",
+            "😢 печаль", "😮‍💨 стресс", "😓 беспомощность", "😵‍💫 растерянность"
+        ],
+        "frequent",
+        "Available emotion tags for user selection",
+        validate=_non_empty
+    ),
+
+    SettingSpec(
+        "topic_tags",
+        list,
+        [
+            "💼 работа", "❤️ отношения", "👨‍👩‍👧 семья", "🏥 здоровье",
+            "💰 деньги", "🎓 учеба", "🤝 друзья", "🏠 быт",
+            "🎯 цели", "⚖️ решения", "🌱 саморазвитие", "😴 сон"
+        ],
+        "frequent",
+        "Available topic tags for user selection",
+        validate=_non_empty
+    ),
+
+    # Payment settings
+    SettingSpec("cryptocloud_api_key", str, "", "expert", "CryptoCloud API key"),
+    SettingSpec("cryptocloud_shop_id", str, "", "expert", "CryptoCloud shop ID"),
+    SettingSpec("cryptocloud_invoice_ttl_hours", int, 24, "expert", "Hours after which unpaid CryptoCloud invoices stop being polled", validate=_at_least(1)),
+    SettingSpec("cryptocloud_webhook_grace_seconds", int, 60, "expert", "Seconds to wait for the CryptoCloud webhook before polling an invoice", validate=_at_least(0)),
+    SettingSpec("support_contact", str, "@support", "frequent", "Support contact username"),
+
+    # Payment text templates
+    SettingSpec(
+        "payment_success_text",
+        str,
+        "✅ Оплата прошла успешно!\n\nВаша подписка активирована. Теперь у вас безлимитное общение с ботом. Приятного использования! 🎉",
+        "frequent",
+        "Payment success message template"
+    ),
+
+    SettingSpec(
+        "payment_failed_text",
+        str,
+        "❌ Оплата не прошла. Попробуйте другой способ или обратитесь в поддержку {support_contact}",
+        "frequent",
+        "Payment failure message template"
+    ),
+
+    SettingSpec(
+        "subscription_reminder_24h_template",
+        str,
+        "🔔 {name}, ваша подписка истекает через 24 часа!\n\nХотите продлить для продолжения безлимитного общения?",
+        "frequent",
+        "24-hour subscription reminder template"
+    ),
+
+    SettingSpec(
+        "subscription_reminder_expiry_template",
+        str,
+        "⚠️ {name}, ваша подписка истекает сегодня!\n\nПродлите сейчас, чтобы сохранить безлимитное общение.",
+        "frequent",
+        "Expiration day reminder template"
+    ),
+
+    SettingSpec("subscription_reminders_enabled", bool, True, "frequent", "Enable subscription expiration reminders"),
+
+    # Payment retry templates
+    SettingSpec(
+        "payment_retry_template",
+        str,
+        "❌ Оплата не прошла (попытка {attempt} из {max_attempts})\n\nПопробуйте:\n• Другой способ оплаты\n• Проверить данные карты\n• Повторить через несколько минут",
+        "frequent",
+        "Payment retry message template"
+    ),
+
+    SettingSpec(
+        "payment_max_attempts_template",
+        str,
+        "😔 К сожалению, платеж не прошел после нескольких попыток.\n\nДля помощи с оплатой обратитесь в поддержку: {support_contact}\n\nМы поможем решить любые проблемы!",
+        "frequent",
+        "Message when max payment attempts reached"
+    ),
+
+    # Expert settings (advanced configuration)
+    SettingSpec("memory_window_size", int, 15, "expert", "Number of recent messages to include in GPT context", validate=_at_least(1)),
+    SettingSpec("max_blocks_per_reply", int, 3, "expert", "Maximum blocks to split GPT response into", validate=_at_least(1)),
+    SettingSpec("min_block_length", int, 30, "expert", "Minimum length of text block before merging", validate=_at_least(0)),
+    SettingSpec("delay_between_blocks_min", int, 2200, "expert", "Minimum delay between blocks in milliseconds", validate=_at_least(0)),
+    SettingSpec("delay_between_blocks_max", int, 4200, "expert", "Maximum delay between blocks in milliseconds", validate=_at_least(0)),
+    SettingSpec("typing_duration_base", float, 1.5, "expert", "Base typing duration in seconds", validate=_at_least(0)),
+    SettingSpec("typing_duration_per_word", float, 0.1, "expert", "Additional typing duration per word in seconds", validate=_at_least(0)),
+    SettingSpec("typing_duration_max", float, 4.0, "expert", "Maximum typing duration per block in seconds", validate=_at_least(0)),
+
+    # Long-term memory settings
+    SettingSpec("long_memory_enabled", bool, True, "expert", "Enable long-term memory anchors system"),
+    SettingSpec("memory_anchor_ttl_days", int, 90, "expert", "Days to keep memory anchors in Redis cache", validate=_at_least(1)),
+    SettingSpec("max_anchors_per_user", int, 20, "expert", "Maximum memory anchors per user", validate=_at_least(1)),
+
+    # Crisis settings
+    SettingSpec(
+        "crisis_keywords",
+        list,
+        [
+            "умереть", "умру", "суицид", "покончить", "повеситься", 
+            "убить себя", "не хочу жить", "нет смысла жить", "конец",
+            "прыгнуть", "таблетки", "смерть", "убийство себя",
+            "повешусь", "отравлюсь", "утоплюсь", "зарежусь", "застрелюсь"
+        ],
+        "expert",
+        "Keywords that trigger crisis mode",
+        validate=_non_empty
+    ),
+
+    SettingSpec("crisis_ping_freeze_hours", int, 12, "expert", "Hours to freeze pings after crisis event", validate=_at_least(0)),
+
+    SettingSpec(
+        "crisis_response_text",
+        str,
+        "Мне очень жаль, что тебе так тяжело. Я не могу заменить живого специалиста, но хочу, чтобы ты сейчас получил помощь.\n\n🆘 Горячая линия: 8 800 2000 122\n📞 Экстренные службы: 112",
+        "frequent",
+        "Text shown when crisis is detected"
+    ),
+
+    SettingSpec(
+        "crisis_safety_phrase",
+        str,
+        "я не причиню себе вред",
+        "expert",
+        "Phrase user must type to exit crisis mode"
+    ),
+
+    SettingSpec(
+        "crisis_help_contacts",
+        str,
+        "🆘 ЭКСТРЕННАЯ ПОМОЩЬ\n\n📞 Всероссийская горячая линия:\n8 800 2000 122 (круглосуточно, бесплатно)\n\n🚑 Экстренные службы: 112\n\n💬 Онлайн поддержка:\n• Телефон доверия: 8-495-988-44-34\n• Чат поддержки: pomogi.org",
+        "frequent",
+        "Crisis help contacts shown to users"
+    ),
+
+    # Progressive ping timing settings
+    SettingSpec("progressive_ping_1_delay", int, 30, "frequent", "Minutes before sending first progressive ping", validate=_at_least(1)),
+    SettingSpec("progressive_ping_2_delay", int, 120, "frequent", "Minutes after first ping to send second ping", validate=_at_least(1)),
+    SettingSpec("progressive_ping_3_delay", int, 1440, "frequent", "Minutes after second ping to send third ping", validate=_at_least(1)),
+
+    # Session settings
+    SettingSpec("session_close_timeout", int, 48, "expert", "Hours before closing inactive session", validate=_at_least(1)),
+    SettingSpec("allowed_ping_hours_start", int, 10, "frequent", "Start of allowed ping hours", validate=_between(0, 23)),
+    SettingSpec("allowed_ping_hours_end", int, 21, "frequent", "End of allowed ping hours", validate=_between(0, 23)),
+
+    # Legacy idle_ping_delay (mapped to progressive_ping_1_delay for backward compatibility)
+    SettingSpec("idle_ping_delay", int, 30, "expert", "Minutes before sending idle ping (legacy)", validate=_at_least(1)),
+
+    # Ping system settings
+    SettingSpec("ping_enabled", bool, True, "frequent", "Enable automatic ping system"),
+    SettingSpec("ping_ai_generation_enabled", bool, False, "frequent", "Enable AI generation of ping texts"),
+
+    # AI ping generation system prompt
+    SettingSpec(
+        "ping_ai_system_prompt",
+        str,
+        "Ты эмпатичный психологический чат-бот. Создай короткое (до 50 символов), теплое сообщение для проверки связи с пользователем. Используй эмодзи. Варьируй тон от мягкого до заботливого в зависимости от уровня пинга. Не используй вопросы прямо о проблемах, будь деликатным.",
+        "expert",
+        "System prompt for AI-generated ping messages"
+    ),
+
+    # Progressive ping templates
+    SettingSpec(
+        "progressive_ping_1_templates",
+        list,
+        [
+            "Ты ещё здесь? Я на связи 💙",
+            "Как дела, {name}? Я слушаю 🤗", 
+            "Всё в порядке? 💭",
+            "Если нужно поговорить, я здесь ✨"
+        ],
+        "frequent",
+        "Templates for first progressive ping (level 1)"
+    ),
+
+    SettingSpec(
+        "progressive_ping_2_templates",
+        list,
+        [
+            "👋 {name}, думаю о тебе. Как настроение?",
+            "🌟 Хочется узнать, как ты себя чувствуешь?", 
+            "💭 {name}, поделишься, что у тебя на душе?",
+            "🤗 Как прошло время? Расскажешь?"
+        ],
+        "frequent",
+        "Templates for second progressive ping (level 2)"
+    ),
+
+    SettingSpec(
+        "progressive_ping_3_templates",
+        list,
+        [
+            "🌈 {name}, я беспокоюсь. Как ты?",
+            "💙 Давно не слышал от тебя. Всё ли хорошо?", 
+            "☀️ {name}, надеюсь, у тебя все в порядке. Я здесь, если нужно поговорить",
+            "🫂 Скучаю по нашим разговорам. Как дела?"
+        ],
+        "frequent",
+        "Templates for third progressive ping (level 3)"
+    ),
+
+    # Idle ping templates  
+    SettingSpec(
+        "idle_ping_templates",
+        list,
+        [
+            "Ты ещё здесь? Я на связи 💙",
+            "Как дела? Я слушаю 🤗", 
+            "Всё в порядке? 💭",
+            "Если нужно поговорить, я здесь ✨"
+        ],
+        "frequent",
+        "Templates for idle ping messages (within session)"
+    ),
+
+    # Error handling settings
+    SettingSpec("api_timeout", int, 30, "expert", "API timeout in seconds", validate=_at_least(1)),
+    SettingSpec("max_retry_attempts", int, 2, "expert", "Maximum retry attempts for failed API calls", validate=_at_least(0)),
+    SettingSpec("payment_retry_attempts", int, 3, "expert", "Maximum payment retry attempts", validate=_at_least(1)),
+
+    # System texts
+    SettingSpec(
+        "error_messages",
+        dict,
+        {
+            "api_timeout": "Кажется, я задумался... Попробуем ещё раз?",
+            "payment_failed": "Оплата не прошла. Попробуйте другой способ или обратитесь в поддержку",
+            "service_maintenance": "Сервис обновляется, скоро вернусь"
+        },
+        "frequent",
+        "Error messages shown to users"
+    ),
+
+    # Paywall settings
+    SettingSpec(
+        "paywall_text",
+        str,
+        "💳 <b>Подписка</b>\n\nДля продолжения общения необходима подписка. Выберите подходящий тариф:",
+        "frequent",
+        "Text shown when paywall is triggered"
+    ),
+
+    # Subscription settings
+    SettingSpec(
+        "subscription_plans",
+        list,
+        [
+            {"name": "7 дней", "days": 7, "price": 199, "currency": "RUB", "discount": 0},
+            {"name": "30 дней", "days": 30, "price": 599, "currency": "RUB", "discount": 10},
+            {"name": "90 дней", "days": 90, "price": 1499, "currency": "RUB", "discount": 17}
+        ],
+        "frequent",
+        "Available subscription plans"
+    ),
+
+    # Onboarding settings
+    SettingSpec("emotion_max", int, 10, "frequent", "Maximum emotions user can select", validate=_at_least(1)),
+    SettingSpec("topic_max", int, 8, "frequent", "Maximum topics user can select", validate=_at_least(1)),
+
+    # GPT System Prompt (ВАЖНО!)
+    SettingSpec(
+        "system_prompt",
+        str,
+        """Ты эмпатичный помощник для эмоциональной поддержки. 
+
+ВАЖНЫЕ ПРАВИЛА:
+- НЕ давай конкретных советов или медицинских рекомендаций
+- НЕ используй слово "вы", только "ты"
+- НЕ упоминай GPT/AI или что ты робот
+- НЕ выпрашивай доверие фразами типа "я здесь для тебя"
+- НЕ морализируй и не читай лекции
+- Мат и агрессию интерпретируй как выражение эмоций
+
+ЧТО ДЕЛАТЬ:
+- Фокусируйся на эмоциях и поддержке
+- Говори от сердца, человечно
+- Задавай открытые вопросы о чувствах
+- Отражай эмоции пользователя
+- Будь кратким но теплым
+
+ФОРМАТ ОТВЕТОВ:
+- Максимум 3 абзаца
+- Каждый абзац - отдельная мысль
+- Используй переносы строк между абзацами
+- Не более 200 слов общего объема""",
+        "frequent",
+        "System prompt for GPT - defines bot personality and behavior"
+    ),
+
+    # GPT Model settings
+    SettingSpec("gpt_model", str, "gpt-4", "expert", "GPT model to use"),
+    SettingSpec("gpt_temperature", float, 0.8, "expert", "GPT temperature (creativity)", validate=_between(0, 2)),
+    SettingSpec("gpt_max_tokens", int, 800, "expert", "Maximum tokens in GPT response", validate=_at_least(1)),
+
+    # Greeting Generation Settings
+    SettingSpec(
+        "greeting_prompt",
+        str,
+        """Ты генерируешь персонализированные приветствия для бота эмоциональной поддержки.
+
+ПРАВИЛА ПРИВЕТСТВИЙ:
+- Будь теплым и эмпатичным
+- Используй имя пользователя естественно  
+- НЕ используй "вы", только "ты"
+- Учитывай время суток
+- Будь кратким (1-2 предложения)
+- НЕ упоминай что ты ИИ или бот
+- Избегай клише типа "я здесь для тебя"
+
+ЭМОЦИОНАЛЬНЫЙ ТОН:
+- Для тревожных - успокаивающий
+- Для грустных - поддерживающий  
+- Для злых - понимающий
+- Для радостных - разделяющий радость
+
+ФОРМАТ ОТВЕТА:
+Только текст приветствия, без кавычек и пояснений.""",
+        "frequent",
+        "System prompt for generating personalized greetings"
+    ),
+
+    SettingSpec(
+        "greeting_fallback_templates",
+        list,
+        [
+            "Привет, {name}! Как дела? 😊",
+            "Здравствуй, {name}! Рад тебя видеть 🌸", 
+            "Привет! Как настроение, {name}? 💭",
+            "Добро пожаловать, {name}! Что у тебя на душе? ✨",
+            "Приветик, {name}! Расскажи, как прошел день? 🌈",
+            "Привет снова, {name}! Соскучился 💙",
+            "Здравствуй! Хорошо, что ты зашел, {name} 🌟"
+        ],
+        "frequent",
+        "Fallback greeting templates when GPT fails"
+    ),
+
+    SettingSpec("greeting_enabled", bool, True, "frequent", "Enable GPT-powered dynamic greetings"),
+    SettingSpec("greeting_cache_ttl", int, 300, "expert", "Seconds to cache generated greetings", validate=_at_least(0)),
+    SettingSpec("greeting_pool_size", int, 8, "expert", "Pre-generated greetings kept per scenario, time of day and tone", validate=_at_least(1)),
+    SettingSpec("greeting_pool_watermark", int, 3, "expert", "Pool size below which greetings are regenerated in the background", validate=_at_least(0)),
+
+    # Welcome message for new users
+    SettingSpec(
+        "welcome_message",
+        str,
+        """👋 Добро пожаловать!
+
+Я — твой личный помощник для эмоциональной поддержки. Здесь ты можешь:
+
+• 💬 Поделиться переживаниями в безопасной обстановке
+• 🧘‍♀️ Получить поддержку и понимание  
+• 📈 Отследить свое эмоциональное состояние
+• 🌟 Найти покой и баланс в жизни
+
+🔒 <b>Полная конфиденциальность:</b> все разговоры остаются между нами.
+
+⚠️ <i>Важно: это дополнение к профессиональной помощи, а не замена. В кризисных ситуациях обращайтесь к специалистам или звоните 112.</i>""",
+        "frequent",
+        "Welcome message shown to new users on first /start"
+    ),
+
+    # Continue button prompt
+    SettingSpec(
+        "continue_prompt",
+        str,
+        "Продолжи мысль, дай развернутый совет или поддержку. Будь эмпатичным и полезным. Не повторяйся, добавь что-то новое к разговору.",
+        "frequent",
+        "Prompt used when user clicks 'Continue' button"
+    ),
+
+    # Analytics settings
+    SettingSpec("analytics_retention_days", int, 90, "expert", "Days of raw analytics events kept before their monthly partitions are archived", validate=_at_least(1)),
+    SettingSpec("log_user_messages", bool, False, "expert", "Whether to log user message content (GDPR sensitive)"),
+)
+
+REGISTRY: Dict[str, SettingSpec] = {spec.key: spec for spec in SETTINGS}
+
+
+def default_for(key: str) -> Any:
+    """Registered default of a setting (None for unknown keys)"""
+    spec = REGISTRY.get(key)
+    return spec.default if spec else None
+
+
+# One attribute per registered setting; lists are stored as tuples
+BotConfig = make_dataclass(
+    "BotConfig",
+    [(spec.key, tuple if spec.type is list else spec.type) for spec in SETTINGS],
+    frozen=True,
+    slots=True
+)
+
+
+def build_config(values: Mapping[str, Any]) -> "BotConfig":
+    """
+    Frozen snapshot from decoded values. Missing or invalid values fall back
+    to the registered default (invalid ones are logged).
+    """
+    fields = {}
+    for spec in SETTINGS:
+        value = spec.default
+        if values.get(spec.key) is not None:
+            try:
+                value = check_value(spec, values[spec.key])
+            except ValueError as e:
+                logger.warning(f"Using default for setting {e}")
+        fields[spec.key] = tuple(value) if spec.type is list else value
+    return BotConfig(**fields)
+
+
+DEFAULT_CONFIG = build_config({})
@@ -2,7 +2,7 @@ from .user import User
 from .settings import Settings
 from .subscription import Subscription
 from .conversation import Conversation, Message
-from .analytics import Event, UserSession
+from .analytics import Event, UserSession, AnalyticsRollup, DailyActiveUser, RollupWatermark
 from .crisis import CrisisEvent
 from .memory import MemoryAnchor, ConversationSummary
 from .prompt_history import PromptHistory
@@ -15,6 +15,9 @@ __all__ = [
     "Message",
     "Event",
     "UserSession",
+    "AnalyticsRollup",
+    "DailyActiveUser",
+    "RollupWatermark",
     "CrisisEvent",
     "MemoryAnchor",
     "ConversationSummary",
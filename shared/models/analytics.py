@@ -1,10 +1,20 @@
-from sqlalchemy import Column, String, BigInteger, DateTime, Boolean, ForeignKey, Text, JSON
+from sqlalchemy import Column, String, BigInteger, DateTime, Boolean, ForeignKey, Text, JSON, Index, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
 
 class Event(BaseModel):
+    """Monthly range-partitioned on created_at (see shared/analytics/partitions.py)"""
     __tablename__ = "analytics_events"
+    __table_args__ = (
+        Index("ix_analytics_events_created_at", "created_at"),
+        Index("ix_analytics_events_event_type_created_at", "event_type", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    
+    # The partition key has to be part of the primary key
+    id = Column(BigInteger, primary_key=True, autoincrement=True, index=True)
+    created_at = Column(DateTime, primary_key=True, server_default=func.now())
     
     user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)  # Note: This references the internal user ID, not Telegram ID
     
@@ -39,4 +49,37 @@ class UserSession(BaseModel):
     end_reason = Column(String, nullable=True)  # timeout, user_exit, paywall, etc.
     
     # Relationships
-    user = relationship("User", back_populates="sessions")
\ No newline at end of file
+    user = relationship("User", back_populates="sessions")
+
+
+class AnalyticsRollup(BaseModel):
+    """Pre-aggregated counters per hour/day bucket, maintained incrementally"""
+    __tablename__ = "analytics_rollups"
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "metric", "dimension", name="uq_analytics_rollups_bucket"),
+    )
+    
+    granularity = Column(String, nullable=False)  # hour, day, snapshot
+    bucket_start = Column(DateTime, nullable=False)
+    metric = Column(String, nullable=False)  # events, new_users, active_users, emotion_tags, topic_tags
+    dimension = Column(String, nullable=False, default="")  # event_type for events, tag name for tags
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class DailyActiveUser(BaseModel):
+    """Exact per-day set of users that produced at least one event"""
+    __tablename__ = "analytics_daily_active_users"
+    __table_args__ = (
+        UniqueConstraint("day", "user_id", name="uq_analytics_daily_active_users_day_user"),
+    )
+    
+    day = Column(DateTime, nullable=False)
+    user_id = Column(BigInteger, nullable=False)  # No FK: rollups outlive deleted users
+
+
+class RollupWatermark(BaseModel):
+    """Everything created before `watermark` is already folded into the rollups"""
+    __tablename__ = "analytics_rollup_watermarks"
+    
+    name = Column(String, unique=True, nullable=False)
+    watermark = Column(DateTime, nullable=False)
@@ -1,10 +1,17 @@
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, ForeignKey, Text, Index, text
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
 
 class Conversation(BaseModel):
     __tablename__ = "conversations"
+    __table_args__ = (
+        Index(
+            "ix_conversations_active_last_message_at",
+            "last_message_at",
+            postgresql_where=text("is_active"),
+        ),
+    )
     
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     session_id = Column(String, nullable=False, index=True)
@@ -13,6 +20,7 @@ class Conversation(BaseModel):
     is_active = Column(Boolean, default=True)
     is_closed = Column(Boolean, default=False)
     closed_at = Column(DateTime, nullable=True)
+    last_message_at = Column(DateTime, nullable=True)  # Denormalized from messages
     
     # Context
     memory_context = Column(Text, nullable=True)  # Long-term memory notes
@@ -24,6 +32,9 @@ class Conversation(BaseModel):
 
 class Message(BaseModel):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at"),
+    )
     
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
     
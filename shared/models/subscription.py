@@ -1,10 +1,15 @@
-from sqlalchemy import Column, String, BigInteger, DateTime, Boolean, ForeignKey, Numeric
+from sqlalchemy import Column, String, BigInteger, DateTime, Boolean, ForeignKey, Numeric, Index
 from sqlalchemy.orm import relationship
+from datetime import datetime
 from .base import BaseModel
 
 
 class Subscription(BaseModel):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        # Latest subscription per user
+        Index("ix_subscriptions_user_id_created_at", "user_id", "created_at"),
+    )
     
     user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
     
@@ -31,4 +36,9 @@ class Subscription(BaseModel):
     daily_reset_at = Column(DateTime, nullable=True)  # When daily limit resets
     
     # Relationships
-    user = relationship("User", back_populates="subscription")
\ No newline at end of file
+    user = relationship("User", back_populates="subscription")
+    
+    def is_paid_active(self, now: datetime = None) -> bool:
+        """Paid subscription that has not expired yet (unlimited messages)"""
+        now = now or datetime.utcnow()
+        return bool(self.is_active) and self.ends_at is not None and self.ends_at > now
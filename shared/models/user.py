@@ -1,10 +1,27 @@
-from sqlalchemy import Column, String, Boolean, BigInteger, DateTime, Text, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Boolean, BigInteger, DateTime, Text, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship, validates
 from .base import BaseModel
 
 
+def tag_name(tag: str) -> str:
+    """Strip the leading emoji: "😰 тревога" -> "тревога" """
+    return tag.split(' ', 1)[1] if ' ' in tag else tag
+
+
 class User(BaseModel):
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset pagination in the admin user list
+        Index("ix_users_created_at_id", "created_at", "id"),
+        # Substring search (ILIKE '%...%'); needs the pg_trgm extension
+        Index("ix_users_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_users_telegram_id_trgm", "telegram_id", postgresql_using="gin", postgresql_ops={"telegram_id": "gin_trgm_ops"}),
+        Index("ix_users_city_trgm", "city", postgresql_using="gin", postgresql_ops={"city": "gin_trgm_ops"}),
+        # Tag aggregation and containment filters
+        Index("ix_users_emotion_names", "emotion_names", postgresql_using="gin"),
+        Index("ix_users_topic_names", "topic_names", postgresql_using="gin"),
+    )
     
     telegram_id = Column(String, unique=True, index=True, nullable=False)
     name = Column(String, nullable=True)
@@ -20,8 +37,12 @@ class User(BaseModel):
     accepted_at = Column(DateTime, nullable=True)
     
     # Profile data
-    emotion_tags = Column(JSON, nullable=True)  # List of selected emotions
-    topic_tags = Column(JSON, nullable=True)   # List of selected topics
+    emotion_tags = Column(JSONB, nullable=True)  # List of selected emotions
+    topic_tags = Column(JSONB, nullable=True)   # List of selected topics
+    
+    # Tag names without emoji, kept in sync with the tags on assignment
+    emotion_names = Column(JSONB, nullable=True)
+    topic_names = Column(JSONB, nullable=True)
     
     # Preferences
     ping_enabled = Column(Boolean, default=True)
@@ -32,6 +53,11 @@ class User(BaseModel):
     last_reminder_24h = Column(DateTime, nullable=True)
     last_reminder_expiry = Column(DateTime, nullable=True)
     
+    # Denormalized activity (maintained in the message-write and ping paths)
+    last_user_message_at = Column(DateTime, nullable=True, index=True)
+    last_ping_at = Column(DateTime, nullable=True)
+    pings_since_last_message = Column(BigInteger, default=0, server_default="0", nullable=False)
+    
     # Status
     is_active = Column(Boolean, default=True)
     is_in_crisis = Column(Boolean, default=False)
@@ -43,4 +69,13 @@ class User(BaseModel):
     events = relationship("Event", back_populates="user")
     sessions = relationship("UserSession", back_populates="user")
     crisis_events = relationship("CrisisEvent", back_populates="user")
-    memory_anchors = relationship("MemoryAnchor", back_populates="user")
\ No newline at end of file
+    memory_anchors = relationship("MemoryAnchor", back_populates="user")
+    
+    @validates("emotion_tags", "topic_tags")
+    def _store_tag_names(self, key, tags):
+        names = [tag_name(tag) for tag in tags] if tags is not None else None
+        if key == "emotion_tags":
+            self.emotion_names = names
+        else:
+            self.topic_names = names
+        return tags
@@ -0,0 +1,91 @@
+"""
+Content-addressed cache and concurrency cap for OpenAI chat completions
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Dict, Optional
+
+from shared.config.redis import get_redis
+from shared.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    Chat completions keyed on a hash of (model, messages, params). Identical
+    requests within llm_cache_ttl are answered from Redis; every call that
+    does reach OpenAI waits for a slot under llm_max_concurrency.
+    """
+
+    KEY_PREFIX = "llm_cache"
+
+    def __init__(self):
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.llm_max_concurrency)
+        return self._semaphore
+
+    def _key(self, request: Dict, variant: int) -> str:
+        payload = json.dumps({**request, "variant": variant}, sort_keys=True, ensure_ascii=False)
+        return f"{self.KEY_PREFIX}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    async def complete(
+        self,
+        client,
+        use_cache: bool = True,
+        variant: int = 0,
+        timeout: Optional[float] = None,
+        **request
+    ) -> Dict:
+        """
+        Run (or replay) a chat completion.
+
+        Args:
+            client: AsyncOpenAI client
+            use_cache: False bypasses the cache entirely (no read, no write)
+            variant: Distinguishes otherwise identical requests that should
+                produce different samples (e.g. several greetings at once)
+            timeout: Request timeout; not part of the cache key
+            **request: chat.completions.create arguments (model, messages, ...)
+
+        Returns:
+            {'content': str, 'total_tokens': int, 'cached': bool}
+        """
+        key = self._key(request, variant)
+        redis_client = await get_redis()
+
+        if use_cache and redis_client:
+            try:
+                cached = await redis_client.get(key)
+                if cached:
+                    return {**json.loads(cached), "cached": True}
+            except Exception as e:
+                logger.warning(f"LLM cache read failed: {e}")
+
+        if timeout is not None:
+            request = {**request, "timeout": timeout}
+        async with self.semaphore:
+            response = await client.chat.completions.create(**request)
+
+        result = {
+            "content": response.choices[0].message.content or "",
+            "total_tokens": response.usage.total_tokens if response.usage else 0,
+        }
+
+        if use_cache and redis_client:
+            try:
+                await redis_client.setex(key, settings.llm_cache_ttl, json.dumps(result, ensure_ascii=False))
+            except Exception as e:
+                logger.warning(f"LLM cache write failed: {e}")
+
+        return {**result, "cached": False}
+
+
+# Global instance
+llm_cache = LLMResponseCache()
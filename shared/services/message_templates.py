@@ -0,0 +1,120 @@
+"""
+Placeholder templates for pings, reminders and admin previews
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Collection, Dict, Mapping, Optional, Tuple
+
+import pytz
+
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+DEFAULT_NAME = "друг мой"
+FALLBACK_DAY_PART = "Привет"
+
+
+class CompiledTemplate:
+    """
+    A template split once into literal and slot segments: literals[i] is
+    followed by slots[i]. Rendering is a single join; a slot missing from
+    the context is kept as its placeholder.
+    """
+
+    __slots__ = ("source", "literals", "slots")
+
+    def __init__(self, source: str):
+        self.source = source
+        parts = PLACEHOLDER.split(source)
+        self.literals: Tuple[str, ...] = tuple(parts[0::2])
+        self.slots: Tuple[str, ...] = tuple(parts[1::2])
+
+    def render(self, context: Mapping[str, str]) -> str:
+        if not self.slots:
+            return self.source
+
+        out = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            value = context.get(slot)
+            out.append("{" + slot + "}" if value is None else value)
+            out.append(literal)
+        return "".join(out)
+
+
+@lru_cache(maxsize=1024)
+def compile_template(template: str) -> CompiledTemplate:
+    """Keyed on the text, so an edited setting compiles once and old versions age out"""
+    return CompiledTemplate(template)
+
+
+def render(template: str, context: Mapping[str, str]) -> str:
+    return compile_template(template).render(context)
+
+
+@lru_cache(maxsize=512)
+def _timezone(name: str):
+    return pytz.timezone(name)
+
+
+def day_part(timezone: Optional[str], now: Optional[datetime] = None) -> str:
+    """Greeting for the user's local time of day"""
+    now = now or datetime.utcnow()
+    # Every UTC offset is a whole number of quarter hours, so the local hour
+    # cannot change within one UTC quarter hour (datetime.replace is slower
+    # than the whole lookup, hence the plain tuple key)
+    return _day_part(timezone, now.toordinal(), now.hour, now.minute // 15)
+
+
+@lru_cache(maxsize=4096)
+def _day_part(timezone: Optional[str], ordinal: int, hour: int, quarter: int) -> str:
+    quarter = datetime.fromordinal(ordinal).replace(hour=hour, minute=quarter * 15)
+    try:
+        hour = pytz.utc.localize(quarter).astimezone(_timezone(timezone)).hour if timezone else quarter.hour
+    except Exception:
+        return FALLBACK_DAY_PART
+
+    if 5 <= hour < 12:
+        return "Доброе утро"
+    if 12 <= hour < 17:
+        return "Добрый день"
+    if 17 <= hour < 22:
+        return "Добрый вечер"
+    return "Доброй ночи"
+
+
+def user_context(
+    user,
+    now: Optional[datetime] = None,
+    default_name: str = DEFAULT_NAME,
+    ends_at: Optional[datetime] = None,
+    slots: Optional[Collection[str]] = None
+) -> Dict[str, str]:
+    """
+    Values for {name} and {day_part}, plus {hours_left} and {days} when a
+    subscription end is given. Build it once per user and render any number
+    of templates with it; `slots` limits it to the placeholders one template
+    uses, so the timezone lookup is skipped when {day_part} is not among them.
+    """
+    now = now or datetime.utcnow()
+    context = {"name": user.name or default_name}
+    if slots is None or "day_part" in slots:
+        context["day_part"] = day_part(user.timezone, now)
+    if ends_at is not None:
+        seconds_left = max(0.0, (ends_at - now).total_seconds())
+        context["hours_left"] = str(int(seconds_left // 3600))
+        context["days"] = str(int(seconds_left // 86400))
+    return context
+
+
+def render_for_user(
+    template: str,
+    user,
+    now: Optional[datetime] = None,
+    default_name: str = DEFAULT_NAME,
+    ends_at: Optional[datetime] = None
+) -> str:
+    """One message for one user, computing only the values the template uses"""
+    compiled = compile_template(template)
+    if not compiled.slots:
+        return compiled.source
+    return compiled.render(user_context(user, now, default_name, ends_at, compiled.slots))
@@ -0,0 +1,165 @@
+"""
+Set-based hard deletion of users and everything that references them
+"""
+import logging
+from typing import Dict, Iterable, List, NamedTuple
+from sqlalchemy import select, delete, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.config.database import async_session
+from shared.config.redis import RedisCache
+from shared.analytics.rollups import subtract_users
+from shared.models.user import User
+from shared.models.subscription import Subscription
+from shared.models.conversation import Conversation, Message
+from shared.models.analytics import Event, UserSession
+from shared.models.crisis import CrisisEvent
+from shared.models.memory import MemoryAnchor, ConversationSummary
+
+logger = logging.getLogger(__name__)
+
+
+class DeletedUser(NamedTuple):
+    """What is needed to build a deleted user's Redis keys"""
+    id: int
+    telegram_id: str
+    anchor_ids: List[str]
+
+
+class UserDeletionService:
+    """
+    Deletes users with one DELETE per table, children before parents,
+    whatever the number of conversations. Bulk deletions run in small
+    transactions so no lock is held for long.
+    """
+
+    USERS_PER_CHUNK = 100
+    MESSAGES_PER_BATCH = 5000
+
+    async def delete_user(self, session: AsyncSession, user_id: int) -> bool:
+        """
+        Delete one user in the caller's transaction and purge their Redis keys
+        after commit.
+
+        Returns:
+            True if the user existed
+        """
+        deleted = await self._delete_rows(session, [user_id])
+        await session.commit()
+
+        if deleted:
+            await self._purge_cache(deleted)
+        return bool(deleted)
+
+    async def delete_users(self, user_ids: Iterable[int]) -> int:
+        """
+        Mass deletion (GDPR requests, cleanup jobs): users are processed in
+        chunks, and each chunk's messages are removed in short batches first.
+
+        Returns:
+            Number of users deleted
+        """
+        user_ids = list(user_ids)
+        total = 0
+
+        for i in range(0, len(user_ids), self.USERS_PER_CHUNK):
+            chunk = user_ids[i:i + self.USERS_PER_CHUNK]
+            try:
+                async with async_session() as session:
+                    await self._delete_messages_in_batches(session, chunk)
+                    deleted = await self._delete_rows(session, chunk)
+                    await session.commit()
+
+                if deleted:
+                    await self._purge_cache(deleted)
+                total += len(deleted)
+            except Exception as e:
+                logger.error(f"Failed to delete users {chunk[0]}..{chunk[-1]}: {e}")
+
+        logger.info(f"Deleted {total} of {len(user_ids)} users")
+        return total
+
+    async def _delete_messages_in_batches(self, session: AsyncSession, user_ids: List[int]):
+        """Remove messages of heavy users a batch per transaction"""
+        conversation_ids = select(Conversation.id).where(Conversation.user_id.in_(user_ids))
+
+        while True:
+            batch = (
+                select(Message.id)
+                .where(Message.conversation_id.in_(conversation_ids))
+                .limit(self.MESSAGES_PER_BATCH)
+            )
+            result = await session.execute(
+                delete(Message)
+                .where(Message.id.in_(batch))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+            if result.rowcount < self.MESSAGES_PER_BATCH:
+                break
+
+    async def _delete_rows(self, session: AsyncSession, user_ids: List[int]) -> List[DeletedUser]:
+        """
+        Delete all rows of the given users, in dependency order
+
+        Returns:
+            The users that existed
+        """
+        conversation_ids = select(Conversation.id).where(Conversation.user_id.in_(user_ids))
+
+        # Keep the rollups equal to the raw tables once these rows are gone
+        await subtract_users(session, user_ids)
+
+        statements = [
+            delete(Message).where(Message.conversation_id.in_(conversation_ids)),
+            delete(ConversationSummary).where(
+                or_(
+                    ConversationSummary.user_id.in_(user_ids),
+                    ConversationSummary.conversation_id.in_(conversation_ids)
+                )
+            ),
+            delete(Conversation).where(Conversation.user_id.in_(user_ids)),
+            delete(CrisisEvent).where(CrisisEvent.user_id.in_(user_ids)),
+            delete(Event).where(Event.user_id.in_(user_ids)),
+            delete(UserSession).where(UserSession.user_id.in_(user_ids)),
+            delete(Subscription).where(Subscription.user_id.in_(user_ids)),
+        ]
+        for statement in statements:
+            await session.execute(statement.execution_options(synchronize_session=False))
+
+        # Anchor ids name the cached anchors, so the purge needs no SCAN
+        anchors = await session.execute(
+            delete(MemoryAnchor)
+            .where(MemoryAnchor.user_id.in_(user_ids))
+            .returning(MemoryAnchor.user_id, MemoryAnchor.anchor_id)
+            .execution_options(synchronize_session=False)
+        )
+        anchor_ids: Dict[int, List[str]] = {}
+        for user_id, anchor_id in anchors:
+            anchor_ids.setdefault(user_id, []).append(anchor_id)
+
+        result = await session.execute(
+            delete(User)
+            .where(User.id.in_(user_ids))
+            .returning(User.id, User.telegram_id)
+            .execution_options(synchronize_session=False)
+        )
+        return [
+            DeletedUser(user_id, telegram_id, anchor_ids.get(user_id, []))
+            for user_id, telegram_id in result
+        ]
+
+    async def _purge_cache(self, users: List[DeletedUser]):
+        try:
+            await RedisCache().purge_user_keys(
+                [user.id for user in users],
+                telegram_ids=[user.telegram_id for user in users],
+                anchors=[(user.id, anchor_id) for user in users for anchor_id in user.anchor_ids]
+            )
+        except Exception as e:
+            logger.warning(f"Failed to purge Redis keys for {len(users)} users: {e}")
+
+
+# Global instance
+user_deletion_service = UserDeletionService()
@@ -0,0 +1,120 @@
+"""
+Render 1M ping/reminder messages with the shared template engine
+
+    python tests/benchmarks/bench_message_templates.py [messages] [users]
+
+Compares the per-message .replace chain and pytz lookup the call sites used
+with render_for_user, which is how they render now: one call per message,
+computing only the values the template uses. A context built once per user
+and reused is shown for reference. Pure Python, no services needed.
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from shared.services.message_templates import (  # noqa: E402
+    compile_template, render, render_for_user, user_context
+)
+
+TEMPLATES = [
+    "{day_part}, {name}! Как прошёл день?",
+    "{name}, до конца подписки осталось {hours_left} ч.",
+    "{day_part}! Подписка закончится через {days} дн., {name}.",
+    "Просто напоминание без подстановок",
+]
+TIMEZONES = [None, "Europe/Moscow", "Asia/Yekaterinburg", "Asia/Vladivostok", "Europe/Kaliningrad"]
+
+
+class BenchUser:
+    __slots__ = ("name", "timezone")
+
+    def __init__(self, name, timezone):
+        self.name = name
+        self.timezone = timezone
+
+
+def legacy_render(template, user, ends_at):
+    """The substitution the call sites did before the engine, per message"""
+    if '{name}' in template:
+        template = template.replace('{name}', user.name if user.name else "друг мой")
+    if '{day_part}' in template:
+        try:
+            if user.timezone:
+                current_hour = datetime.now(pytz.timezone(user.timezone)).hour
+            else:
+                current_hour = datetime.utcnow().hour
+            if 5 <= current_hour < 12:
+                day_part = "Доброе утро"
+            elif 12 <= current_hour < 17:
+                day_part = "Добрый день"
+            elif 17 <= current_hour < 22:
+                day_part = "Добрый вечер"
+            else:
+                day_part = "Доброй ночи"
+            template = template.replace('{day_part}', day_part)
+        except Exception:
+            template = template.replace('{day_part}', "Привет")
+    seconds_left = max(0.0, (ends_at - datetime.utcnow()).total_seconds())
+    template = template.replace('{hours_left}', str(int(seconds_left // 3600)))
+    return template.replace('{days}', str(int(seconds_left // 86400)))
+
+
+def _users(count):
+    rng = random.Random(47)
+    now = datetime.utcnow()
+    return [
+        (BenchUser(rng.choice([None, f"user{i}"]), rng.choice(TIMEZONES)),
+         now + timedelta(hours=rng.randint(1, 24 * 30)))
+        for i in range(count)
+    ]
+
+
+def _timed(label, messages, fn):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed:7.2f} s  {messages / elapsed / 1000:8.0f}k msg/s  {elapsed / messages * 1e6:6.2f} us/msg")
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    user_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    users = _users(user_count)
+    per_user = messages // user_count
+    total = per_user * user_count
+    print(f"{total} messages, {user_count} users, {len(TEMPLATES)} templates")
+
+    def legacy():
+        for user, ends_at in users:
+            for i in range(per_user):
+                legacy_render(TEMPLATES[i % len(TEMPLATES)], user, ends_at)
+
+    def engine_per_message():
+        # What ping, AI ping and reminder sending do: one call per message
+        compile_template.cache_clear()
+        for i in range(total):
+            user, ends_at = users[i % user_count]
+            render_for_user(TEMPLATES[i % len(TEMPLATES)], user, ends_at=ends_at)
+
+    def engine_context_per_user():
+        compile_template.cache_clear()
+        now = datetime.utcnow()
+        for user, ends_at in users:
+            context = user_context(user, now, ends_at=ends_at)
+            for i in range(per_user):
+                render(TEMPLATES[i % len(TEMPLATES)], context)
+
+    _timed("legacy .replace chain", total, legacy)
+    _timed("render_for_user per message", total, engine_per_message)
+    _timed("context reused per user", total, engine_context_per_user)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Integration tests run against disposable services:
+
+    TEST_DATABASE_URL  a database migrated with `alembic upgrade head` that the
+                       tests may write to and whose rollup tables they reset
+    TEST_REDIS_URL     a Redis instance the tests may write to
+    TEST_LOAD_SCALE    opt-in for the load tests (test_*_load.py): the fraction
+                       of their full seed to use, 1 for the sizes the requests
+                       name (1M users/conversations). Run them with -s to see
+                       the timings.
+
+Tests needing a service are skipped when its variable is not set.
+"""
+import asyncio
+import os
+import sys
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "apps", "bot"))
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+TEST_REDIS_URL = os.environ.get("TEST_REDIS_URL")
+TEST_LOAD_SCALE = os.environ.get("TEST_LOAD_SCALE")
+
+# Settings are read at import time
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+if TEST_REDIS_URL:
+    os.environ["REDIS_URL"] = TEST_REDIS_URL
+# The engine is created on import but only connects when used
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://test@localhost/test")
+for name in ("BOT_TOKEN", "OPENAI_API_KEY", "ADMIN_SECRET"):
+    os.environ.setdefault(name, "test")
+
+
+@asynccontextmanager
+async def _database():
+    """Dispose pooled connections so they do not outlive the loop"""
+    from shared.config.database import engine
+
+    try:
+        yield
+    finally:
+        await engine.dispose()
+
+
+@asynccontextmanager
+async def _redis():
+    """Connect the shared Redis client for the duration of the loop"""
+    from shared.config import redis as redis_config
+
+    await redis_config.init_redis()
+    try:
+        yield
+    finally:
+        if redis_config.redis_client is not None:
+            await redis_config.redis_client.aclose()
+        redis_config.redis_client = None
+
+
+def _runner(*services):
+    """Run a coroutine on a fresh loop inside the given services"""
+    async def wrapped(coro):
+        async with AsyncExitStack() as stack:
+            for service in services:
+                await stack.enter_async_context(service())
+            return await coro
+
+    return lambda coro: asyncio.run(wrapped(coro))
+
+
+@pytest.fixture
+def run_db():
+    """Run a coroutine on a fresh loop, disposing pooled connections afterwards"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    return _runner(_database)
+
+
+@pytest.fixture
+def run_redis():
+    """Run a coroutine on a fresh loop with the shared Redis client connected"""
+    if not TEST_REDIS_URL:
+        pytest.skip("TEST_REDIS_URL is not set")
+    return _runner(_redis)
+
+
+@pytest.fixture
+def run_db_redis(run_db, run_redis):
+    """Both of the above on one loop"""
+    return _runner(_database, _redis)
+
+
+@pytest.fixture
+def load_scale():
+    """Fraction of the full load-test seed; the load tests are skipped without it"""
+    if not TEST_LOAD_SCALE:
+        pytest.skip("TEST_LOAD_SCALE is not set")
+    return float(TEST_LOAD_SCALE)
@@ -0,0 +1,174 @@
+"""
+The CryptoCloud poller against a local stub of the merchant/info endpoint
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+import httpx
+from aiohttp import web
+from sqlalchemy import select, text, update
+
+
+API_KEY = "stub-key"
+
+
+class StubCryptoCloud:
+    """Answers merchant/info from a uuid -> status map and records the requests"""
+
+    def __init__(self, statuses, on_request=None):
+        self.statuses = statuses
+        self.on_request = on_request
+        self.requests = []
+        self.runner = None
+        self.url = None
+
+    async def _info(self, request):
+        payload = await request.json()
+        self.requests.append((request.headers.get("Authorization"), payload["uuids"]))
+        if self.on_request:
+            await self.on_request()
+        return web.json_response({
+            "status": "success",
+            # The real API answers with the INV- prefix
+            "result": [{"uuid": f"INV-{invoice}", "status": self.statuses.get(invoice, "created")}
+                       for invoice in payload["uuids"]]
+        })
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/v2/invoice/merchant/info", self._info)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(chat_id)
+
+
+async def _set_api_key(session, value):
+    await session.execute(text("DELETE FROM bot_settings WHERE key = 'cryptocloud_api_key'"))
+    if value is not None:
+        await session.execute(
+            text("""
+                INSERT INTO bot_settings (key, category, string_value, is_active)
+                VALUES ('cryptocloud_api_key', 'expert', :value, true)
+            """),
+            {"value": value}
+        )
+    await session.commit()
+
+
+async def _seed(session, now):
+    """One user with invoices named by what the poller should do with them"""
+    from shared.models.subscription import Subscription
+    from shared.models.user import User
+
+    user = User(telegram_id=str(10 ** 12 + uuid.uuid4().int % 10 ** 9))
+    session.add(user)
+    await session.flush()
+
+    ages = {
+        "raced": timedelta(minutes=5),       # paid, but the webhook confirms it mid-poll
+        "paid": timedelta(minutes=5),
+        "unpaid": timedelta(minutes=5),
+        "in_grace": timedelta(seconds=10),   # still the webhook's turn
+        "expired": timedelta(hours=30),      # past the invoice TTL
+    }
+    invoices = {}
+    # Inserted in this order: the lost race comes first in the batch
+    for name, age in ages.items():
+        subscription = Subscription(
+            user_id=user.id,
+            plan_name="30d",
+            price=100,
+            currency="RUB",
+            starts_at=now,
+            ends_at=now + timedelta(days=30),
+            is_active=False,
+            payment_provider="cryptocloud",
+            payment_id=uuid.uuid4().hex,
+            created_at=now - age
+        )
+        session.add(subscription)
+        await session.flush()
+        invoices[name] = (subscription.id, subscription.payment_id)
+    await session.commit()
+    return user, invoices
+
+
+def test_poller_batches_and_survives_webhook_race(run_db):
+    from services.cryptocloud_polling_service import CryptoCloudPollingService
+    from shared.config.database import async_session
+    from shared.models.subscription import Subscription
+    from shared.services.user_deletion_service import user_deletion_service
+
+    async def scenario():
+        now = datetime.utcnow()
+        async with async_session() as session:
+            user, invoices = await _seed(session, now)
+            await _set_api_key(session, API_KEY)
+
+        async def webhook_confirms_raced():
+            async with async_session() as session:
+                await session.execute(
+                    update(Subscription).where(Subscription.id == invoices["raced"][0]).values(is_active=True)
+                )
+                await session.commit()
+
+        statuses = {invoices["raced"][1]: "paid", invoices["paid"][1]: "overpaid"}
+        bot = RecordingBot()
+        try:
+            async with StubCryptoCloud(statuses, on_request=webhook_confirms_raced) as stub:
+                service = CryptoCloudPollingService(api_url=stub.url)
+                service._client = httpx.AsyncClient(base_url=service.api_url, timeout=5)
+                try:
+                    activated = await service.poll_once(bot)
+                    # Nothing is due again right away: the unpaid invoice backs off
+                    activated_again = await service.poll_once(bot)
+                finally:
+                    await service._client.aclose()
+
+            assert activated == 1
+            assert activated_again == 0
+
+            # One batched request, only for invoices past the grace period and inside the TTL
+            assert len(stub.requests) == 1
+            authorization, uuids = stub.requests[0]
+            assert authorization == f"Token {API_KEY}"
+            assert sorted(uuids) == sorted(invoices[name][1] for name in ("raced", "paid", "unpaid"))
+
+            async with async_session() as session:
+                result = await session.execute(
+                    select(Subscription.id, Subscription.is_active).where(Subscription.user_id == user.id)
+                )
+                active = dict(result.all())
+            assert active[invoices["raced"][0]] is True
+            assert active[invoices["paid"][0]] is True
+            assert active[invoices["unpaid"][0]] is False
+            assert active[invoices["in_grace"][0]] is False
+            assert active[invoices["expired"][0]] is False
+
+            # Only the poller's own activation notifies; the webhook's win is not repeated
+            assert bot.sent == [int(user.telegram_id)]
+            assert invoices["unpaid"][0] in service._next_check
+        finally:
+            async with async_session() as session:
+                await _set_api_key(session, None)
+            await user_deletion_service.delete_users([user.id])
+
+    run_db(scenario())
@@ -0,0 +1,157 @@
+"""
+Daily stats latency against a 50M-event table as `days` grows (opt-in, see conftest)
+
+Measured twice: before the rollups are folded (every day scanned raw) and
+after, when only the days past the watermark are. Both must agree.
+"""
+import statistics
+import time
+import uuid
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("fastapi")
+from sqlalchemy import event, text
+
+
+EVENTS = 50_000_000
+USERS = 10_000
+DAYS = [1, 7, 30, 90]
+RUNS = 5
+
+
+async def _seed(session, prefix: str, events: int, users: int, now: datetime):
+    """Events spread evenly over the last 90 days, round-robin over the users"""
+    from shared.analytics.partitions import add_months, create_partition_sql, ensure_partitions, month_start
+
+    await ensure_partitions(session)
+    for months_back in range(1, 5):
+        await session.execute(text(create_partition_sql(add_months(month_start(now), -months_back))))
+
+    result = await session.execute(
+        text("""
+            INSERT INTO users (telegram_id, created_at)
+            SELECT :prefix || g, CAST(:now AS timestamp) - g * interval '1 minute'
+            FROM generate_series(1, :users) g
+            RETURNING id
+        """),
+        {"prefix": prefix, "users": users, "now": now}
+    )
+    user_ids = sorted(row.id for row in result)
+    # One INSERT draws consecutive ids; arithmetic is much cheaper than an array lookup per row
+    assert user_ids == list(range(user_ids[0], user_ids[0] + users))
+    await session.execute(
+        text("""
+            INSERT INTO analytics_events (user_id, event_type, created_at)
+            SELECT :first_user_id + g % :users,
+                   (ARRAY['message_in', 'message_out', 'ping_sent', 'start'])[g % 4 + 1],
+                   CAST(:now AS timestamp) - (g * 90.0 / :events) * interval '1 day'
+            FROM generate_series(0, :events - 1) g
+        """),
+        {"first_user_id": user_ids[0], "users": users, "events": events, "now": now}
+    )
+    await session.commit()
+    await session.execute(text("ANALYZE analytics_events"))
+    await session.execute(text("ANALYZE users"))
+    await session.commit()
+    return user_ids
+
+
+async def _reset_rollups(session):
+    await session.execute(text("TRUNCATE analytics_rollups, analytics_daily_active_users"))
+    await session.execute(text("DELETE FROM analytics_rollup_watermarks"))
+    await session.commit()
+
+
+async def _cleanup(session, user_ids):
+    from shared.config.database import engine
+
+    await _reset_rollups(session)
+    await session.execute(text("DELETE FROM analytics_events WHERE user_id = ANY(CAST(:ids AS bigint[]))"), {"ids": user_ids})
+    await session.commit()
+    # analytics_events.user_id has no index: vacuum before the FK checks of the user delete
+    async with engine.connect() as connection:
+        autocommit = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        await autocommit.execute(text("VACUUM analytics_events"))
+    await session.execute(text("DELETE FROM users WHERE id = ANY(CAST(:ids AS bigint[]))"), {"ids": user_ids})
+    await session.commit()
+
+
+async def _measure(daily_stats, statements, label: str):
+    """Median/max latency per `days`; returns the rows of each and the statements per call"""
+    from shared.config.database import async_session
+
+    rows_by_days = {}
+    statements_per_call = set()
+    for days in DAYS:
+        timings = []
+        for _ in range(RUNS):
+            statements.clear()
+            async with async_session() as session:
+                started = time.perf_counter()
+                rows = await daily_stats(days=days, db=session)
+                timings.append(time.perf_counter() - started)
+            statements_per_call.add(len(statements))
+        assert len(rows) == days
+        rows_by_days[days] = [row.model_dump() for row in rows]
+        print(
+            f"{label:<8} days={days:<3} median {statistics.median(timings) * 1000:8.1f} ms  "
+            f"max {max(timings) * 1000:8.1f} ms"
+        )
+    return rows_by_days, statements_per_call
+
+
+def test_daily_stats_latency_is_flat_in_days(run_db, load_scale):
+    from apps.admin.backend.routers.analytics_router import get_daily_stats
+    from shared.analytics.rollups import refresh_rollups
+    from shared.config.database import async_session, engine
+
+    # The endpoint without the response cache in front of it
+    daily_stats = get_daily_stats.__wrapped__
+    events = max(1000, int(EVENTS * load_scale))
+    users = max(10, int(USERS * min(load_scale * 10, 1)))
+
+    async def scenario():
+        prefix = f"load-daily-{uuid.uuid4().hex[:8]}-"
+        statements = []
+
+        def count_statement(*args):
+            statements.append(1)
+
+        user_ids = []
+        try:
+            async with async_session() as session:
+                # The seed is backdated, so it has to be folded from scratch
+                await _reset_rollups(session)
+                started = time.perf_counter()
+                user_ids = await _seed(session, prefix, events, users, datetime.utcnow())
+            print(f"\n{events} events / {users} users seeded in {time.perf_counter() - started:.1f} s")
+
+            event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+            try:
+                raw, raw_statements = await _measure(daily_stats, statements, "raw")
+
+                started = time.perf_counter()
+                async with async_session() as session:
+                    await refresh_rollups(session)
+                print(f"rollups folded in {time.perf_counter() - started:.1f} s")
+
+                rolled, rolled_statements = await _measure(daily_stats, statements, "rollups")
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+
+            assert any(row["messages_sent"] for row in raw[max(DAYS)])
+            # Today and yesterday may have moved on between the two passes
+            for days in DAYS:
+                assert rolled[days][:-2] == raw[days][:-2]
+            # The same round-trips (watermark, then one query) whatever the range,
+            # where the old loop made four per day
+            assert len(raw_statements) == 1 and raw_statements == rolled_statements
+        finally:
+            if user_ids:
+                async with async_session() as session:
+                    await _cleanup(session, user_ids)
+
+    run_db(scenario())
@@ -0,0 +1,113 @@
+"""
+Find the pool-size knee for the bot's many-short-sessions workload (opt-in, see conftest)
+"""
+import asyncio
+import time
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+from sqlalchemy import text
+
+
+UPDATES = 5000
+CONCURRENCY = 100          # updates in flight, as under a burst of messages
+USERS = 1000
+HOLD_SECONDS = 0.005       # awaits between queries while a session is open
+POOL_SIZES = [1, 2, 4, 8, 16, 32]
+KNEE_FRACTION = 0.9        # smallest pool reaching this share of the best throughput
+
+
+async def _handle_update(session_factory, telegram_id: str):
+    """Two short sessions, like middleware lookups followed by the handler's write"""
+    async with session_factory() as session:
+        user_id = await session.scalar(text("SELECT id FROM users WHERE telegram_id = :t"), {"t": telegram_id})
+    async with session_factory() as session:
+        await session.execute(
+            text("SELECT id FROM subscriptions WHERE user_id = :u ORDER BY created_at DESC LIMIT 1"),
+            {"u": user_id}
+        )
+        await asyncio.sleep(HOLD_SECONDS)
+        await session.execute(
+            text("UPDATE users SET last_user_message_at = now() WHERE id = :u"), {"u": user_id}
+        )
+        await session.commit()
+
+
+async def _run(pool_size: int, prefix: str, updates: int):
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from shared.config.db_pool import engine_options
+    from shared.config.settings import settings
+
+    options = {**engine_options("bot"), "pool_size": pool_size, "max_overflow": 0}
+    engine = create_async_engine(settings.database_url, **options)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await _handle_update(session_factory, f"{prefix}{i % USERS}")
+            latencies.append(time.perf_counter() - started)
+
+    try:
+        # Open the connections up front so the run measures steady state
+        await asyncio.gather(*(one(i) for i in range(pool_size)))
+        latencies.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(updates)))
+        elapsed = time.perf_counter() - started
+        snapshot = engine.pool.metrics.snapshot(engine.pool)
+    finally:
+        await engine.dispose()
+
+    latencies.sort()
+    return {
+        "throughput": updates / elapsed,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "wait_ms_avg": snapshot["wait_seconds_avg"] * 1000,
+        "checkouts": snapshot["checkouts"],
+        "timeouts": snapshot["timeouts"],
+    }
+
+
+def test_pool_sizing_knee(run_db, load_scale):
+    from shared.config.database import async_session
+
+    updates = max(200, int(UPDATES * load_scale))
+
+    async def scenario():
+        prefix = f"load-pool-{uuid.uuid4().hex[:8]}-"
+        async with async_session() as session:
+            await session.execute(
+                text("INSERT INTO users (telegram_id) SELECT :prefix || g FROM generate_series(0, :users - 1) g"),
+                {"prefix": prefix, "users": USERS}
+            )
+            await session.commit()
+        try:
+            print(f"\n{updates} updates, {CONCURRENCY} in flight, {HOLD_SECONDS * 1000:.0f} ms held per write session")
+            results = {}
+            for pool_size in POOL_SIZES:
+                result = results[pool_size] = await _run(pool_size, prefix, updates)
+                print(
+                    f"pool_size={pool_size:<3} {result['throughput']:7.0f} updates/s  "
+                    f"p99 {result['p99_ms']:7.1f} ms  avg checkout wait {result['wait_ms_avg']:7.1f} ms"
+                )
+                # The exported metrics see every checkout: two sessions per update, warm-up included
+                assert result["checkouts"] >= 2 * (updates + pool_size)
+                assert result["timeouts"] == 0
+
+            best = max(result["throughput"] for result in results.values())
+            knee = min(size for size, result in results.items() if result["throughput"] >= KNEE_FRACTION * best)
+            print(f"knee: pool_size={knee} reaches {KNEE_FRACTION:.0%} of the best throughput ({best:.0f} updates/s)")
+            # Waiting for a connection is what a pool past the knee removes
+            assert results[knee]["wait_ms_avg"] <= results[POOL_SIZES[0]]["wait_ms_avg"]
+        finally:
+            async with async_session() as session:
+                await session.execute(text("DELETE FROM users WHERE telegram_id LIKE :pattern"),
+                                      {"pattern": prefix + "%"})
+                await session.commit()
+
+    run_db(scenario())
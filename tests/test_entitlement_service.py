@@ -0,0 +1,73 @@
+"""
+The in-process entitlement cache stays bounded and keeps listening across Redis drops
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("redis")
+
+
+def _entitlement(now):
+    return {'subscription_id': 1, 'plan_name': '30d', 'ends_at': now + timedelta(days=1),
+            'is_paid': True, 'daily_messages_limit': None}
+
+
+async def _wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+def test_local_cache_evicts_least_recently_used(run_redis):
+    from services.entitlement_service import EntitlementService
+
+    async def scenario():
+        service = EntitlementService()
+        service.LOCAL_MAX_ENTRIES = 3
+        now = datetime.utcnow()
+        for user_id in (1, 2, 3):
+            service._remember(user_id, _entitlement(now), now)
+        # A hit makes 1 the most recent, so 2 goes first
+        assert await service.get(1) is not None
+        service._remember(4, _entitlement(now), now)
+        assert list(service._local) == [3, 1, 4]
+
+    run_redis(scenario())
+
+
+def test_listener_resubscribes_after_connection_loss(run_redis):
+    from services.entitlement_service import EntitlementService
+    from shared.config.redis import ENTITLEMENT_CHANNEL, get_redis
+
+    async def scenario():
+        service = EntitlementService()
+        service.RECONNECT_DELAY = 0.1
+        redis_client = await get_redis()
+        now = datetime.utcnow()
+
+        async def subscribed():
+            return dict(await redis_client.pubsub_numsub(ENTITLEMENT_CHANNEL))[ENTITLEMENT_CHANNEL] > 0
+
+        listener = asyncio.create_task(service.listen_for_invalidations())
+        try:
+            await _wait_for(subscribed)
+            await redis_client.client_kill_filter(_type="pubsub")
+            await _wait_for(subscribed)
+
+            service._remember(42, _entitlement(now), now)
+            await redis_client.publish(ENTITLEMENT_CHANNEL, json.dumps({"user_id": 42}))
+
+            async def dropped():
+                return 42 not in service._local
+
+            await _wait_for(dropped)
+            assert not listener.done()
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+    run_redis(scenario())
@@ -0,0 +1,71 @@
+"""
+The Redis quota never lets concurrent messages past the daily limit
+"""
+import asyncio
+import random
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("redis")
+
+
+LIMIT = 5
+CONCURRENCY = 50
+
+
+def _user_id() -> int:
+    # Far above real ids so the counters never collide with live data
+    return random.randint(10 ** 12, 10 ** 13)
+
+
+async def _consume_in_parallel(quota_service, user_id: int):
+    return await asyncio.gather(*(quota_service.try_consume(user_id, LIMIT) for _ in range(CONCURRENCY)))
+
+
+def test_parallel_consumes_at_limit_leave_one_success(run_redis):
+    from services.quota_service import QuotaService
+    from shared.config.redis import get_redis
+
+    async def scenario():
+        quota_service = QuotaService()
+        user_id = _user_id()
+        redis_client = await get_redis()
+        key = quota_service._key(user_id, datetime.utcnow())
+        await redis_client.set(key, LIMIT - 1, ex=60)
+        try:
+            results = await _consume_in_parallel(quota_service, user_id)
+            assert sum(result['allowed'] for result in results) == 1
+            assert int(await redis_client.get(key)) == LIMIT
+        finally:
+            await redis_client.delete(key)
+
+    run_redis(scenario())
+
+
+def test_missing_counter_is_seeded_from_db(run_redis, monkeypatch):
+    from services.quota_service import QuotaService
+    from shared.config.redis import get_redis
+
+    async def scenario():
+        quota_service = QuotaService()
+        user_id = _user_id()
+        lookups = []
+
+        async def stored_used(uid, now):
+            lookups.append(uid)
+            return LIMIT - 1
+
+        monkeypatch.setattr(quota_service, "_stored_used", stored_used)
+        redis_client = await get_redis()
+        key = quota_service._key(user_id, datetime.utcnow())
+        try:
+            results = await _consume_in_parallel(quota_service, user_id)
+            assert sum(result['allowed'] for result in results) == 1
+            assert int(await redis_client.get(key)) == LIMIT
+            assert 0 < await redis_client.ttl(key)
+            assert lookups
+        finally:
+            await redis_client.delete(key)
+
+    run_redis(scenario())
@@ -0,0 +1,131 @@
+"""
+Rollup-backed counts must equal counting the raw tables over the same window
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+from sqlalchemy import and_, select, func, text
+
+
+async def _reset_rollups(session):
+    await session.execute(text("TRUNCATE analytics_rollups, analytics_daily_active_users"))
+    await session.execute(text("DELETE FROM analytics_rollup_watermarks"))
+    await session.commit()
+
+
+async def _seed(session, prefix: str, now: datetime):
+    """Three users with events spread over the last three days"""
+    from shared.analytics.partitions import add_months, create_partition_sql, ensure_partitions, month_start
+    from shared.models.analytics import Event
+    from shared.models.user import User
+
+    await ensure_partitions(session)
+    await session.execute(text(create_partition_sql(add_months(month_start(now), -1))))
+    await session.commit()
+
+    users = [
+        User(telegram_id=f"{prefix}-{i}", created_at=now - timedelta(days=3, minutes=7 * i))
+        for i in range(3)
+    ]
+    session.add_all(users)
+    await session.flush()
+
+    for i, user in enumerate(users):
+        for step in range(0, 72 * 60, 97 + 13 * i):
+            session.add(Event(
+                user_id=user.id,
+                event_type=f"{prefix}-{step % 3}",
+                created_at=now - timedelta(minutes=step + 3)
+            ))
+    await session.commit()
+    return [user.id for user in users]
+
+
+async def _assert_matches_raw(session, prefix: str, now: datetime):
+    from shared.analytics.rollups import (
+        count_active_users, count_events, count_new_users, daily_counts, rolled_up_until
+    )
+    from shared.models.analytics import Event
+    from shared.models.user import User
+
+    event_types = [f"{prefix}-{n}" for n in range(3)]
+    windows = [None, now - timedelta(days=3), now - timedelta(hours=36, minutes=17), now - timedelta(hours=2)]
+
+    for since in windows:
+        conditions = [Event.event_type.in_(event_types)]
+        if since is not None:
+            conditions.append(Event.created_at >= since)
+        raw = await session.execute(
+            select(Event.event_type, func.count()).where(*conditions).group_by(Event.event_type)
+        )
+        assert await count_events(session, since, event_types) == dict(raw.all()), since
+
+        raw_users = await session.execute(
+            select(func.count()).select_from(User).where(*([User.created_at >= since] if since is not None else []))
+        )
+        assert await count_new_users(session, since) == raw_users.scalar(), since
+
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=2)
+    raw_active = await session.execute(
+        select(func.count(func.distinct(Event.user_id))).where(Event.created_at >= day)
+    )
+    assert await count_active_users(session, day) == raw_active.scalar()
+
+    # Per-day active user counts, as read by the daily stats
+    since = day - timedelta(days=1)
+    until = day + timedelta(days=3)
+    split = await rolled_up_until(session, since, until)
+    assert split > since
+    per_day = daily_counts(
+        'active_users', '', Event.created_at, func.count(func.distinct(Event.user_id)), since, until, split
+    )
+    result = await session.execute(select(per_day.c.day, per_day.c.value))
+    rolled = {bucket: value for bucket, value in result if value}
+    bucket = func.date_trunc('day', Event.created_at)
+    raw_days = await session.execute(
+        select(bucket, func.count(func.distinct(Event.user_id)))
+        .where(and_(Event.created_at >= since, Event.created_at < until))
+        .group_by(bucket)
+    )
+    assert rolled == dict(raw_days.all())
+
+
+def test_rollups_equal_raw_counts(run_db):
+    from shared.analytics.rollups import refresh_rollups
+    from shared.config.database import async_session
+    from shared.services.user_deletion_service import user_deletion_service
+
+    async def scenario():
+        prefix = f"rollup-test-{uuid.uuid4().hex[:8]}"
+        now = datetime.utcnow()
+
+        async with async_session() as session:
+            await _reset_rollups(session)
+            user_ids = await _seed(session, prefix, now)
+
+        remaining = list(user_ids)
+        try:
+            # Two processes folding at once must not double-count
+            async def refresh():
+                async with async_session() as session:
+                    return await refresh_rollups(session)
+
+            await asyncio.gather(refresh(), refresh())
+
+            async with async_session() as session:
+                await _assert_matches_raw(session, prefix, now)
+
+            # Deleted users are taken out of the rollups as well
+            async with async_session() as session:
+                await user_deletion_service.delete_user(session, user_ids[0])
+            remaining.remove(user_ids[0])
+            async with async_session() as session:
+                await _assert_matches_raw(session, prefix, now)
+        finally:
+            await user_deletion_service.delete_users(remaining)
+
+    run_db(scenario())
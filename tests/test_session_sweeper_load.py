@@ -0,0 +1,113 @@
+"""
+Cost of one session sweep over 1M conversations (opt-in, see conftest)
+"""
+import time
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+from sqlalchemy import text
+
+
+CONVERSATIONS = 1_000_000
+CONVERSATIONS_PER_USER = 100
+
+
+async def _seed(session, prefix: str, conversations: int):
+    """Half the conversations expired, a quarter fresh, a quarter already closed"""
+    users = max(1, conversations // CONVERSATIONS_PER_USER)
+    await session.execute(
+        text("INSERT INTO users (telegram_id) SELECT :prefix || g FROM generate_series(1, :users) g"),
+        {"prefix": prefix, "users": users}
+    )
+    await session.execute(
+        text("""
+            INSERT INTO conversations (user_id, session_id, is_active, is_closed, last_message_at)
+            SELECT u.id, :prefix || g,
+                   g % 4 <> 3,
+                   g % 4 = 3,
+                   CASE WHEN g % 4 = 2 THEN now() ELSE now() - interval '365 days' END
+            FROM generate_series(0, :conversations - 1) g
+            JOIN users u ON u.telegram_id = :prefix || (g % :users + 1)
+        """),
+        {"prefix": prefix, "users": users, "conversations": conversations}
+    )
+    await session.commit()
+    await session.execute(text("ANALYZE conversations"))
+    await session.commit()
+
+
+async def _cleanup(session, prefix: str):
+    from shared.config.database import engine
+
+    user_ids = "SELECT id FROM users WHERE telegram_id LIKE :pattern"
+    params = {"pattern": prefix + "%"}
+    await session.execute(text(f"DELETE FROM conversations WHERE user_id IN ({user_ids})"), params)
+    await session.commit()
+    # conversations.user_id has no index: the FK check behind every user
+    # delete scans the table, dead rows included unless vacuumed first
+    async with engine.connect() as connection:
+        autocommit = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        await autocommit.execute(text("VACUUM conversations"))
+    await session.execute(text(f"DELETE FROM users WHERE id IN ({user_ids})"), params)
+    await session.commit()
+
+
+def test_sweep_closes_expired_sessions_at_scale(run_db_redis, load_scale):
+    from services.session_sweeper_service import SessionSweeperService
+    from shared.config.database import async_session
+    from shared.config.redis import get_redis
+
+    conversations = max(4, int(CONVERSATIONS * load_scale))
+    expired = sum(1 for g in range(conversations) if g % 4 in (0, 1))
+    fresh = sum(1 for g in range(conversations) if g % 4 == 2)
+
+    async def scenario():
+        prefix = f"load-sweep-{uuid.uuid4().hex[:8]}-"
+        sweeper = SessionSweeperService()
+        redis_client = await get_redis()
+        queued_before = await redis_client.llen(sweeper.SUMMARY_QUEUE_KEY)
+        try:
+            started = time.perf_counter()
+            async with async_session() as session:
+                await _seed(session, prefix, conversations)
+            seeded = time.perf_counter() - started
+
+            started = time.perf_counter()
+            closed = await sweeper.sweep_expired_sessions()
+            swept = time.perf_counter() - started
+
+            started = time.perf_counter()
+            closed_again = await sweeper.sweep_expired_sessions()
+            idle = time.perf_counter() - started
+
+            print(
+                f"\n{conversations} conversations seeded in {seeded:.1f} s; "
+                f"sweep closed {closed} in {swept:.2f} s "
+                f"({swept / max(closed, 1) * 1e6:.1f} us/session incl. enqueue); "
+                f"idle sweep {idle * 1000:.1f} ms"
+            )
+
+            # Other expired test data may be swept too, never less than ours
+            assert closed >= expired
+            assert closed_again == 0
+            async with async_session() as session:
+                still_open = await session.scalar(
+                    text("""
+                        SELECT count(*) FROM conversations c JOIN users u ON u.id = c.user_id
+                        WHERE u.telegram_id LIKE :pattern AND c.is_active
+                    """),
+                    {"pattern": prefix + "%"}
+                )
+            assert still_open == fresh
+        finally:
+            # Drop what this run queued; the summaries would call the LLM
+            if queued_before:
+                await redis_client.ltrim(sweeper.SUMMARY_QUEUE_KEY, 0, queued_before - 1)
+            else:
+                await redis_client.delete(sweeper.SUMMARY_QUEUE_KEY)
+            async with async_session() as session:
+                await _cleanup(session, prefix)
+
+    run_db_redis(scenario())
@@ -0,0 +1,76 @@
+"""
+A summary that fails or whose worker dies stays claimed and is requeued once stale
+"""
+import time
+import uuid
+
+import pytest
+
+pytest.importorskip("redis")
+
+
+def _sweeper(outcome: bool):
+    from services.session_sweeper_service import SessionSweeperService
+
+    sweeper = SessionSweeperService()
+    # Keys of their own so the test never touches a live queue
+    prefix = f"test-summary-{uuid.uuid4().hex[:8]}"
+    sweeper.SUMMARY_QUEUE_KEY = prefix
+    sweeper.SUMMARY_PROCESSING_KEY = f"{prefix}:processing"
+    sweeper.SUMMARY_CLAIMS_KEY = f"{prefix}:claims"
+    sweeper.SUMMARY_ATTEMPTS_KEY = f"{prefix}:attempts"
+
+    async def summarize(conversation_id: int) -> bool:
+        return outcome
+
+    sweeper._summarize_conversation = summarize
+    return sweeper
+
+
+def _keys(sweeper):
+    return [
+        sweeper.SUMMARY_QUEUE_KEY, sweeper.SUMMARY_PROCESSING_KEY,
+        sweeper.SUMMARY_CLAIMS_KEY, sweeper.SUMMARY_ATTEMPTS_KEY
+    ]
+
+
+def test_failed_summary_is_requeued_when_stale(run_redis):
+    from shared.config.redis import get_redis
+
+    async def scenario():
+        redis_client = await get_redis()
+        sweeper = _sweeper(outcome=False)
+        try:
+            await redis_client.rpush(sweeper.SUMMARY_QUEUE_KEY, 42)
+            assert await sweeper.process_summary_queue(timeout=1)
+            assert await redis_client.lrange(sweeper.SUMMARY_QUEUE_KEY, 0, -1) == []
+            assert await redis_client.lrange(sweeper.SUMMARY_PROCESSING_KEY, 0, -1) == ["42"]
+
+            # Fresh claims are left to their worker
+            assert await sweeper.requeue_stale_summaries() == 0
+
+            stale = time.time() - sweeper.SUMMARY_STALE_SECONDS - 1
+            await redis_client.hset(sweeper.SUMMARY_CLAIMS_KEY, "42", stale)
+            assert await sweeper.requeue_stale_summaries() == 1
+            assert await redis_client.lrange(sweeper.SUMMARY_QUEUE_KEY, 0, -1) == ["42"]
+            assert await redis_client.lrange(sweeper.SUMMARY_PROCESSING_KEY, 0, -1) == []
+        finally:
+            await redis_client.delete(*_keys(sweeper))
+
+    run_redis(scenario())
+
+
+def test_successful_summary_leaves_nothing_behind(run_redis):
+    from shared.config.redis import get_redis
+
+    async def scenario():
+        redis_client = await get_redis()
+        sweeper = _sweeper(outcome=True)
+        try:
+            await redis_client.rpush(sweeper.SUMMARY_QUEUE_KEY, 7)
+            assert await sweeper.process_summary_queue(timeout=1)
+            assert await redis_client.exists(*_keys(sweeper)) == 0
+        finally:
+            await redis_client.delete(*_keys(sweeper))
+
+    run_redis(scenario())
@@ -0,0 +1,115 @@
+"""
+p99 latency of the admin user list on a 1M-user seed (opt-in, see conftest)
+"""
+import time
+import uuid
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("fastapi")
+from fastapi import Response
+from sqlalchemy import text
+
+
+USERS = 1_000_000
+SUBSCRIBED_EVERY = 3     # every third user has subscriptions
+REQUESTS = 200
+DEEP_PAGES = 50
+PAGE_SIZE = 50
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург', 'Самара']
+
+PAGE_P99_MS = 100
+SEARCH_P99_MS = 250      # checked only where pg_trgm is installed
+
+
+async def _seed(session, prefix: str, users: int, now: datetime):
+    """Users a minute apart with a few shared timestamps, two subscriptions per subscriber"""
+    await session.execute(
+        text("""
+            INSERT INTO users (telegram_id, name, city, is_active, terms_accepted, is_in_crisis, created_at)
+            SELECT :prefix || g, 'user ' || g, (CAST(:cities AS text[]))[g % 6 + 1], true, true, false,
+                   CAST(:now AS timestamp) - (g / 2) * interval '1 minute'
+            FROM generate_series(1, :users) g
+        """),
+        {"prefix": prefix, "users": users, "now": now, "cities": CITIES}
+    )
+    await session.execute(
+        text("""
+            INSERT INTO subscriptions (user_id, plan_name, price, starts_at, ends_at, is_active, created_at)
+            SELECT u.id, plan.name, 100, u.created_at, u.created_at + interval '30 days', plan.active,
+                   u.created_at + plan.shift
+            FROM users u
+            CROSS JOIN (VALUES ('7d', false, interval '1 hour'), ('30d', true, interval '2 hours'))
+                 AS plan(name, active, shift)
+            WHERE u.telegram_id LIKE :pattern AND u.id % :every = 0
+        """),
+        {"pattern": prefix + "%", "every": SUBSCRIBED_EVERY}
+    )
+    await session.execute(text("ANALYZE users"))
+    await session.execute(text("ANALYZE subscriptions"))
+
+
+def _percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def test_user_list_p99_at_scale(run_db, load_scale):
+    from apps.admin.backend.routers.users_router import get_users
+    from shared.config.database import async_session
+
+    # Enough for the deep walk plus a page past it at any scale
+    users = max(DEEP_PAGES * PAGE_SIZE + PAGE_SIZE, int(USERS * load_scale))
+
+    async def scenario():
+        prefix = f"load-users-{uuid.uuid4().hex[:8]}-"
+        # Everything happens in one transaction that is rolled back: deleting
+        # 1M users would run every FK check against the referencing tables
+        async with async_session() as session:
+            try:
+                started = time.perf_counter()
+                await _seed(session, prefix, users, datetime.utcnow())
+                print(f"\n{users} users seeded in {time.perf_counter() - started:.1f} s")
+                has_trigram = await session.scalar(
+                    text("SELECT count(*) FROM pg_extension WHERE extname = 'pg_trgm'")
+                )
+
+                async def fetch(**params):
+                    response = Response()
+                    started = time.perf_counter()
+                    page = await get_users(response, size=PAGE_SIZE, db=session, **params)
+                    return (time.perf_counter() - started) * 1000, page, response.headers.get("X-Next-Cursor")
+
+                # Walk deep once to collect cursors spread over the list
+                cursors = [None]
+                cursor = None
+                for _ in range(DEEP_PAGES):
+                    _, page, cursor = await fetch(cursor=cursor)
+                    assert len(page) == PAGE_SIZE
+                    cursors.append(cursor)
+
+                scenarios = {
+                    "first page": lambda i: fetch(),
+                    f"pages 1-{DEEP_PAGES}": lambda i: fetch(cursor=cursors[i % len(cursors)]),
+                    "search name": lambda i: fetch(search=f"user {users - i * 7}"),
+                    "search city": lambda i: fetch(search=CITIES[i % len(CITIES)][:5]),
+                }
+                results = {}
+                for name, request in scenarios.items():
+                    timings = [(await request(i))[0] for i in range(REQUESTS)]
+                    results[name] = (_percentile(timings, 0.5), _percentile(timings, 0.99))
+                    print(f"{name:<14} p50 {results[name][0]:7.1f} ms  p99 {results[name][1]:7.1f} ms")
+
+                assert results["first page"][1] < PAGE_P99_MS
+                assert results[f"pages 1-{DEEP_PAGES}"][1] < PAGE_P99_MS
+                if has_trigram:
+                    assert results["search name"][1] < SEARCH_P99_MS
+                    assert results["search city"][1] < SEARCH_P99_MS
+                else:
+                    print("pg_trgm is not installed: search latencies are not checked")
+            finally:
+                await session.rollback()
+
+    run_db(scenario())
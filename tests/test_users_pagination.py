@@ -0,0 +1,65 @@
+"""
+Keyset pages of the admin user list visit every user exactly once
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("fastapi")
+from fastapi import Response
+from sqlalchemy import text
+
+
+async def _seed(session, prefix: str, now: datetime):
+    """Tied timestamps and users without created_at, which the cursor has to cross"""
+    created = [now, now, now, now - timedelta(minutes=1), None, None, now - timedelta(minutes=2), None]
+    ids = []
+    for i, created_at in enumerate(created):
+        result = await session.execute(
+            text("""
+                INSERT INTO users (telegram_id, is_active, terms_accepted, is_in_crisis, created_at)
+                VALUES (:telegram_id, true, true, false, :created_at)
+                RETURNING id
+            """),
+            {"telegram_id": f"{prefix}{i}", "created_at": created_at}
+        )
+        ids.append(result.scalar_one())
+    await session.commit()
+    return list(zip(created, ids))
+
+
+def test_pages_cover_ties_and_missing_created_at(run_db):
+    from apps.admin.backend.routers.users_router import get_users
+    from shared.config.database import async_session
+
+    async def scenario():
+        prefix = f"page-test-{uuid.uuid4().hex[:8]}-"
+        async with async_session() as session:
+            seeded = await _seed(session, prefix, datetime.utcnow())
+        try:
+            # created_at DESC NULLS FIRST, id DESC
+            undated = sorted((user_id for created_at, user_id in seeded if created_at is None), reverse=True)
+            dated = sorted(((created_at, user_id) for created_at, user_id in seeded if created_at), reverse=True)
+            expected = undated + [user_id for _, user_id in dated]
+
+            seen = []
+            cursor = None
+            for _ in range(len(seeded)):
+                response = Response()
+                async with async_session() as session:
+                    page = await get_users(response, cursor=cursor, size=3, search=prefix, db=session)
+                seen.extend(user.id for user in page)
+                cursor = response.headers.get("X-Next-Cursor")
+                if not cursor:
+                    break
+
+            assert seen == expected
+        finally:
+            async with async_session() as session:
+                await session.execute(text("DELETE FROM users WHERE telegram_id LIKE :pattern"),
+                                      {"pattern": prefix + "%"})
+                await session.commit()
+
+    run_db(scenario())